@@ -0,0 +1,40 @@
+import { TypedArray } from '../../../types';
+
+export interface IEncodedArray {
+  /** Type of the decoded values (e.g. 'Uint16Array') */
+  dataType: string;
+  /** Number of components of the array */
+  numberOfComponents: number;
+  /** Number of values of the decoded array */
+  size: number;
+}
+
+/**
+ * Return true if the given encoding can be decoded.
+ *
+ * Supported encodings are 'constant', 'rle', 'palette', 'cellVarint' and the
+ * lossy 'quantize' and 'octahedral'.
+ *
+ * @param {String} name
+ */
+export function hasEncoding(name: string): boolean;
+
+/**
+ * Expand an encoded array content into its values.
+ *
+ * @param {Object} ref Array ref holding the encoding and its parameters
+ * @param {ArrayBuffer} buffer Encoded content, unused by 'constant'
+ * @param {IEncodedArray} array
+ */
+export function decode(
+  ref: any,
+  buffer: ArrayBuffer | undefined,
+  array: IEncodedArray
+): TypedArray;
+
+export declare const ArrayEncodingHelper: {
+  hasEncoding: typeof hasEncoding;
+  decode: typeof decode;
+};
+
+export default ArrayEncodingHelper;
@@ -0,0 +1,238 @@
+import macro from 'vtk.js/Sources/macros';
+import Endian from 'vtk.js/Sources/Common/Core/Endian';
+import { DataTypeByteSize } from 'vtk.js/Sources/Common/Core/DataArray/Constants';
+
+// ----------------------------------------------------------------------------
+// Compact encodings of constant, repetitive or low-cardinality arrays, and
+// lossy encodings of float arrays and normals.
+// The encoding is named by ref.encoding and its parameters are stored in the
+// ref next to it. Element values keep the byte order of ref.encode.
+// ----------------------------------------------------------------------------
+
+function readSection(buffer, offset, dataType, length, encode) {
+  const byteSize = DataTypeByteSize[dataType];
+  const section = buffer.slice(offset, offset + length * byteSize);
+  if (Endian.ENDIANNESS && encode !== Endian.ENDIANNESS) {
+    Endian.swapBytes(section, byteSize);
+  }
+  return macro.newTypedArray(dataType, section);
+}
+
+function checkSize(buffer, expected, encoding) {
+  if (buffer.byteLength !== expected) {
+    throw new Error(
+      `Invalid ${encoding} encoded content: got ${buffer.byteLength} bytes, instead of ${expected}`
+    );
+  }
+}
+
+// ----------------------------------------------------------------------------
+// constant: no content, ref.value holds the components of the single tuple
+// ----------------------------------------------------------------------------
+
+function decodeConstant(ref, buffer, { dataType, numberOfComponents, size }) {
+  const values = macro.newTypedArray(dataType, size);
+  if (numberOfComponents === 1) {
+    values.fill(ref.value[0]);
+  } else {
+    for (let i = 0; i < size; i++) {
+      values[i] = ref.value[i % numberOfComponents];
+    }
+  }
+  return values;
+}
+
+// ----------------------------------------------------------------------------
+// rle: ref.runs Uint32 run lengths (in tuples) followed by the run tuples
+// ----------------------------------------------------------------------------
+
+function decodeRunLength(ref, buffer, { dataType, numberOfComponents, size }) {
+  const { runs, encode } = ref;
+  const lengthsSize = runs * 4;
+  checkSize(
+    buffer,
+    lengthsSize + runs * numberOfComponents * DataTypeByteSize[dataType],
+    'rle'
+  );
+
+  const lengths = readSection(buffer, 0, 'Uint32Array', runs, encode);
+  const runValues = readSection(
+    buffer,
+    lengthsSize,
+    dataType,
+    runs * numberOfComponents,
+    encode
+  );
+
+  const values = macro.newTypedArray(dataType, size);
+  let offset = 0;
+  for (let r = 0; r < runs; r++) {
+    const end = Math.min(size, offset + lengths[r] * numberOfComponents);
+    if (numberOfComponents === 1) {
+      values.fill(runValues[r], offset, end);
+    } else {
+      const tuple = runValues.subarray(
+        r * numberOfComponents,
+        (r + 1) * numberOfComponents
+      );
+      for (let i = offset; i < end; i += numberOfComponents) {
+        values.set(tuple, i);
+      }
+    }
+    offset = end;
+  }
+
+  if (offset !== size) {
+    throw new Error(`Invalid rle encoded content: runs cover ${offset} values`);
+  }
+  return values;
+}
+
+// ----------------------------------------------------------------------------
+// palette: ref.paletteSize distinct values followed by the index of each value
+// in the palette, as Uint8 for up to 256 entries and Uint16 otherwise
+// ----------------------------------------------------------------------------
+
+function decodePalette(ref, buffer, { dataType, size }) {
+  const { paletteSize, encode } = ref;
+  const indexType = paletteSize <= 256 ? 'Uint8Array' : 'Uint16Array';
+  const paletteBytes = paletteSize * DataTypeByteSize[dataType];
+  checkSize(
+    buffer,
+    paletteBytes + size * DataTypeByteSize[indexType],
+    'palette'
+  );
+
+  const palette = readSection(buffer, 0, dataType, paletteSize, encode);
+  const indices = readSection(buffer, paletteBytes, indexType, size, encode);
+
+  const values = macro.newTypedArray(dataType, size);
+  for (let i = 0; i < size; i++) {
+    values[i] = palette[indices[i]];
+  }
+  return values;
+}
+
+// ----------------------------------------------------------------------------
+// cellVarint: legacy [n, id0, id1, ...] cell array where each id is replaced by
+// its zigzag delta to the previous id (across cells), all values being stored
+// as LEB128 varints (7 bits per byte, high bit set when more bytes follow)
+// ----------------------------------------------------------------------------
+
+function decodeCellVarint(ref, buffer, { dataType, size }) {
+  const bytes = new Uint8Array(buffer);
+  const values = macro.newTypedArray(dataType, size);
+  let offset = 0;
+
+  function readVarint() {
+    let value = 0;
+    let factor = 1;
+    let byte = 0;
+    do {
+      byte = bytes[offset++];
+      value += (byte & 0x7f) * factor;
+      factor *= 128;
+    } while (byte & 0x80);
+    return value;
+  }
+
+  let id = 0;
+  let i = 0;
+  while (i < size && offset < bytes.length) {
+    const cellSize = readVarint();
+    values[i++] = cellSize;
+    for (let k = 0; k < cellSize; k++) {
+      const zigzag = readVarint();
+      id += zigzag % 2 ? -(zigzag + 1) / 2 : zigzag / 2;
+      values[i++] = id;
+    }
+  }
+
+  if (i !== size || offset !== bytes.length) {
+    throw new Error(
+      `Invalid cellVarint encoded content: got ${i} values, instead of ${size}`
+    );
+  }
+  return values;
+}
+
+// ----------------------------------------------------------------------------
+// quantize (lossy): ref.quantizedType integers q of each value, decoded as
+// ref.offset[c] + q * ref.scale[c] for the component c of the value
+// ----------------------------------------------------------------------------
+
+function decodeQuantized(ref, buffer, { dataType, numberOfComponents, size }) {
+  const { quantizedType, offset, scale, encode } = ref;
+  checkSize(buffer, size * DataTypeByteSize[quantizedType], 'quantize');
+
+  const quantized = readSection(buffer, 0, quantizedType, size, encode);
+  const values = macro.newTypedArray(dataType, size);
+  for (let i = 0; i < size; i += numberOfComponents) {
+    for (let c = 0; c < numberOfComponents; c++) {
+      values[i + c] = offset[c] + quantized[i + c] * scale[c];
+    }
+  }
+  return values;
+}
+
+// ----------------------------------------------------------------------------
+// octahedral (lossy): unit normals projected on the octahedron |x|+|y|+|z|=1
+// with its lower half folded on the corners, stored as 2 ref.quantizedType
+// integers mapping [-1, 1] to the full range of the type
+// ----------------------------------------------------------------------------
+
+function decodeOctahedral(ref, buffer, { dataType, size }) {
+  const { quantizedType, encode } = ref;
+  const count = size / 3;
+  checkSize(buffer, 2 * count * DataTypeByteSize[quantizedType], 'octahedral');
+
+  const quantized = readSection(buffer, 0, quantizedType, 2 * count, encode);
+  const factor = 2 / (2 ** (8 * DataTypeByteSize[quantizedType]) - 1);
+  const values = macro.newTypedArray(dataType, size);
+  for (let i = 0; i < count; i++) {
+    let u = quantized[2 * i] * factor - 1;
+    let v = quantized[2 * i + 1] * factor - 1;
+    const z = 1 - Math.abs(u) - Math.abs(v);
+    if (z < 0) {
+      const foldedU = (1 - Math.abs(v)) * (u < 0 ? -1 : 1);
+      v = (1 - Math.abs(u)) * (v < 0 ? -1 : 1);
+      u = foldedU;
+    }
+    const length = Math.sqrt(u * u + v * v + z * z);
+    values[3 * i] = u / length;
+    values[3 * i + 1] = v / length;
+    values[3 * i + 2] = z / length;
+  }
+  return values;
+}
+
+// ----------------------------------------------------------------------------
+
+const ENCODINGS = {
+  constant: decodeConstant,
+  rle: decodeRunLength,
+  palette: decodePalette,
+  cellVarint: decodeCellVarint,
+  quantize: decodeQuantized,
+  octahedral: decodeOctahedral,
+};
+
+export function hasEncoding(name) {
+  return !!ENCODINGS[name];
+}
+
+export function decode(ref, buffer, array) {
+  if (!hasEncoding(ref.encoding)) {
+    throw new Error(
+      `Unknown array encoding "${
+        ref.encoding
+      }". Supported encodings are: [${Object.keys(ENCODINGS).join(', ')}]`
+    );
+  }
+  return ENCODINGS[ref.encoding](ref, buffer, array);
+}
+
+export default {
+  hasEncoding,
+  decode,
+};
@@ -0,0 +1,110 @@
+import { it, expect } from 'vitest';
+import ArrayEncodingHelper from 'vtk.js/Sources/IO/Core/ArrayEncodingHelper';
+
+function concat(...arrays) {
+  const bytes = arrays.map((a) => new Uint8Array(a.buffer));
+  const output = new Uint8Array(bytes.reduce((s, b) => s + b.length, 0));
+  bytes.reduce((offset, b) => {
+    output.set(b, offset);
+    return offset + b.length;
+  }, 0);
+  return output.buffer;
+}
+
+function decode(ref, buffer, dataType, numberOfComponents, size) {
+  const array = { dataType, numberOfComponents, size };
+  const values = ArrayEncodingHelper.decode(
+    { encode: 'LittleEndian', ...ref },
+    buffer,
+    array
+  );
+  return Array.from(values);
+}
+
+it('ArrayEncodingHelper expands constant arrays', () => {
+  const tuple = { encoding: 'constant', value: [1, 2, 3] };
+  const values = decode(tuple, undefined, 'Int16Array', 3, 6);
+  expect(values).toEqual([1, 2, 3, 1, 2, 3]);
+
+  const scalar = { encoding: 'constant', value: [0.5] };
+  expect(decode(scalar, undefined, 'Float32Array', 1, 3)).toEqual([
+    0.5, 0.5, 0.5,
+  ]);
+});
+
+it('ArrayEncodingHelper expands run-length encoded arrays', () => {
+  const buffer = concat(
+    new Uint32Array([3, 1, 2]),
+    new Uint8Array([7, 0, 255])
+  );
+  const runs = { encoding: 'rle', runs: 3 };
+  expect(decode(runs, buffer, 'Uint8Array', 1, 6)).toEqual([
+    7, 7, 7, 0, 255, 255,
+  ]);
+
+  const tuples = concat(
+    new Uint32Array([2, 1]),
+    new Int32Array([1, -1, 5, 6])
+  );
+  const tupleRuns = { encoding: 'rle', runs: 2 };
+  expect(decode(tupleRuns, tuples, 'Int32Array', 2, 6)).toEqual([
+    1, -1, 1, -1, 5, 6,
+  ]);
+});
+
+it('ArrayEncodingHelper expands palette encoded arrays', () => {
+  const buffer = concat(
+    new Int32Array([-70000, 12, 30000]),
+    new Uint8Array([2, 0, 0, 1, 2])
+  );
+  const ref = { encoding: 'palette', paletteSize: 3 };
+  expect(decode(ref, buffer, 'Int32Array', 1, 5)).toEqual([
+    30000, -70000, -70000, 12, 30000,
+  ]);
+});
+
+it('ArrayEncodingHelper expands varint encoded cells', () => {
+  // Two triangles then a vertex whose id delta needs two varint bytes
+  const buffer = concat(new Uint8Array([3, 0, 2, 2, 3, 0, 1, 4, 1, 210, 4]));
+  const ref = { encoding: 'cellVarint' };
+  expect(decode(ref, buffer, 'Uint16Array', 1, 10)).toEqual([
+    3, 0, 1, 2, 3, 2, 1, 3, 1, 300,
+  ]);
+  expect(() => decode(ref, buffer, 'Uint16Array', 1, 11)).toThrow();
+});
+
+it('ArrayEncodingHelper dequantizes float arrays', () => {
+  const buffer = concat(new Uint8Array([0, 255, 51, 0, 255, 255]));
+  const ref = {
+    encoding: 'quantize',
+    quantizedType: 'Uint8Array',
+    offset: [-1, 10],
+    scale: [2 / 255, 0],
+  };
+  const values = decode(ref, buffer, 'Float32Array', 2, 6);
+  expect(values[0]).toBe(-1);
+  expect(values[2]).toBeCloseTo(-0.6, 6);
+  expect(values[4]).toBeCloseTo(1, 6);
+  expect([values[1], values[3], values[5]]).toEqual([10, 10, 10]);
+});
+
+it('ArrayEncodingHelper decodes octahedral normals', () => {
+  // +z, -z (folded on a corner), +x and -y
+  const buffer = concat(
+    new Uint16Array([32768, 32768, 65535, 65535, 65535, 32768, 32768, 0])
+  );
+  const ref = { encoding: 'octahedral', quantizedType: 'Uint16Array' };
+  const values = decode(ref, buffer, 'Float32Array', 3, 12);
+  const expected = [0, 0, 1, 0, 0, -1, 1, 0, 0, 0, -1, 0];
+  values.forEach((value, i) => expect(value).toBeCloseTo(expected[i], 4));
+});
+
+it('ArrayEncodingHelper rejects invalid content', () => {
+  expect(ArrayEncodingHelper.hasEncoding('rle')).toBe(true);
+  expect(ArrayEncodingHelper.hasEncoding('unknown')).toBe(false);
+  const buffer = concat(new Uint32Array([2]), new Uint8Array([1]));
+  const runs = { encoding: 'rle', runs: 1 };
+  expect(() => decode(runs, buffer, 'Uint8Array', 1, 3)).toThrow();
+  const unknown = { encoding: 'unknown' };
+  expect(() => decode(unknown, buffer, 'Uint8Array', 1, 3)).toThrow();
+});
@@ -0,0 +1,43 @@
+export interface IUnfilterOptions {
+  /** Size in bytes of an array element */
+  elementSize: number;
+  /** Number of components of the array, used by 'delta' and 'xor' */
+  numberOfComponents?: number;
+  /** Byte order of the elements ('LittleEndian' or 'BigEndian') */
+  encode?: string;
+}
+
+/**
+ * Number of elements bit-transposed together by the 'bitshuffle' filter.
+ */
+export const BITSHUFFLE_BLOCK_SIZE: number;
+
+/**
+ * Return true if the given filter can be undone.
+ *
+ * Supported filters are 'shuffle', 'bitshuffle', 'delta' and 'xor'.
+ *
+ * @param {String} name
+ */
+export function hasFilter(name: string): boolean;
+
+/**
+ * Undo the filters applied to an array content before its compression.
+ *
+ * @param {String[]} filters Filters in the order they were applied (ref.filters)
+ * @param {ArrayBuffer} buffer Filtered content, may be reused for the result
+ * @param {IUnfilterOptions} options
+ */
+export function unfilter(
+  filters: string[],
+  buffer: ArrayBuffer,
+  options: IUnfilterOptions
+): ArrayBuffer;
+
+export declare const ArrayFilterHelper: {
+  BITSHUFFLE_BLOCK_SIZE: typeof BITSHUFFLE_BLOCK_SIZE;
+  hasFilter: typeof hasFilter;
+  unfilter: typeof unfilter;
+};
+
+export default ArrayFilterHelper;
@@ -0,0 +1,173 @@
+import Endian from 'vtk.js/Sources/Common/Core/Endian';
+
+// ----------------------------------------------------------------------------
+// Reversible filters applied to array content before compression.
+// Filters are listed in ref.filters in the order they were applied and are
+// undone in reverse order. Element values keep the byte order of ref.encode.
+// ----------------------------------------------------------------------------
+
+// Number of elements bit-transposed together by 'bitshuffle'
+export const BITSHUFFLE_BLOCK_SIZE = 8192;
+
+// ----------------------------------------------------------------------------
+// shuffle: byte k of every element is stored in the k-th plane
+// ----------------------------------------------------------------------------
+
+function unshuffle(bytes, elementSize) {
+  const count = bytes.length / elementSize;
+  const output = new Uint8Array(bytes.length);
+  for (let k = 0; k < elementSize; k++) {
+    const plane = k * count;
+    for (let i = 0; i < count; i++) {
+      output[i * elementSize + k] = bytes[plane + i];
+    }
+  }
+  return output;
+}
+
+// ----------------------------------------------------------------------------
+// bitshuffle: inside each block, bit j of every element is stored in the j-th
+// bit plane. Trailing elements (less than 8) of the last block are left as-is.
+// ----------------------------------------------------------------------------
+
+function unbitshuffleBlock(bytes, output, start, count, elementSize) {
+  const planeSize = count >> 3;
+  const nbPlanes = elementSize * 8;
+  for (let j = 0; j < nbPlanes; j++) {
+    const plane = start + j * planeSize;
+    const byteOffset = start + (j >> 3);
+    const bit = j & 7;
+    for (let p = 0; p < planeSize; p++) {
+      const value = bytes[plane + p];
+      if (value) {
+        for (let b = 0; b < 8; b++) {
+          if (value & (1 << b)) {
+            output[byteOffset + ((p << 3) + b) * elementSize] |= 1 << bit;
+          }
+        }
+      }
+    }
+  }
+}
+
+function unbitshuffle(bytes, elementSize) {
+  const output = new Uint8Array(bytes.length);
+  const nbElements = bytes.length / elementSize;
+  for (let i = 0; i < nbElements; i += BITSHUFFLE_BLOCK_SIZE) {
+    const blockSize = Math.min(BITSHUFFLE_BLOCK_SIZE, nbElements - i);
+    const count = blockSize - (blockSize % 8);
+    unbitshuffleBlock(bytes, output, i * elementSize, count, elementSize);
+    const tail = (i + count) * elementSize;
+    output.set(bytes.subarray(tail, (i + blockSize) * elementSize), tail);
+  }
+  return output;
+}
+
+// ----------------------------------------------------------------------------
+// delta / xor: each element minus (or xor) the same component of the previous
+// tuple, computed on the unsigned integer with the element bits.
+// ----------------------------------------------------------------------------
+
+function undeltaBytes(bytes, elementSize, stride, littleEndian) {
+  const offset = stride * elementSize;
+  for (let i = offset; i < bytes.length; i += elementSize) {
+    let carry = 0;
+    for (let k = 0; k < elementSize; k++) {
+      const idx = i + (littleEndian ? k : elementSize - 1 - k);
+      const sum = bytes[idx] + bytes[idx - offset] + carry;
+      bytes[idx] = sum;
+      carry = sum >> 8;
+    }
+  }
+}
+
+function undelta(bytes, elementSize, stride, littleEndian) {
+  if (littleEndian !== (Endian.ENDIANNESS === 'LittleEndian')) {
+    undeltaBytes(bytes, elementSize, stride, littleEndian);
+    return bytes;
+  }
+
+  if (elementSize === 8) {
+    // 64 bit sums as two 32 bit words with carry
+    const words = new Uint32Array(bytes.buffer);
+    const lo = littleEndian ? 0 : 1;
+    const hi = 1 - lo;
+    for (let i = 2 * stride; i < words.length; i += 2) {
+      const sum = words[i + lo] + words[i + lo - 2 * stride];
+      words[i + hi] += words[i + hi - 2 * stride] + (sum > 0xffffffff ? 1 : 0);
+      words[i + lo] = sum;
+    }
+    return bytes;
+  }
+
+  const TypedArray = { 1: Uint8Array, 2: Uint16Array, 4: Uint32Array }[
+    elementSize
+  ];
+  const values = new TypedArray(bytes.buffer);
+  for (let i = stride; i < values.length; i++) {
+    values[i] += values[i - stride];
+  }
+  return bytes;
+}
+
+function unxor(bytes, elementSize, stride) {
+  // Byte wise, so independent of the byte order
+  const offset = stride * elementSize;
+  for (let i = offset; i < bytes.length; i++) {
+    bytes[i] ^= bytes[i - offset];
+  }
+  return bytes;
+}
+
+// ----------------------------------------------------------------------------
+
+const FILTERS = {
+  shuffle: (bytes, { elementSize }) => unshuffle(bytes, elementSize),
+  bitshuffle: (bytes, { elementSize }) => unbitshuffle(bytes, elementSize),
+  delta: (bytes, { elementSize, numberOfComponents, littleEndian }) =>
+    undelta(bytes, elementSize, numberOfComponents, littleEndian),
+  xor: (bytes, { elementSize, numberOfComponents }) =>
+    unxor(bytes, elementSize, numberOfComponents),
+};
+
+export function hasFilter(name) {
+  return !!FILTERS[name];
+}
+
+export function unfilter(
+  filters,
+  buffer,
+  { elementSize, numberOfComponents = 1, encode = Endian.ENDIANNESS }
+) {
+  const options = {
+    elementSize,
+    numberOfComponents,
+    littleEndian: encode === 'LittleEndian',
+  };
+
+  let bytes = new Uint8Array(buffer);
+  if (bytes.length % elementSize) {
+    throw new Error(
+      `Filtered content of ${bytes.length} bytes is not made of ${elementSize} bytes elements`
+    );
+  }
+
+  for (let i = filters.length - 1; i >= 0; i--) {
+    if (!hasFilter(filters[i])) {
+      throw new Error(
+        `Unknown array filter "${filters[i]}". Supported filters are: [${Object.keys(
+          FILTERS
+        ).join(', ')}]`
+      );
+    }
+    bytes = FILTERS[filters[i]](bytes, options);
+  }
+
+  return bytes.buffer;
+}
+
+export default {
+  BITSHUFFLE_BLOCK_SIZE,
+  hasFilter,
+  unfilter,
+};
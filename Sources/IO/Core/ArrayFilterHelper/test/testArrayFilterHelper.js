@@ -0,0 +1,63 @@
+import { it, expect } from 'vitest';
+import ArrayFilterHelper from 'vtk.js/Sources/IO/Core/ArrayFilterHelper';
+
+// Filtered content as written by Utilities/DataGenerator/vtk-data-converter.py
+const FLOAT32_VALUES = [1.5, 2.5, 3.5, -4.0, 10.25, 11.0];
+const FLOAT32_FILTERED = {
+  shuffle: [
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 192, 32, 96, 128, 36, 48, 63, 64, 64,
+    192, 65, 65,
+  ],
+  delta: [
+    0, 0, 192, 63, 0, 0, 32, 64, 0, 0, 160, 0, 0, 0, 96, 128, 0, 0, 196, 0, 0,
+    0, 176, 128,
+  ],
+  'xor,shuffle': [
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 192, 32, 160, 160, 68, 176, 63, 64, 127,
+    128, 1, 129,
+  ],
+};
+
+function unfilter(filters, bytes, elementSize, numberOfComponents) {
+  return ArrayFilterHelper.unfilter(filters, new Uint8Array(bytes).buffer, {
+    elementSize,
+    numberOfComponents,
+    encode: 'LittleEndian',
+  });
+}
+
+it('ArrayFilterHelper undoes shuffle, delta and xor', () => {
+  Object.entries(FLOAT32_FILTERED).forEach(([filters, bytes]) => {
+    const buffer = unfilter(filters.split(','), bytes, 4, 2);
+    expect(Array.from(new Float32Array(buffer))).toEqual(FLOAT32_VALUES);
+  });
+});
+
+it('ArrayFilterHelper undoes bitshuffle', () => {
+  // 16 bit-transposed elements followed by 4 trailing elements left as-is
+  const bytes = [
+    170, 170, 102, 102, 180, 180, 199, 56, 248, 192, 255, 0, 255, 0, 255, 0,
+    255, 0, 255, 0, 0, 255, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 24, 4, 27, 4, 30, 4,
+    33, 4,
+  ];
+  const values = new Uint16Array(unfilter(['bitshuffle'], bytes, 2, 1));
+  expect(Array.from(values)).toEqual(
+    Array.from({ length: 20 }, (v, i) => 1000 + 3 * i)
+  );
+});
+
+it('ArrayFilterHelper undoes 64 bit delta', () => {
+  const bytes = [
+    156, 117, 0, 136, 60, 228, 55, 126, 100, 138, 255, 119, 195, 27, 204, 65, 0,
+    0, 0, 0, 0, 0, 6, 128, 89, 243, 248, 194, 31, 110, 155, 193,
+  ];
+  const values = new Float64Array(unfilter(['delta'], bytes, 8, 1));
+  expect(Array.from(values)).toEqual([1e300, -2.5, 3.25, 1e-300]);
+});
+
+it('ArrayFilterHelper rejects unknown filters', () => {
+  expect(ArrayFilterHelper.hasFilter('shuffle')).toBe(true);
+  expect(ArrayFilterHelper.hasFilter('unknown')).toBe(false);
+  expect(() => unfilter(['unknown'], [0, 0, 0, 0], 4, 1)).toThrow();
+  expect(() => unfilter(['shuffle'], [0, 0, 0], 4, 1)).toThrow();
+});
@@ -0,0 +1,69 @@
+export type DecompressFunction = (
+  data: Uint8Array,
+  output?: Uint8Array
+) => Uint8Array;
+
+/**
+ * Register (or replace) the decoder used for a compression algorithm.
+ *
+ * 'gz' and 'lz4' are built in, which are the codecs vtk-data-converter.py
+ * writes. Arrays compressed by other tools with 'zstd', 'br' or any other
+ * algorithm need a decoder to be registered by the application, otherwise
+ * reading them throws.
+ *
+ * The decoder receives the compressed bytes and, when the decompressed size
+ * is known, the array to fill. It returns the decompressed bytes.
+ *
+ * @param {String} name Compression name as written in the array ref
+ * @param {DecompressFunction} decompress
+ * @param {String} [extension] File extension of the compressed array
+ * @example
+ * ```js
+ * import { decompress } from 'fzstd';
+ * import CompressionHelper from '@kitware/vtk.js/IO/Core/CompressionHelper';
+ *
+ * CompressionHelper.registerCodec('zstd', decompress, '.zst');
+ * ```
+ */
+export function registerCodec(
+  name: string,
+  decompress: DecompressFunction,
+  extension?: string
+): void;
+
+/**
+ * Return true if a decoder is available for the given compression.
+ *
+ * @param {String} name
+ */
+export function hasCodec(name: string): boolean;
+
+/**
+ * Return the file extension (including the dot) of compressed arrays.
+ *
+ * @param {String} name
+ */
+export function getExtension(name: string): string;
+
+/**
+ * Decompress the given data. The returned array owns its whole buffer unless
+ * an output array is provided, in which case it is filled and returned.
+ *
+ * @param {String} name
+ * @param {Uint8Array} data
+ * @param {Uint8Array} [output] Array of the exact decompressed size
+ */
+export function decompress(
+  name: string,
+  data: Uint8Array,
+  output?: Uint8Array
+): Uint8Array;
+
+export declare const CompressionHelper: {
+  registerCodec: typeof registerCodec;
+  hasCodec: typeof hasCodec;
+  getExtension: typeof getExtension;
+  decompress: typeof decompress;
+};
+
+export default CompressionHelper;
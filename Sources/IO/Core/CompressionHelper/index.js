@@ -0,0 +1,197 @@
+import { decompressSync } from 'fflate';
+
+// ----------------------------------------------------------------------------
+// LZ4 frame format
+// https://github.com/lz4/lz4/blob/dev/doc/lz4_Frame_format.md
+// ----------------------------------------------------------------------------
+
+const LZ4_MAGIC = 0x184d2204;
+const LZ4_FLAG_DICTIONARY_ID = 0x01;
+const LZ4_FLAG_CONTENT_CHECKSUM = 0x04;
+const LZ4_FLAG_CONTENT_SIZE = 0x08;
+const LZ4_FLAG_BLOCK_CHECKSUM = 0x10;
+const LZ4_UNCOMPRESSED_BLOCK = 0x80000000;
+
+function reserve(output, size) {
+  const needed = output.length + size;
+  if (needed > output.data.length) {
+    const data = new Uint8Array(Math.max(needed, output.data.length * 2));
+    data.set(output.data.subarray(0, output.length));
+    output.data = data;
+  }
+}
+
+function decodeLZ4Block(input, start, end, output) {
+  let i = start;
+  while (i < end) {
+    const token = input[i++];
+
+    // Literals
+    let literalLength = token >> 4;
+    if (literalLength === 15) {
+      let value = 255;
+      while (value === 255) {
+        value = input[i++];
+        literalLength += value;
+      }
+    }
+    reserve(output, literalLength);
+    output.data.set(input.subarray(i, i + literalLength), output.length);
+    output.length += literalLength;
+    i += literalLength;
+
+    // The last sequence of a block only holds literals
+    if (i >= end) {
+      break;
+    }
+
+    // Match (may overlap with the bytes it produces)
+    const offset = input[i] | (input[i + 1] << 8);
+    i += 2;
+    let matchLength = token & 15;
+    if (matchLength === 15) {
+      let value = 255;
+      while (value === 255) {
+        value = input[i++];
+        matchLength += value;
+      }
+    }
+    matchLength += 4;
+    reserve(output, matchLength);
+    const { data } = output;
+    let src = output.length - offset;
+    let dst = output.length;
+    for (let k = 0; k < matchLength; k++) {
+      data[dst++] = data[src++];
+    }
+    output.length = dst;
+  }
+}
+
+function decompressLZ4(input, out) {
+  const view = new DataView(input.buffer, input.byteOffset, input.byteLength);
+  const output = { data: out || null, length: 0 };
+  let i = 0;
+
+  // A stream can be made of several concatenated frames
+  while (i < input.length) {
+    if (view.getUint32(i, true) !== LZ4_MAGIC) {
+      throw new Error('Invalid LZ4 frame');
+    }
+    const flags = input[i + 4];
+    i += 6; // magic + FLG + BD
+
+    let contentSize = 0;
+    if (flags & LZ4_FLAG_CONTENT_SIZE) {
+      contentSize = Number(view.getBigUint64(i, true));
+      i += 8;
+    }
+    if (flags & LZ4_FLAG_DICTIONARY_ID) {
+      i += 4;
+    }
+    i += 1; // header checksum
+
+    if (!output.data) {
+      output.data = new Uint8Array(contentSize || 4 * input.length + 64);
+    } else {
+      reserve(output, contentSize);
+    }
+
+    let blockSize = view.getUint32(i, true);
+    i += 4;
+    while (blockSize) {
+      const size = blockSize & ~LZ4_UNCOMPRESSED_BLOCK;
+      if (blockSize & LZ4_UNCOMPRESSED_BLOCK) {
+        reserve(output, size);
+        output.data.set(input.subarray(i, i + size), output.length);
+        output.length += size;
+      } else {
+        decodeLZ4Block(input, i, i + size, output);
+      }
+      i += size;
+      if (flags & LZ4_FLAG_BLOCK_CHECKSUM) {
+        i += 4;
+      }
+      blockSize = view.getUint32(i, true);
+      i += 4;
+    }
+
+    if (flags & LZ4_FLAG_CONTENT_CHECKSUM) {
+      i += 4;
+    }
+  }
+
+  if (!output.data) {
+    return new Uint8Array(0);
+  }
+  return output.data.length === output.length
+    ? output.data
+    : output.data.slice(0, output.length);
+}
+
+// ----------------------------------------------------------------------------
+// Codec registry
+// ----------------------------------------------------------------------------
+
+const CODECS = {
+  gz: { extension: '.gz', decompress: decompressSync },
+  lz4: { extension: '.lz4', decompress: decompressLZ4 },
+  // Need a decoder to be registered (e.g. fzstd, brotli-wasm)
+  zstd: { extension: '.zst', decompress: null },
+  br: { extension: '.br', decompress: null },
+};
+
+export function registerCodec(name, decompress, extension = `.${name}`) {
+  CODECS[name] = { extension, decompress };
+}
+
+export function hasCodec(name) {
+  return !!CODECS[name]?.decompress;
+}
+
+export function getExtension(name) {
+  if (!name) {
+    return '';
+  }
+  return CODECS[name] ? CODECS[name].extension : `.${name}`;
+}
+
+export function decompress(name, uint8array, output) {
+  if (!hasCodec(name)) {
+    throw new Error(
+      `No decoder registered for compression "${name}". Supported algorithms are: [${Object.keys(
+        CODECS
+      )
+        .filter(hasCodec)
+        .join(', ')}]. Use CompressionHelper.registerCodec('${name}', decompressFn) to add one.`
+    );
+  }
+
+  const result = CODECS[name].decompress(uint8array, output);
+
+  // Decompress into the provided array (e.g. a chunk of a larger buffer)
+  if (output) {
+    if (result !== output) {
+      if (result.length !== output.length) {
+        throw new Error(
+          `Decompressed ${result.length} bytes instead of ${output.length}`
+        );
+      }
+      output.set(result);
+    }
+    return output;
+  }
+
+  // Make sure the result buffer only holds the decompressed bytes
+  if (result.byteOffset || result.byteLength !== result.buffer.byteLength) {
+    return result.slice();
+  }
+  return result;
+}
+
+export default {
+  registerCodec,
+  hasCodec,
+  getExtension,
+  decompress,
+};
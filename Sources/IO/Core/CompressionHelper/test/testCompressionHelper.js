@@ -0,0 +1,71 @@
+import { it, expect } from 'vitest';
+import { gzipSync, strToU8, strFromU8 } from 'fflate';
+import CompressionHelper from 'vtk.js/Sources/IO/Core/CompressionHelper';
+
+// lz4.frame: 'abcdabcdabcdabcdabcdabcdabcd0123456789ab' with content size
+const LZ4_FRAME = [
+  4, 34, 77, 24, 72, 64, 40, 0, 0, 0, 0, 0, 0, 0, 144, 21, 0, 0, 0, 79, 97, 98,
+  99, 100, 4, 0, 5, 192, 48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 97, 98, 0, 0,
+  0, 0,
+];
+
+it('CompressionHelper decodes gzip', () => {
+  const values = new Float32Array([1, 2, 3, 4.5]);
+  const decoded = CompressionHelper.decompress(
+    'gz',
+    gzipSync(new Uint8Array(values.buffer))
+  );
+  expect(Array.from(new Float32Array(decoded.buffer))).toEqual([1, 2, 3, 4.5]);
+});
+
+it('CompressionHelper decodes lz4 frames', () => {
+  const frame = new Uint8Array(LZ4_FRAME);
+  const decoded = CompressionHelper.decompress('lz4', frame);
+  expect(strFromU8(decoded)).toBe('abcdabcdabcdabcdabcdabcdabcd0123456789ab');
+  expect(decoded.byteLength).toBe(decoded.buffer.byteLength);
+
+  // Concatenated frames form a single stream
+  const twoFrames = new Uint8Array(2 * frame.length);
+  twoFrames.set(frame);
+  twoFrames.set(frame, frame.length);
+  expect(CompressionHelper.decompress('lz4', twoFrames).length).toBe(80);
+});
+
+it('CompressionHelper decodes into a provided array', () => {
+  const values = new Float32Array([1, 2, 3, 4.5]);
+  const buffer = new ArrayBuffer(24);
+  const output = new Uint8Array(buffer, 8, 16);
+  const decoded = CompressionHelper.decompress(
+    'gz',
+    gzipSync(new Uint8Array(values.buffer)),
+    output
+  );
+  expect(decoded).toBe(output);
+  expect(Array.from(new Float32Array(buffer, 8, 4))).toEqual([1, 2, 3, 4.5]);
+
+  const frame = new Uint8Array(LZ4_FRAME);
+  expect(() =>
+    CompressionHelper.decompress('lz4', frame, new Uint8Array(10))
+  ).toThrow();
+  const text = new Uint8Array(40);
+  CompressionHelper.decompress('lz4', frame, text);
+  expect(strFromU8(text)).toBe('abcdabcdabcdabcdabcdabcdabcd0123456789ab');
+});
+
+it('CompressionHelper requires a registered decoder', () => {
+  expect(CompressionHelper.hasCodec('zstd')).toBe(false);
+  expect(CompressionHelper.getExtension('zstd')).toBe('.zst');
+  expect(() => CompressionHelper.decompress('zstd', strToU8('x'))).toThrow();
+
+  const data = strToU8('prefix-payload');
+  CompressionHelper.registerCodec(
+    'test',
+    (input) => input.subarray(7),
+    '.tst'
+  );
+  expect(CompressionHelper.getExtension('test')).toBe('.tst');
+  const decoded = CompressionHelper.decompress('test', data);
+  expect(strFromU8(decoded)).toBe('payload');
+  expect(decoded.byteOffset).toBe(0);
+  expect(decoded.buffer.byteLength).toBe(7);
+});
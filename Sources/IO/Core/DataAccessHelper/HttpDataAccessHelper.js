@@ -1,6 +1,9 @@
-import { decompressSync, strFromU8 } from 'fflate';
+import { strFromU8 } from 'fflate';
 
 import macro from 'vtk.js/Sources/macros';
+import ArrayEncodingHelper from 'vtk.js/Sources/IO/Core/ArrayEncodingHelper';
+import ArrayFilterHelper from 'vtk.js/Sources/IO/Core/ArrayFilterHelper';
+import CompressionHelper from 'vtk.js/Sources/IO/Core/CompressionHelper';
 import Endian from 'vtk.js/Sources/Common/Core/Endian';
 import { DataTypeByteSize } from 'vtk.js/Sources/Common/Core/DataArray/Constants';
 import { registerType } from 'vtk.js/Sources/IO/Core/DataAccessHelper';
@@ -28,11 +31,14 @@ function openAsyncXHR(method, url, options = {}) {
   return xhr;
 }
 
-function fetchBinary(url, options = {}) {
-  if (options && options.compression && options.compression !== 'gz') {
-    vtkErrorMacro('Supported algorithms are: [gz]');
-    vtkErrorMacro(`Unkown compression algorithm: ${options.compression}`);
+function checkCompression(compression) {
+  if (compression && !CompressionHelper.hasCodec(compression)) {
+    vtkErrorMacro(`Unkown compression algorithm: ${compression}`);
   }
+}
+
+function fetchBinary(url, options = {}) {
+  checkCompression(options?.compression);
 
   return new Promise((resolve, reject) => {
     const xhr = openAsyncXHR('GET', url, options);
@@ -41,7 +47,12 @@ function fetchBinary(url, options = {}) {
       if (xhr.readyState === 4) {
         if (xhr.status === 200 || xhr.status === 0) {
           if (options.compression) {
-            resolve(decompressSync(new Uint8Array(xhr.response)).buffer);
+            resolve(
+              CompressionHelper.decompress(
+                options.compression,
+                new Uint8Array(xhr.response)
+              ).buffer
+            );
           } else {
             resolve(xhr.response);
           }
@@ -57,22 +68,199 @@ function fetchBinary(url, options = {}) {
   });
 }
 
-function fetchArray(instance, baseURL, array, options = {}) {
-  if (array.ref && !array.ref.pending) {
-    return new Promise((resolve, reject) => {
-      let url = null;
+function getBlobRequest(baseURL, basepath, id, compression, options) {
+  const blob = options.pack?.blobs[id];
+  if (blob) {
+    // Range request in the pack file of the dataset
+    const range = `bytes=${blob.offset}-${blob.offset + blob.length - 1}`;
+    return {
+      blob,
+      url: [baseURL, options.pack.url].join('/'),
+      options: { ...options, headers: { ...options.headers, Range: range } },
+    };
+  }
+
+  return {
+    url: [
+      baseURL,
+      basepath,
+      `${id}${CompressionHelper.getExtension(compression)}`,
+    ].join('/'),
+    options,
+  };
+}
+
+function isSuccess(xhr) {
+  return xhr.status === 200 || xhr.status === 206 || xhr.status === 0;
+}
+
+function getBlobResponse(xhr, blob) {
+  // Servers ignoring the range send the whole pack
+  if (blob && xhr.status !== 206) {
+    return xhr.response.slice(blob.offset, blob.offset + blob.length);
+  }
+  return xhr.response;
+}
+
+// ----------------------------------------------------------------------------
+
+function decodeArray(array) {
+  if (array.ref.filters) {
+    array.buffer = ArrayFilterHelper.unfilter(array.ref.filters, array.buffer, {
+      elementSize: DataTypeByteSize[array.dataType],
+      numberOfComponents: array.numberOfComponents,
+      encode: array.ref.encode,
+    });
+  }
 
-      if (array.ref.url) {
-        url = array.ref.url;
-      } else {
-        url = [
+  if (array.ref.encoding) {
+    array.values = ArrayEncodingHelper.decode(array.ref, array.buffer, array);
+  } else if (array.ref.encode === 'JSON') {
+    array.values = JSON.parse(array.buffer);
+  } else {
+    if (Endian.ENDIANNESS !== array.ref.encode && Endian.ENDIANNESS) {
+      // Need to swap bytes
+      vtkDebugMacro(`Swap bytes of ${array.name}`);
+      Endian.swapBytes(array.buffer, DataTypeByteSize[array.dataType]);
+    }
+
+    array.values = macro.newTypedArray(array.dataType, array.buffer);
+  }
+
+  if (array.values.length !== array.size) {
+    vtkErrorMacro(
+      `Error in FetchArray: ${array.name}, does not have the proper array size. Got ${array.values.length}, instead of ${array.size}`
+    );
+  }
+}
+
+// ----------------------------------------------------------------------------
+
+function fetchChunk(request, compression, output) {
+  return new Promise((resolve, reject) => {
+    const xhr = openAsyncXHR('GET', request.url, request.options);
+
+    xhr.onreadystatechange = (e) => {
+      if (xhr.readyState === 4) {
+        if (isSuccess(xhr)) {
+          try {
+            // Decode in place, while the other chunks are downloading
+            const response = getBlobResponse(xhr, request.blob);
+            if (compression) {
+              CompressionHelper.decompress(
+                compression,
+                new Uint8Array(response),
+                output
+              );
+            } else {
+              output.set(new Uint8Array(response));
+            }
+            resolve();
+          } catch (error) {
+            reject(error);
+          }
+        } else {
+          reject({ xhr, e });
+        }
+      }
+    };
+
+    // Make request
+    xhr.responseType = 'arraybuffer';
+    xhr.send();
+  });
+}
+
+function fetchChunkedArray(instance, baseURL, array, options) {
+  const compression = array.ref.compression || options.compression;
+  const { chunks } = array.ref;
+  const last = chunks[chunks.length - 1];
+
+  // Chunks are fetched in parallel and decompressed into their final location
+  const buffer = new ArrayBuffer(last ? last.offset + last.size : 0);
+  array.ref.pending = true;
+  if (++requestCount === 1 && instance?.invokeBusy) {
+    instance.invokeBusy(true);
+  }
+
+  return Promise.all(
+    chunks.map((chunk) =>
+      fetchChunk(
+        getBlobRequest(
           baseURL,
           array.ref.basepath,
-          options.compression ? `${array.ref.id}.gz` : array.ref.id,
-        ].join('/');
+          chunk.id,
+          compression,
+          options
+        ),
+        compression,
+        new Uint8Array(buffer, chunk.offset, chunk.size)
+      )
+    )
+  )
+    .then(() => {
+      array.buffer = buffer;
+      decodeArray(array);
+    })
+    .then(
+      () => {
+        // Done with the ref and work
+        delete array.ref;
+        if (--requestCount === 0 && instance?.invokeBusy) {
+          instance.invokeBusy(false);
+        }
+        if (instance?.modified) {
+          instance.modified();
+        }
+        return array;
+      },
+      (error) => {
+        if (error instanceof Error) {
+          vtkErrorMacro(error.message);
+        }
+        array.ref.pending = false;
+        if (--requestCount === 0 && instance?.invokeBusy) {
+          instance.invokeBusy(false);
+        }
+        return Promise.reject(error);
       }
+    );
+}
 
-      const xhr = openAsyncXHR('GET', url, options);
+function decodeConstantArray(instance, array) {
+  // Values are described by the ref, nothing to fetch
+  decodeArray(array);
+  delete array.ref;
+  if (instance?.modified) {
+    instance.modified();
+  }
+  return Promise.resolve(array);
+}
+
+function fetchArray(instance, baseURL, array, options = {}) {
+  if (array.ref && array.ref.encoding === 'constant') {
+    return decodeConstantArray(instance, array);
+  }
+
+  if (array.ref && array.ref.chunks && !array.ref.pending) {
+    return fetchChunkedArray(instance, baseURL, array, options);
+  }
+
+  if (array.ref && !array.ref.pending) {
+    return new Promise((resolve, reject) => {
+      // Compression recorded on the array takes precedence over the reader one
+      const compression = array.ref.compression || options.compression;
+      const request = array.ref.url
+        ? { url: array.ref.url, options }
+        : getBlobRequest(
+            baseURL,
+            array.ref.basepath,
+            array.ref.id,
+            compression,
+            options
+          );
+
+      const xhr = openAsyncXHR('GET', request.url, request.options);
 
       xhr.onreadystatechange = (e) => {
         if (xhr.readyState === 1) {
@@ -83,40 +271,33 @@ function fetchArray(instance, baseURL, array, options = {}) {
         }
         if (xhr.readyState === 4) {
           array.ref.pending = false;
-          if (xhr.status === 200 || xhr.status === 0) {
-            array.buffer = xhr.response;
+          if (isSuccess(xhr)) {
+            array.buffer = getBlobResponse(xhr, request.blob);
 
-            if (options.compression) {
-              if (array.dataType === 'string' || array.dataType === 'JSON') {
-                array.buffer = strFromU8(
-                  decompressSync(new Uint8Array(array.buffer))
-                );
-              } else {
-                array.buffer = decompressSync(
-                  new Uint8Array(array.buffer)
-                ).buffer;
+            try {
+              if (request.blob && !compression && array.dataType === 'string') {
+                array.buffer = strFromU8(new Uint8Array(array.buffer));
               }
-            }
-
-            if (array.ref.encode === 'JSON') {
-              array.values = JSON.parse(array.buffer);
-            } else {
-              if (Endian.ENDIANNESS !== array.ref.encode && Endian.ENDIANNESS) {
-                // Need to swap bytes
-                vtkDebugMacro(`Swap bytes of ${array.name}`);
-                Endian.swapBytes(
-                  array.buffer,
-                  DataTypeByteSize[array.dataType]
+              if (compression) {
+                const uint8array = CompressionHelper.decompress(
+                  compression,
+                  new Uint8Array(array.buffer)
                 );
+                if (array.dataType === 'string' || array.dataType === 'JSON') {
+                  array.buffer = strFromU8(uint8array);
+                } else {
+                  array.buffer = uint8array.buffer;
+                }
               }
 
-              array.values = macro.newTypedArray(array.dataType, array.buffer);
-            }
-
-            if (array.values.length !== array.size) {
-              vtkErrorMacro(
-                `Error in FetchArray: ${array.name}, does not have the proper array size. Got ${array.values.length}, instead of ${array.size}`
-              );
+              decodeArray(array);
+            } catch (error) {
+              vtkErrorMacro(error.message);
+              if (--requestCount === 0 && instance?.invokeBusy) {
+                instance.invokeBusy(false);
+              }
+              reject(error);
+              return;
             }
 
             // Done with the ref and work
@@ -136,7 +317,7 @@ function fetchArray(instance, baseURL, array, options = {}) {
 
       // Make request
       xhr.responseType =
-        options.compression || array.dataType !== 'string'
+        compression || request.blob || array.dataType !== 'string'
           ? 'arraybuffer'
           : 'text';
       xhr.send();
@@ -166,7 +347,12 @@ function fetchJSON(instance, url, options = {}) {
           if (options.compression) {
             resolve(
               JSON.parse(
-                strFromU8(decompressSync(new Uint8Array(xhr.response)))
+                strFromU8(
+                  CompressionHelper.decompress(
+                    options.compression,
+                    new Uint8Array(xhr.response)
+                  )
+                )
               )
             );
           } else {
@@ -187,10 +373,7 @@ function fetchJSON(instance, url, options = {}) {
 // ----------------------------------------------------------------------------
 
 function fetchText(instance, url, options = {}) {
-  if (options && options.compression && options.compression !== 'gz') {
-    vtkErrorMacro('Supported algorithms are: [gz]');
-    vtkErrorMacro(`Unkown compression algorithm: ${options.compression}`);
-  }
+  checkCompression(options?.compression);
 
   return new Promise((resolve, reject) => {
     const xhr = openAsyncXHR('GET', url, options);
@@ -207,7 +390,14 @@ function fetchText(instance, url, options = {}) {
         }
         if (xhr.status === 200 || xhr.status === 0) {
           if (options.compression) {
-            resolve(strFromU8(decompressSync(new Uint8Array(xhr.response))));
+            resolve(
+              strFromU8(
+                CompressionHelper.decompress(
+                  options.compression,
+                  new Uint8Array(xhr.response)
+                )
+              )
+            );
           } else {
             resolve(xhr.responseText);
           }
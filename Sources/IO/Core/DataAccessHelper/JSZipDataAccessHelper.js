@@ -1,6 +1,9 @@
 import { decompressSync, strFromU8, strToU8, unzipSync } from 'fflate';
 
 import macro from 'vtk.js/Sources/macros';
+import ArrayEncodingHelper from 'vtk.js/Sources/IO/Core/ArrayEncodingHelper';
+import ArrayFilterHelper from 'vtk.js/Sources/IO/Core/ArrayFilterHelper';
+import CompressionHelper from 'vtk.js/Sources/IO/Core/CompressionHelper';
 import Endian from 'vtk.js/Sources/Common/Core/Endian';
 import { DataTypeByteSize } from 'vtk.js/Sources/Common/Core/DataArray/Constants';
 import { registerType } from 'vtk.js/Sources/IO/Core/DataAccessHelper';
@@ -16,6 +19,36 @@ function toMimeType(url) {
   return ext;
 }
 
+function decodeArray(array) {
+  if (array.ref.filters) {
+    array.buffer = ArrayFilterHelper.unfilter(array.ref.filters, array.buffer, {
+      elementSize: DataTypeByteSize[array.dataType],
+      numberOfComponents: array.numberOfComponents,
+      encode: array.ref.encode,
+    });
+  }
+
+  if (array.ref.encoding) {
+    array.values = ArrayEncodingHelper.decode(array.ref, array.buffer, array);
+  } else if (array.ref.encode === 'JSON') {
+    array.values = JSON.parse(array.buffer);
+  } else {
+    if (Endian.ENDIANNESS !== array.ref.encode && Endian.ENDIANNESS) {
+      // Need to swap bytes
+      vtkDebugMacro(`Swap bytes of ${array.name}`);
+      Endian.swapBytes(array.buffer, DataTypeByteSize[array.dataType]);
+    }
+
+    array.values = macro.newTypedArray(array.dataType, array.buffer);
+  }
+
+  if (array.values.length !== array.size) {
+    vtkErrorMacro(
+      `Error in FetchArray: ${array.name} does not have the proper array size. Got ${array.values.length}, instead of ${array.size}`
+    );
+  }
+}
+
 function handleUint8Array(array, compression, done) {
   return (uint8array) => {
     array.buffer = new ArrayBuffer(uint8array.length);
@@ -25,31 +58,39 @@ function handleUint8Array(array, compression, done) {
     view.set(uint8array);
 
     if (compression) {
+      const decompressed = CompressionHelper.decompress(
+        compression,
+        new Uint8Array(array.buffer)
+      );
       if (array.dataType === 'string' || array.dataType === 'JSON') {
-        array.buffer = strFromU8(decompressSync(new Uint8Array(array.buffer)));
+        array.buffer = strFromU8(decompressed);
       } else {
-        array.buffer = decompressSync(new Uint8Array(array.buffer)).buffer;
+        array.buffer = decompressed.buffer;
       }
     }
 
-    if (array.ref.encode === 'JSON') {
-      array.values = JSON.parse(array.buffer);
-    } else {
-      if (Endian.ENDIANNESS !== array.ref.encode && Endian.ENDIANNESS) {
-        // Need to swap bytes
-        vtkDebugMacro(`Swap bytes of ${array.name}`);
-        Endian.swapBytes(array.buffer, DataTypeByteSize[array.dataType]);
-      }
+    decodeArray(array);
+    done();
+  };
+}
 
-      array.values = macro.newTypedArray(array.dataType, array.buffer);
-    }
+function handleChunks(array, compression, done) {
+  return (chunkFiles) => {
+    const { chunks } = array.ref;
+    const last = chunks[chunks.length - 1];
+    array.buffer = new ArrayBuffer(last ? last.offset + last.size : 0);
 
-    if (array.values.length !== array.size) {
-      vtkErrorMacro(
-        `Error in FetchArray: ${array.name} does not have the proper array size. Got ${array.values.length}, instead of ${array.size}`
-      );
-    }
+    // Decompress each chunk into its final location
+    chunks.forEach((chunk, idx) => {
+      const output = new Uint8Array(array.buffer, chunk.offset, chunk.size);
+      if (compression) {
+        CompressionHelper.decompress(compression, chunkFiles[idx], output);
+      } else {
+        output.set(chunkFiles[idx]);
+      }
+    });
 
+    decodeArray(array);
     done();
   };
 }
@@ -125,13 +166,30 @@ function create(createOptions) {
         if (!ready) {
           vtkErrorMacro('ERROR!!! zip not ready...');
         }
-        const url = cleanUpPath(
-          [
-            baseURL,
-            array.ref.basepath,
-            options.compression ? `${array.ref.id}.gz` : array.ref.id,
-          ].join('/')
-        );
+        // Compression recorded on the array takes precedence over the reader one
+        const compression = array.ref.compression || options.compression;
+        const getFileData = (id) => {
+          const blob = options.pack?.blobs[id];
+          if (blob) {
+            // Slice of the pack file of the dataset
+            const pack =
+              decompressedFiles[
+                `${fullRootPath}${cleanUpPath(
+                  [baseURL, options.pack.url].join('/')
+                )}`
+              ];
+            return pack.subarray(blob.offset, blob.offset + blob.length);
+          }
+          return decompressedFiles[
+            `${fullRootPath}${cleanUpPath(
+              [
+                baseURL,
+                array.ref.basepath,
+                `${id}${CompressionHelper.getExtension(compression)}`,
+              ].join('/')
+            )}`
+          ];
+        };
 
         if (++requestCount === 1 && instance?.invokeBusy) {
           instance.invokeBusy(true);
@@ -149,20 +207,38 @@ function create(createOptions) {
           resolve(array);
         }
 
-        const fileData = decompressedFiles[`${fullRootPath}${url}`];
-
-        if (array.dataType === 'string' && !options.compression) {
+        if (array.ref.encoding === 'constant') {
+          // values described by the ref, without any file
+          decodeArray(array);
+          doneCleanUp();
+        } else if (array.ref.chunks) {
+          // uint8array stored as several chunks
+          const handler = handleChunks(array, compression, doneCleanUp);
+          try {
+            handler(array.ref.chunks.map((chunk) => getFileData(chunk.id)));
+          } catch (error) {
+            vtkErrorMacro(error.message);
+            if (--requestCount === 0 && instance?.invokeBusy) {
+              instance.invokeBusy(false);
+            }
+            reject(error);
+          }
+        } else if (array.dataType === 'string' && !compression) {
           // string
-          const handler = handleString(array, options.compression, doneCleanUp);
-          handler(strFromU8(fileData));
+          const handler = handleString(array, compression, doneCleanUp);
+          handler(strFromU8(getFileData(array.ref.id)));
         } else {
           // uint8array
-          const handler = handleUint8Array(
-            array,
-            options.compression,
-            doneCleanUp
-          );
-          handler(fileData);
+          const handler = handleUint8Array(array, compression, doneCleanUp);
+          try {
+            handler(getFileData(array.ref.id));
+          } catch (error) {
+            vtkErrorMacro(error.message);
+            if (--requestCount === 0 && instance?.invokeBusy) {
+              instance.invokeBusy(false);
+            }
+            reject(error);
+          }
         }
       });
     },
@@ -1,4 +1,6 @@
 import macro from 'vtk.js/Sources/macros';
+import ArrayEncodingHelper from 'vtk.js/Sources/IO/Core/ArrayEncodingHelper';
+import ArrayFilterHelper from 'vtk.js/Sources/IO/Core/ArrayFilterHelper';
 import Endian from 'vtk.js/Sources/Common/Core/Endian';
 import { DataTypeByteSize } from 'vtk.js/Sources/Common/Core/DataArray/Constants';
 import { has, registerType } from 'vtk.js/Sources/IO/Core/DataAccessHelper';
@@ -57,10 +59,31 @@ function fetchBinary(url, options = {}) {
 }
 
 function fetchArray(instance, baseURL, array, options = {}) {
-  if (options && options.compression) {
+  if ((options && options.compression) || array.ref?.compression) {
     return REJECT_COMPRESSION();
   }
 
+  if (array.ref?.chunks || options?.pack?.blobs[array.ref?.id]) {
+    vtkErrorMacro(
+      'LiteHttpDataAccessHelper does not support chunked or packed arrays. Need to register HttpDataAccessHelper instead.'
+    );
+    return Promise.reject(
+      new Error(
+        'LiteHttpDataAccessHelper does not support chunked or packed arrays.'
+      )
+    );
+  }
+
+  if (array.ref?.encoding === 'constant') {
+    // Values are described by the ref, nothing to fetch
+    array.values = ArrayEncodingHelper.decode(array.ref, undefined, array);
+    delete array.ref;
+    if (instance?.modified) {
+      instance.modified();
+    }
+    return Promise.resolve(array);
+  }
+
   if (array.ref && !array.ref.pending) {
     return new Promise((resolve, reject) => {
       const url = [baseURL, array.ref.basepath, array.ref.id].join('/');
@@ -78,19 +101,52 @@ function fetchArray(instance, baseURL, array, options = {}) {
           if (xhr.status === 200 || xhr.status === 0) {
             array.buffer = xhr.response;
 
-            if (array.ref.encode === 'JSON') {
-              array.values = JSON.parse(array.buffer);
-            } else {
-              if (Endian.ENDIANNESS !== array.ref.encode && Endian.ENDIANNESS) {
-                // Need to swap bytes
-                vtkDebugMacro(`Swap bytes of ${array.name}`);
-                Endian.swapBytes(
+            try {
+              if (array.ref.filters) {
+                array.buffer = ArrayFilterHelper.unfilter(
+                  array.ref.filters,
                   array.buffer,
-                  DataTypeByteSize[array.dataType]
+                  {
+                    elementSize: DataTypeByteSize[array.dataType],
+                    numberOfComponents: array.numberOfComponents,
+                    encode: array.ref.encode,
+                  }
                 );
               }
 
-              array.values = macro.newTypedArray(array.dataType, array.buffer);
+              if (array.ref.encoding) {
+                array.values = ArrayEncodingHelper.decode(
+                  array.ref,
+                  array.buffer,
+                  array
+                );
+              } else if (array.ref.encode === 'JSON') {
+                array.values = JSON.parse(array.buffer);
+              } else {
+                if (
+                  Endian.ENDIANNESS !== array.ref.encode &&
+                  Endian.ENDIANNESS
+                ) {
+                  // Need to swap bytes
+                  vtkDebugMacro(`Swap bytes of ${array.name}`);
+                  Endian.swapBytes(
+                    array.buffer,
+                    DataTypeByteSize[array.dataType]
+                  );
+                }
+
+                array.values = macro.newTypedArray(
+                  array.dataType,
+                  array.buffer
+                );
+              }
+            } catch (error) {
+              vtkErrorMacro(error.message);
+              if (--requestCount === 0 && instance?.invokeBusy) {
+                instance.invokeBusy(false);
+              }
+              reject(error);
+              return;
             }
 
             if (array.values.length !== array.size) {
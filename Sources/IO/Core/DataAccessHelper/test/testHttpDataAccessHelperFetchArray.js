@@ -1,4 +1,5 @@
 import { it, expect } from 'vitest';
+import { gzipSync } from 'fflate';
 import HttpDataAccessHelper from '../HttpDataAccessHelper';
 
 it('Test array.ref.url is used', async () => {
@@ -30,3 +31,168 @@ it('Test array.ref.url is used', async () => {
     HttpDataAccessHelper.fetchArray({}, '', array);
   });
 });
+
+it('Test array.ref.compression selects the file extension', async () => {
+  const array = {
+    ref: {
+      id: 'abc',
+      basepath: 'data',
+      compression: 'lz4',
+    },
+  };
+
+  const oldXmlHttpRequest = window.XMLHttpRequest;
+
+  await new Promise((resolve) => {
+    // Mock XmlHttpRequest
+    window.XMLHttpRequest = function MockedXmlHttpRequestConstructor() {
+      this.open = (method, url, async = true) => {
+        // Array compression wins over the requested one
+        expect(url).toBe('http://test.io/data/abc.lz4');
+
+        // Clear mock
+        window.XMLHttpRequest = oldXmlHttpRequest;
+
+        resolve();
+      };
+      this.send = () => {};
+      this.setRequestHeader = () => {};
+    };
+
+    HttpDataAccessHelper.fetchArray({}, 'http://test.io', array, {
+      compression: 'gz',
+    });
+  });
+});
+
+it('Test array.ref.chunks are reassembled', async () => {
+  const values = new Float32Array([1, 2, 3, 4, 5, 6, 7, 8, 9]);
+  const bytes = new Uint8Array(values.buffer);
+  const files = {
+    'http://test.io/data/c0.gz': gzipSync(bytes.subarray(0, 24)),
+    'http://test.io/data/c1.gz': gzipSync(bytes.subarray(24)),
+  };
+  const array = {
+    name: 'chunked',
+    dataType: 'Float32Array',
+    numberOfComponents: 3,
+    size: 9,
+    ref: {
+      id: 'abc',
+      encode: 'LittleEndian',
+      basepath: 'data',
+      compression: 'gz',
+      chunks: [
+        { id: 'c0', offset: 0, size: 24 },
+        { id: 'c1', offset: 24, size: 12 },
+      ],
+    },
+  };
+
+  const oldXmlHttpRequest = window.XMLHttpRequest;
+  const requestedUrls = [];
+
+  // Mock XmlHttpRequest
+  window.XMLHttpRequest = function MockedXmlHttpRequestConstructor() {
+    this.open = (method, url, async = true) => {
+      requestedUrls.push(url);
+      this.url = url;
+    };
+    this.send = () => {
+      setTimeout(() => {
+        this.readyState = 4;
+        this.status = 200;
+        this.response = files[this.url].slice().buffer;
+        this.onreadystatechange({});
+      });
+    };
+    this.setRequestHeader = () => {};
+  };
+
+  const result = await HttpDataAccessHelper.fetchArray(
+    {},
+    'http://test.io',
+    array
+  );
+
+  // Clear mock
+  window.XMLHttpRequest = oldXmlHttpRequest;
+
+  expect(requestedUrls.sort()).toEqual(Object.keys(files).sort());
+  expect(result.ref).toBeUndefined();
+  expect(Array.from(result.values)).toEqual(Array.from(values));
+});
+
+it('Test arrays packed in a single file use range requests', async () => {
+  const values = new Float32Array([1, 2, 3, 4, 5, 6]);
+  const payload = gzipSync(new Uint8Array(values.buffer));
+  const packContent = new Uint8Array(8 + payload.length);
+  packContent.set(payload, 8);
+  const pack = {
+    url: 'data.pack',
+    blobs: {
+      abc: { offset: 8, length: payload.length, compression: 'gz' },
+    },
+  };
+
+  const oldXmlHttpRequest = window.XMLHttpRequest;
+
+  async function fetchPacked(supportRange) {
+    const requests = [];
+
+    // Mock XmlHttpRequest
+    window.XMLHttpRequest = function MockedXmlHttpRequestConstructor() {
+      const headers = {};
+      this.open = (method, url, async = true) => {
+        requests.push({ url, headers });
+      };
+      this.send = () => {
+        setTimeout(() => {
+          const range = /bytes=(\d+)-(\d+)/.exec(headers.Range);
+          this.readyState = 4;
+          this.status = supportRange ? 206 : 200;
+          this.response = supportRange
+            ? packContent.slice(Number(range[1]), Number(range[2]) + 1).buffer
+            : packContent.slice().buffer;
+          this.onreadystatechange({});
+        });
+      };
+      this.setRequestHeader = (key, value) => {
+        headers[key] = value;
+      };
+    };
+
+    const array = {
+      name: 'packed',
+      dataType: 'Float32Array',
+      numberOfComponents: 3,
+      size: 6,
+      ref: {
+        id: 'abc',
+        encode: 'LittleEndian',
+        basepath: '.',
+        compression: 'gz',
+      },
+    };
+    const result = await HttpDataAccessHelper.fetchArray(
+      {},
+      'http://test.io',
+      array,
+      { pack }
+    );
+
+    expect(requests).toEqual([
+      {
+        url: 'http://test.io/data.pack',
+        headers: { Range: `bytes=8-${7 + payload.length}` },
+      },
+    ]);
+    expect(Array.from(result.values)).toEqual(Array.from(values));
+  }
+
+  await fetchPacked(true);
+  await fetchPacked(false);
+
+  // Clear mock
+  window.XMLHttpRequest = oldXmlHttpRequest;
+});
@@ -1,4 +1,5 @@
 import { vtkAlgorithm, vtkObject, vtkSubscription } from '../../../interfaces';
+import vtkImageData from '../../../Common/DataModel/ImageData';
 import { HtmlDataAccessHelper } from '../DataAccessHelper/HtmlDataAccessHelper';
 import { HttpDataAccessHelper } from '../DataAccessHelper/HttpDataAccessHelper';
 import { JSZipDataAccessHelper } from '../DataAccessHelper/JSZipDataAccessHelper';
@@ -82,6 +83,31 @@ export interface IDatasetManifest {
   metadata?: Record<string, unknown>;
 }
 
+export interface IPyramidBrick {
+  index: [number, number, number];
+  extent: [number, number, number, number, number, number];
+  arrays: Array<IPointDataArray['data']>;
+}
+
+export interface IPyramidLevel {
+  level: number;
+  origin: [number, number, number];
+  spacing: [number, number, number];
+  extent: [number, number, number, number, number, number];
+  bricks: Array<IPyramidBrick>;
+}
+
+export interface IPyramid {
+  /**
+   * Number of cells of a brick along each axis, bricks hold brickSize + 1
+   * points as neighbours share their boundary points
+   */
+  brickSize: number;
+  /** Name of the active scalars of the exported image data */
+  scalars?: string;
+  levels: Array<IPyramidLevel>;
+}
+
 export interface IParseObjectOptions {
   loadData: boolean;
   baseUrl: string;
@@ -203,6 +229,37 @@ export interface vtkHttpDataSetReader extends vtkHttpDataSetReaderBase {
    */
   clearCache(): void;
 
+  /**
+   * Get the multiresolution pyramid of the image data if it was exported
+   * with one, null otherwise. The full resolution is the dataset itself, the
+   * pyramid starts at level 1 and each level halves the number of points
+   * along each axis. The ranges of the brick arrays allow to skip bricks
+   * without any value of interest.
+   */
+  getPyramid(): IPyramid | null;
+
+  /**
+   * Fetch a brick of the image pyramid. The array named scalarsName is set as
+   * scalars, by default the active scalars of the exported image data (or of
+   * the loaded dataset for older exports), otherwise the first array.
+   *
+   * ```js
+   * const pyramid = reader.getPyramid();
+   * const coarsest = pyramid.levels.length - 1;
+   * reader.loadBrick(coarsest, 0).then((imageData) => {
+   *   mapper.setInputData(imageData);
+   * });
+   * ```
+   * @param {Number} levelIndex index of the level in the pyramid
+   * @param {Number} brickIndex index of the brick in the level
+   * @param {String} [scalarsName] name of the array to set as scalars
+   */
+  loadBrick(
+    levelIndex: number,
+    brickIndex: number,
+    scalarsName?: string
+  ): Promise<vtkImageData>;
+
   /**
    *
    * @param {Boolean} busy
@@ -97,12 +97,20 @@ function processDataSet(
     }
   });
 
+  // Offset table of the arrays packed into a single file
+  model.pack = dataset.pack;
+
+  // Downsampled levels of image data split in bricks
+  model.pyramid = dataset.pyramid || null;
+
   // Fetch geometry arrays
   const pendingPromises = [];
-  const { progressCallback } = model;
+  const { progressCallback, pack } = model;
   const compression = model.fetchGzip ? 'gz' : null;
   GEOMETRY_ARRAYS[dataset.vtkClass](dataset).forEach((array) => {
-    pendingPromises.push(fetchArray(array, { compression, progressCallback }));
+    pendingPromises.push(
+      fetchArray(array, { compression, progressCallback, pack })
+    );
   });
 
   function success() {
@@ -146,7 +154,11 @@ function vtkHttpDataSetReader(publicAPI, model) {
 
   // Internal method to fetch Array
   function fetchArray(array, options = {}) {
-    const arrayId = `${array.ref.id}|${array.vtkClass}`;
+    // Quantized arrays with the same content may not share their parameters
+    const { offset, scale } = array.ref;
+    const arrayId = scale
+      ? `${array.ref.id}|${array.vtkClass}|${offset}|${scale}`
+      : `${array.ref.id}|${array.vtkClass}`;
     if (!cachedArraysAndPromises[arrayId]) {
       // Cache the promise while fetching
       cachedArraysAndPromises[arrayId] = model.dataAccessHelper
@@ -329,11 +341,12 @@ function vtkHttpDataSetReader(publicAPI, model) {
 
       const processNext = () => {
         if (arrayToFecth.length) {
-          const { progressCallback } = model;
+          const { progressCallback, pack } = model;
           const compression = model.fetchGzip ? 'gz' : null;
           fetchArray(arrayToFecth.pop(), {
             compression,
             progressCallback,
+            pack,
           }).then(processNext, error);
         } else if (datasetObj) {
           // Perform array registration on new arrays
@@ -360,6 +373,50 @@ function vtkHttpDataSetReader(publicAPI, model) {
     });
   };
 
+  // Fetch one brick of the image pyramid as a vtkImageData
+  publicAPI.loadBrick = (levelIndex, brickIndex, scalarsName) => {
+    const level = model.pyramid.levels[levelIndex];
+    const brick = level.bricks[brickIndex];
+    const { progressCallback, pack } = model;
+    const compression = model.fetchGzip ? 'gz' : null;
+
+    // Fetch copies so the pyramid keeps its refs for later requests
+    return Promise.all(
+      brick.arrays.map((array) =>
+        fetchArray(
+          { ...array, ref: { ...array.ref } },
+          { compression, progressCallback, pack }
+        )
+      )
+    ).then((arrays) => {
+      const imageData = vtk({
+        vtkClass: 'vtkImageData',
+        origin: level.origin,
+        spacing: level.spacing,
+        extent: brick.extent,
+      });
+      // Requested scalars, then the ones of the exported dataset, then the
+      // ones of the loaded dataset, then the first array
+      const activeName =
+        scalarsName ||
+        model.pyramid.scalars ||
+        model.dataset?.getPointData().getScalars()?.getName();
+      const activeIndex = Math.max(
+        0,
+        arrays.findIndex((array) => array.name === activeName)
+      );
+      arrays.forEach((array, idx) => {
+        const dataArray = vtkDataArray.newInstance(array);
+        if (idx === activeIndex) {
+          imageData.getPointData().setScalars(dataArray);
+        } else {
+          imageData.getPointData().addArray(dataArray);
+        }
+      });
+      return imageData;
+    });
+  };
+
   publicAPI.requestData = (inData, outData) => {
     // do nothing loadData will eventually load up the data
   };
@@ -401,6 +458,7 @@ const DEFAULT_VALUES = {
   requestCount: 0,
   arrayCachingEnabled: true,
   maxCacheSize: 2048,
+  pyramid: null,
   // dataAccessHelper: null,
 };
 
@@ -418,6 +476,7 @@ export function extend(publicAPI, model, initialValues = {}) {
     'baseURL',
     'dataAccessHelper',
     'maxCacheSize',
+    'pyramid',
   ]);
   macro.set(publicAPI, model, [
     'dataAccessHelper',
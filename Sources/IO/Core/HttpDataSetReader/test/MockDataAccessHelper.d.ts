@@ -5,6 +5,7 @@
 export interface MockDataAccessHelperCallTrackerEntry {
   promise: Promise<object[]>;
   called: Date;
+  options?: object;
 }
 
 export interface MockDataAccessHelperCallTracker {
@@ -13,6 +14,7 @@ export interface MockDataAccessHelperCallTracker {
 }
 
 export interface MockDataAccessHelper {
+  MockPack: object;
   fetchArray(
     instance: any,
     baseURL: string,
@@ -41,6 +41,70 @@ function createMockIndexJSON(fileId, byteLength) {
   };
 }
 
+// Image data with two arrays, a single level pyramid and a pack table
+const MockPack = {
+  url: 'data.pack',
+  blobs: {
+    pointA: { offset: 0, length: 36 },
+    pointB: { offset: 36, length: 36 },
+  },
+};
+
+function createMockArray(name, id, registration, size) {
+  return {
+    numberOfComponents: 1,
+    name,
+    vtkClass: 'vtkDataArray',
+    dataType: 'Float32Array',
+    ref: { registration, encode: 'LittleEndian', basepath: 'data', id },
+    size,
+  };
+}
+
+function createMockPyramidJSON(scalars) {
+  const pyramid = {
+    brickSize: 2,
+    levels: [
+      {
+        level: 1,
+        origin: [0, 0, 0],
+        spacing: [2, 2, 2],
+        extent: [0, 1, 0, 1, 0, 0],
+        bricks: [
+          {
+            index: [0, 0, 0],
+            extent: [0, 1, 0, 1, 0, 0],
+            arrays: [
+              createMockArray('a', 'brickA', undefined, 4),
+              createMockArray('b', 'brickB', undefined, 4),
+            ],
+          },
+        ],
+      },
+    ],
+  };
+  if (scalars) {
+    pyramid.scalars = scalars;
+  }
+  return {
+    origin: [0, 0, 0],
+    spacing: [1, 1, 1],
+    extent: [0, 2, 0, 2, 0, 0],
+    vtkClass: 'vtkImageData',
+    pointData: {
+      arrays: [
+        { data: createMockArray('a', 'pointA', 'addArray', 9) },
+        { data: createMockArray('b', 'pointB', 'setScalars', 9) },
+      ],
+      vtkClass: 'vtkDataSetAttributes',
+    },
+    cellData: { arrays: [], vtkClass: 'vtkDataSetAttributes' },
+    FieldData: { arrays: [], vtkClass: 'vtkDataSetAttributes' },
+    pack: MockPack,
+    pyramid,
+  };
+}
+
 const MockData = {
   'test01/index.json': () => createMockIndexJSON('test01', 10 * MiB),
   'test01/data/test01.gz': () => new Uint8Array(10 * MiB),
@@ -50,7 +114,15 @@ const MockData = {
   'test03/data/test03.gz': () => new Uint8Array(15 * MiB),
   'test04/index.json': () => createMockIndexJSON('test04', 40 * MiB),
   'test04/data/test04.gz': () => new Uint8Array(40 * MiB),
+  'pyramid01/index.json': () => createMockPyramidJSON(),
+  'pyramid02/index.json': () => createMockPyramidJSON('a'),
 };
+['pyramid01', 'pyramid02'].forEach((dataId) => {
+  MockData[`${dataId}/data/pointA.gz`] = () => new Float32Array(9).fill(1);
+  MockData[`${dataId}/data/pointB.gz`] = () => new Float32Array(9).fill(2);
+  MockData[`${dataId}/data/brickA.gz`] = () => new Float32Array([1, 3, 5, 7]);
+  MockData[`${dataId}/data/brickB.gz`] = () => new Float32Array([2, 4, 6, 8]);
+});
 
 // ----------------------------------------------------------------------------
 
@@ -132,6 +204,7 @@ function fetchArray(instance, baseURL, array, options = {}) {
     t.fetchArray.push({
       promise,
       called: new Date(),
+      options,
     });
   });
 
@@ -151,6 +224,7 @@ function setFetchArrayDelayMs(delay) {
 // ----------------------------------------------------------------------------
 
 const MockDataAccessHelper = {
+  MockPack,
   fetchJSON,
   fetchText,
   fetchArray,
@@ -255,3 +255,46 @@ it('Disabled cache does not raise error on concurrent access.', async () => {
 
   MockDataAccessHelper.setFetchArrayDelayMs(0);
 });
+
+it('vtkHttpDataSetReader forwards the pack table and loads pyramid bricks', async () => {
+  const reader = vtkHttpDataSetReader.newInstance({ fetchGzip: true });
+  reader.setDataAccessHelper(MockDataAccessHelper);
+  reader.clearCache();
+
+  const callTracker = MockDataAccessHelper.getCallTracker();
+
+  // Dataset without pyramid scalars: the loaded dataset ones are used
+  await reader.setUrl('http://mockData/pyramid01', { loadData: true });
+  const pyramid = reader.getPyramid();
+  expect(pyramid.levels.map((level) => level.level)).toEqual([1]);
+  expect(reader.getOutputData().getPointData().getScalars().getName()).toBe(
+    'b'
+  );
+
+  let brick = await reader.loadBrick(0, 0);
+  expect(brick.getExtent()).toEqual([0, 1, 0, 1, 0, 0]);
+  expect(brick.getSpacing()).toEqual([2, 2, 2]);
+  expect(brick.getPointData().getScalars().getName()).toBe('b');
+  expect(
+    Array.from(brick.getPointData().getArrayByName('a').getData())
+  ).toEqual([1, 3, 5, 7]);
+
+  // The pyramid keeps its refs for later requests
+  expect(pyramid.levels[0].bricks[0].arrays[0].ref.id).toBe('brickA');
+
+  // Pyramid scalars of the export, unless the caller picks an array
+  await reader.setUrl('http://mockData/pyramid02', { loadData: true });
+  brick = await reader.loadBrick(0, 0);
+  expect(brick.getPointData().getScalars().getName()).toBe('a');
+  brick = await reader.loadBrick(0, 0, 'b');
+  expect(brick.getPointData().getScalars().getName()).toBe('b');
+  expect(
+    Array.from(brick.getPointData().getScalars().getData())
+  ).toEqual([2, 4, 6, 8]);
+
+  // Every array request gets the pack table of its dataset
+  expect(callTracker.fetchArray.length).toBeGreaterThan(0);
+  callTracker.fetchArray.forEach(({ options }) => {
+    expect(options.pack).toEqual(MockDataAccessHelper.MockPack);
+  });
+});
@@ -0,0 +1,144 @@
+from __future__ import print_function
+import os, sys, time, argparse, shutil, tempfile, subprocess, importlib.util
+
+# -----------------------------------------------------------------------------
+# Load vtk-data-converter.py as a module (its name is not importable)
+# -----------------------------------------------------------------------------
+
+converterPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vtk-data-converter.py')
+spec = importlib.util.spec_from_file_location('vtk_data_converter', converterPath)
+converter = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(converter)
+
+import numpy
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonCore import vtkPoints, vtkTypeUInt32Array
+from vtkmodules.vtkCommonDataModel import vtkCellArray, vtkUnstructuredGrid, VTK_TETRA
+
+benchmarks = {}
+
+# -----------------------------------------------------------------------------
+
+def timeIt(label, fn, repeat = 1):
+  best = None
+  result = None
+  for i in range(repeat):
+    start = time.time()
+    result = fn()
+    elapsed = time.time() - start
+    best = elapsed if best is None else min(best, elapsed)
+  print('  %-32s %10.3fs' % (label, best))
+  return best, result
+
+# -----------------------------------------------------------------------------
+
+def createUnstructuredGrid(nbCells):
+  nbPoints = nbCells // 4 + 4
+  points = vtkPoints()
+  points.SetData(numpy_support.numpy_to_vtk(numpy.random.rand(nbPoints, 3), deep = 1))
+
+  connectivity = numpy.random.randint(0, nbPoints, size = (nbCells, 5))
+  connectivity[:, 0] = 4
+  cells = vtkCellArray()
+  cells.SetCells(nbCells, numpy_support.numpy_to_vtkIdTypeArray(connectivity.ravel(), deep = 1))
+
+  grid = vtkUnstructuredGrid()
+  grid.SetPoints(points)
+  grid.SetCells(VTK_TETRA, cells)
+  return grid
+
+# -----------------------------------------------------------------------------
+
+def loopIdTypeBuffer(array):
+  arraySize = array.GetNumberOfTuples() * array.GetNumberOfComponents()
+  newArray = vtkTypeUInt32Array()
+  newArray.SetNumberOfTuples(arraySize)
+  for i in range(arraySize):
+    newArray.SetValue(i, -1 if array.GetValue(i) < 0 else array.GetValue(i))
+  return memoryview(newArray)
+
+# -----------------------------------------------------------------------------
+
+def benchmarkIdType(args):
+  grid = createUnstructuredGrid(args.cells)
+  connectivity = grid.GetCells().GetData()
+  print('IdType narrowing of %d connectivity entries' % connectivity.GetNumberOfTuples())
+
+  numpyTime, numpyBuffer = timeIt('numpy', lambda: converter.getIdTypeBuffer(connectivity, grid.GetNumberOfPoints()), args.repeat)
+  print('  %d bytes per id' % memoryview(numpyBuffer).itemsize)
+  if args.skip_loop:
+    return
+
+  loopTime, loopBuffer = timeIt('python loop', lambda: loopIdTypeBuffer(connectivity))
+  if not numpy.array_equal(numpy.asarray(loopBuffer), numpy.asarray(numpyBuffer)):
+    print('  ERROR: numpy and loop encodings differ')
+    sys.exit(1)
+  print('  speedup %.1fx' % (loopTime / numpyTime))
+
+benchmarks['idtype'] = benchmarkIdType
+
+# -----------------------------------------------------------------------------
+
+def benchmarkGzip(args):
+  points = createUnstructuredGrid(args.cells).GetPoints().GetData()
+  data = memoryview(points).cast('B')
+  print('gzip of a single %d bytes array' % len(data))
+
+  dataDir = tempfile.mkdtemp()
+  try:
+    serialTime = timeIt('serial', lambda: converter.ArraySink().writeBlob(dataDir, data, True), args.repeat)[0]
+    for workers in sorted(set([2, max(2, args.block_workers)])):
+      sink = converter.ArraySink(blockWorkers = workers)
+      blockTime = timeIt('%d block workers' % workers, lambda: sink.writeBlob(dataDir, data, True), args.repeat)[0]
+      print('  speedup %.1fx' % (serialTime / blockTime))
+  finally:
+    shutil.rmtree(dataDir)
+
+benchmarks['gzip'] = benchmarkGzip
+
+# -----------------------------------------------------------------------------
+
+def benchmarkStartup(args):
+  from vtkmodules.vtkIOXML import vtkXMLUnstructuredGridWriter
+
+  dataDir = tempfile.mkdtemp()
+  try:
+    inputFile = os.path.join(dataDir, 'small.vtu')
+    writer = vtkXMLUnstructuredGridWriter()
+    writer.SetInputData(createUnstructuredGrid(1000))
+    writer.SetFileName(inputFile)
+    writer.Write()
+    print('Conversion of a small file from a new process')
+
+    backends = ['vtk']
+    if importlib.util.find_spec('paraview'):
+      backends.append('paraview')
+    else:
+      print('  paraview is not importable, skipping its backend')
+
+    for backend in backends:
+      outputDir = os.path.join(dataDir, backend)
+      cmd = [args.python, converterPath, '--input', inputFile, '--output', outputDir, '--backend', backend]
+      timeIt('%s backend' % backend, lambda: subprocess.check_call(cmd, stdout = subprocess.DEVNULL), args.repeat)
+  finally:
+    shutil.rmtree(dataDir)
+
+benchmarks['startup'] = benchmarkStartup
+
+# =============================================================================
+# Main: Parse args and run the requested benchmarks
+# =============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="vtk-data-converter benchmarks")
+    parser.add_argument("benchmarks", nargs='*', default=sorted(benchmarks.keys()), help="benchmarks to run: %s" % ', '.join(sorted(benchmarks.keys())))
+    parser.add_argument("--cells", help="number of cells of the generated dataset", default=1000000, type=int, dest="cells")
+    parser.add_argument("--repeat", help="number of runs to keep the best timing from", default=3, type=int, dest="repeat")
+    parser.add_argument("--block-workers", help="number of threads used by the block-parallel gzip", default=os.cpu_count(), type=int, dest="block_workers")
+    parser.add_argument("--skip-loop", help="do not time the reference python loop (slow on large data)", default=False, action='store_true', dest="skip_loop")
+    parser.add_argument("--python", help="interpreter running the converter in the startup benchmark", default=sys.executable, dest="python")
+
+    args = parser.parse_args()
+
+    for name in args.benchmarks:
+      benchmarks[name](args)
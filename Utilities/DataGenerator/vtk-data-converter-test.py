@@ -0,0 +1,308 @@
+from __future__ import print_function
+import os, sys, json, time, shutil, tempfile, unittest, importlib.util
+
+# -----------------------------------------------------------------------------
+# Load vtk-data-converter.py as a module (its name is not importable)
+# -----------------------------------------------------------------------------
+
+converterPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vtk-data-converter.py')
+spec = importlib.util.spec_from_file_location('vtk_data_converter', converterPath)
+converter = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(converter)
+
+import numpy
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonCore import vtkIdTypeArray
+from vtkmodules.vtkFiltersCore import vtkTriangleFilter
+from vtkmodules.vtkFiltersGeneral import vtkDataSetTriangleFilter
+from vtkmodules.vtkFiltersSources import vtkPlaneSource
+from vtkmodules.vtkImagingCore import vtkRTAnalyticSource
+from vtkmodules.vtkIOExodus import vtkExodusIIWriter
+from vtkmodules.vtkIOXML import vtkXMLImageDataWriter, vtkXMLPolyDataWriter
+
+# -----------------------------------------------------------------------------
+
+def writePlane(filePath, resolution):
+  plane = vtkPlaneSource()
+  plane.SetResolution(resolution, resolution)
+  writer = vtkXMLPolyDataWriter()
+  writer.SetInputConnection(plane.GetOutputPort())
+  writer.SetFileName(filePath)
+  writer.Write()
+
+def writeWavelet(filePath, size):
+  wavelet = vtkRTAnalyticSource()
+  wavelet.SetWholeExtent(0, size - 1, 0, size - 1, 0, size - 1)
+  writer = vtkXMLImageDataWriter()
+  writer.SetInputConnection(wavelet.GetOutputPort())
+  writer.SetFileName(filePath)
+  writer.Write()
+
+# -----------------------------------------------------------------------------
+
+class ConverterTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    names = ['pvpython', 'pyramidBrickSize', 'meshReorder', 'dracoBits', 'exportPieces', 'memoryBudget', 'dataBackend', 'arrayEncoder', 'arraySink']
+    self.options = dict((name, getattr(converter, name)) for name in names)
+    converter.dataBackend = 'vtk'
+
+  def tearDown(self):
+    for name, value in self.options.items():
+      setattr(converter, name, value)
+    shutil.rmtree(self.tmpDir)
+
+  def readIndex(self, *path):
+    with open(os.path.join(self.tmpDir, *(path + ('index.json',)))) as f:
+      return json.load(f)
+
+# -----------------------------------------------------------------------------
+
+class PiecesTest(ConverterTestCase):
+
+  def testNonSplittableSource(self):
+    # A single piece file returns the whole dataset as its first piece
+    # whatever the number of pieces requested, it is written as is
+    inputFile = os.path.join(self.tmpDir, 'plane.vtp')
+    writePlane(inputFile, 200)
+    converter.memoryBudget = 1
+
+    converter.convert(inputFile, os.path.join(self.tmpDir, 'out'))
+
+    root = self.readIndex('out', 'plane.vtp')
+    self.assertEqual(root['vtkClass'], 'vtkPolyData')
+    self.assertEqual(root['metadata']['name'], 'plane.vtp')
+    self.assertNotIn('numberOfPieces', root)
+
+  def testSplittableSource(self):
+    inputFile = os.path.join(self.tmpDir, 'wavelet.vti')
+    writeWavelet(inputFile, 100)
+    converter.memoryBudget = 1
+
+    converter.convert(inputFile, os.path.join(self.tmpDir, 'out'))
+
+    root = self.readIndex('out', 'wavelet.vti')
+    self.assertGreater(root['numberOfPieces'], 1)
+    self.assertEqual(len(root['Blocks']), root['numberOfPieces'])
+
+# -----------------------------------------------------------------------------
+
+class PackTest(ConverterTestCase):
+
+  def convertPacked(self, inputFile, name, workers, sink):
+    converter.arrayEncoder = converter.ArrayEncoder(workers)
+    converter.arraySink = sink
+    converter.convert(inputFile, os.path.join(self.tmpDir, name))
+    sink.report()
+    contents = []
+    for fileName in ['index.json', 'data.pack']:
+      with open(os.path.join(self.tmpDir, name, 'plane.vtp', fileName), 'rb') as f:
+        contents.append(f.read())
+    return contents
+
+  def testDeterministicLayout(self):
+    # Blobs are laid out in the order of their refs, not in the order the
+    # encoder threads complete them
+    inputFile = os.path.join(self.tmpDir, 'plane.vtp')
+    writePlane(inputFile, 20)
+
+    class SlowFirstSink(converter.PackedSink):
+      delayed = []
+      def write(self, dataDir, pBuffer, compress = True):
+        if not self.delayed:
+          self.delayed.append(True)
+          time.sleep(0.2)
+        return converter.PackedSink.write(self, dataDir, pBuffer, compress)
+
+    serial = self.convertPacked(inputFile, 'serial', 1, converter.PackedSink())
+    threaded = self.convertPacked(inputFile, 'threaded', 4, SlowFirstSink())
+    self.assertEqual(threaded, serial)
+
+# -----------------------------------------------------------------------------
+
+class IdTypeTest(ConverterTestCase):
+
+  def testOnlyConnectivityIsNarrowed(self):
+    plane = vtkPlaneSource()
+    plane.SetResolution(10, 10)
+    plane.Update()
+    dataset = plane.GetOutput()
+    ids = vtkIdTypeArray()
+    ids.SetName('GlobalIds')
+    for i in range(dataset.GetNumberOfPoints()):
+      ids.InsertNextValue(i)
+    dataset.GetPointData().AddArray(ids)
+
+    converter.writeDataSet('plane', dataset, self.tmpDir)
+    converter.arrayEncoder.wait()
+
+    root = self.readIndex('plane')
+    arrays = dict((array['data']['name'], array['data']) for array in root['pointData']['arrays'])
+    self.assertEqual(arrays['GlobalIds']['dataType'], 'Uint32Array')
+    self.assertEqual(root['polys']['dataType'], 'Uint8Array')
+
+# -----------------------------------------------------------------------------
+
+class CheckpointTest(ConverterTestCase):
+
+  def getCheckpoints(self, directory):
+    return [name for _, _, files in os.walk(directory) for name in files if name == 'checkpoint.jsonl']
+
+  def testResumeInterruptedConversion(self):
+    inputFile = os.path.join(self.tmpDir, 'wavelet.vti')
+    writeWavelet(inputFile, 20)
+    outputDir = os.path.join(self.tmpDir, 'out')
+    converter.exportPieces = 4
+    dumpImageData = converter.writerMapping['vtkImageData']
+    written = []
+
+    def interruptedWriter(*args):
+      if len(written) == 2:
+        raise KeyboardInterrupt()
+      written.append(args)
+      return dumpImageData(*args)
+
+    converter.writerMapping['vtkImageData'] = interruptedWriter
+    try:
+      with self.assertRaises(KeyboardInterrupt):
+        converter.convert(inputFile, outputDir)
+    finally:
+      converter.writerMapping['vtkImageData'] = dumpImageData
+    self.assertEqual(self.getCheckpoints(outputDir), ['checkpoint.jsonl'])
+
+    # Only the pieces missing from the interrupted run get written
+    del written[:]
+    converter.writerMapping['vtkImageData'] = lambda *args: written.append(args) or dumpImageData(*args)
+    try:
+      converter.convert(inputFile, outputDir, resume = True)
+    finally:
+      converter.writerMapping['vtkImageData'] = dumpImageData
+
+    self.assertEqual(len(written), 2)
+    self.assertEqual(self.getCheckpoints(outputDir), [])
+    self.assertEqual(len(self.readIndex('out', 'wavelet.vti')['Blocks']), 4)
+
+  def testCheckpointRemovedOnceComplete(self):
+    inputFile = os.path.join(self.tmpDir, 'plane.vtp')
+    writePlane(inputFile, 10)
+    outputDir = os.path.join(self.tmpDir, 'out')
+    converter.exportPieces = 2
+
+    converter.convert(inputFile, outputDir)
+
+    self.assertEqual(self.getCheckpoints(outputDir), [])
+    self.assertEqual(self.readIndex('out', 'plane.vtp')['numberOfPieces'], 2)
+
+# -----------------------------------------------------------------------------
+
+class PyramidTest(ConverterTestCase):
+
+  def testLevelsBelowFullResolution(self):
+    inputFile = os.path.join(self.tmpDir, 'wavelet.vti')
+    writeWavelet(inputFile, 33)
+    converter.pyramidBrickSize = 8
+
+    converter.convert(inputFile, os.path.join(self.tmpDir, 'out'))
+
+    pyramid = self.readIndex('out', 'wavelet.vti')['pyramid']
+    self.assertEqual(pyramid['scalars'], 'RTData')
+    self.assertEqual([level['level'] for level in pyramid['levels']], [1, 2])
+    self.assertEqual(pyramid['levels'][0]['extent'], [0, 16, 0, 16, 0, 16])
+    self.assertEqual(len(pyramid['levels'][0]['bricks']), 8)
+    self.assertEqual(len(pyramid['levels'][-1]['bricks']), 1)
+
+# -----------------------------------------------------------------------------
+
+class ReorderTest(ConverterTestCase):
+
+  def testCacheOrder(self):
+    plane = vtkPlaneSource()
+    plane.SetResolution(50, 50)
+    triangles = vtkTriangleFilter()
+    triangles.SetInputConnection(plane.GetOutputPort())
+    triangles.Update()
+    dataset = triangles.GetOutput()
+    nbPoints = dataset.GetNumberOfPoints()
+    connectivity = numpy_support.vtk_to_numpy(dataset.GetPolys().GetConnectivityArray()).reshape(-1, 3)
+    connectivity = connectivity[numpy.random.RandomState(0).permutation(len(connectivity))]
+    centers = numpy_support.vtk_to_numpy(dataset.GetPoints().GetData())[connectivity].mean(axis = 1)
+
+    order = converter.getCacheOrder(connectivity, nbPoints, centers)
+
+    self.assertEqual(sorted(order.tolist()), list(range(len(connectivity))))
+    self.assertLess(converter.getACMR(connectivity[order]), 1.0)
+    self.assertGreater(converter.getACMR(connectivity), 2.0)
+
+# -----------------------------------------------------------------------------
+
+class ExodusTest(ConverterTestCase):
+
+  def testParaViewReaderDefaults(self):
+    inputFile = os.path.join(self.tmpDir, 'wavelet.exo')
+    wavelet = vtkRTAnalyticSource()
+    wavelet.SetWholeExtent(0, 4, 0, 4, 0, 4)
+    tetrahedra = vtkDataSetTriangleFilter()
+    tetrahedra.SetInputConnection(wavelet.GetOutputPort())
+    writer = vtkExodusIIWriter()
+    writer.SetInputConnection(tetrahedra.GetOutputPort())
+    writer.SetFileName(inputFile)
+    writer.Write()
+
+    converter.convert(inputFile, os.path.join(self.tmpDir, 'out'), merge = True)
+
+    root = self.readIndex('out', 'wavelet.exo')
+    self.assertEqual(root['vtkClass'], 'vtkUnstructuredGrid')
+    pointArrays = [array['data']['name'] for array in root['pointData']['arrays']]
+    cellArrays = [array['data']['name'] for array in root['cellData']['arrays']]
+    self.assertIn('RTData', pointArrays)
+    self.assertIn('GlobalNodeId', pointArrays)
+    self.assertIn('GlobalElementId', cellArrays)
+    self.assertIn('ObjectId', cellArrays)
+
+# -----------------------------------------------------------------------------
+
+class WorkerCommandTest(ConverterTestCase):
+
+  def getSignature(self, argv):
+    args = converter.getArgumentParser().parse_args(argv)
+    converter.setOptions(args)
+    return converter.getSignature(args.input, args.merge, args.extract)
+
+  def testWorkerSignature(self):
+    # Time workers append to the checkpoint of their parent, which they
+    # only do when they convert the data the same way
+    inputFile = os.path.join(self.tmpDir, 'plane.vtp')
+    writePlane(inputFile, 10)
+    outputDir = os.path.join(self.tmpDir, 'out')
+    storeDir = os.path.join(self.tmpDir, 'store')
+
+    parent = self.getSignature([
+      '--input', inputFile, '--output', outputDir, '--merge', '--time-workers', '2',
+      '--hash', 'sha1', '--level', '3', '--filters', 'shuffle,delta',
+      '--encodings', 'rle,palette', '--quantize', '0.001', '--normals-error', '1',
+      '--varint-cells', '--chunk-size', '4096', '--pyramid', '16', '--reorder', 'morton',
+      '--pieces', '4', '--memory-budget', '64', '--backend', 'vtk', '--store', storeDir,
+    ])
+    cmd = converter.getWorkerCommand(inputFile, outputDir, True, False, None, [0, 2], False)
+    worker = self.getSignature(cmd[2:])
+
+    self.assertEqual(worker, parent)
+
+  def testBatchWorkerArguments(self):
+    converter.setOptions(converter.getArgumentParser().parse_args([
+      '--batch', self.tmpDir, '--output', os.path.join(self.tmpDir, 'out'), '--pack',
+      '--pieces', '4', '--memory-budget', '64', '--backend', 'vtk',
+    ]))
+    cmd = converter.getBatchWorkerCommand(os.path.join(self.tmpDir, 'out'), False, False, False)
+    options = [arg for arg in cmd[2:] if arg.startswith('--')]
+
+    self.assertEqual(len(options), len(set(options)))
+    args = converter.getArgumentParser().parse_args(cmd[2:])
+    self.assertTrue(args.pack)
+    self.assertEqual((args.pieces, args.memoryBudget), (4, 64))
+
+# =============================================================================
+
+if __name__ == "__main__":
+  unittest.main()
@@ -1,9 +1,61 @@
 from __future__ import print_function
-import sys, json, os, math, gzip, shutil, argparse, hashlib
-
-from paraview import simple
-from paraview.vtk import *
-import sys
+import sys, io, json, os, math, gzip, glob, shutil, argparse, hashlib, tempfile, zlib, struct, threading, subprocess, time, collections, importlib
+
+# ParaView is only imported for the inputs that plain VTK can not read
+try:
+  from vtkmodules.vtkCommonCore import *
+  from vtkmodules.vtkCommonDataModel import *
+  from vtkmodules.vtkCommonExecutionModel import vtkStreamingDemandDrivenPipeline
+except ImportError:
+  from paraview.vtk import *
+
+simple = None
+
+try:
+  import numpy
+  try:
+    from vtkmodules.util import numpy_support
+  except ImportError:
+    from vtk.util import numpy_support
+except ImportError:
+  numpy = None
+
+try:
+  from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+  ThreadPoolExecutor = None
+
+try:
+  import DracoPy
+  try:
+    from vtkmodules.vtkFiltersCore import vtkTriangleFilter
+    from vtkmodules.vtkFiltersGeometry import vtkDataSetSurfaceFilter
+  except ImportError:
+    from vtk import vtkTriangleFilter, vtkDataSetSurfaceFilter
+except ImportError:
+  DracoPy = None
+
+try:
+  from vtkmodules.vtkParallelCore import vtkMultiProcessController
+except ImportError:
+  vtkMultiProcessController = None
+
+try:
+  import resource
+except ImportError:
+  resource = None
+
+try:
+  from http.server import BaseHTTPRequestHandler, HTTPServer
+  from socketserver import ThreadingMixIn
+except ImportError:
+  from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+  from SocketServer import ThreadingMixIn
+
+try:
+  import queue
+except ImportError:
+  import Queue as queue
 
 if sys.version_info[0] == 3:
     buffer = memoryview
@@ -25,8 +77,359 @@ jsMapping = {
     'd': 'Float64Array'
 }
 
+# Unsigned types of the exported IdType arrays by element size
+idTypeMapping = {
+    1: 'Uint8Array',
+    2: 'Uint16Array',
+    4: 'Uint32Array',
+}
+
 writerMapping = {}
 
+hashMapping = {
+  'md5': hashlib.md5,
+  'sha1': hashlib.sha1,
+}
+
+if hasattr(hashlib, 'blake2b'):
+  hashMapping['blake2b'] = lambda: hashlib.blake2b(digest_size = 16)
+
+try:
+  import xxhash
+  hashMapping['xxh128'] = xxhash.xxh3_128
+except (ImportError, AttributeError):
+  pass
+
+# -----------------------------------------------------------------------------
+# Compression codecs: streaming compressors with compress(data) and flush()
+# -----------------------------------------------------------------------------
+
+def createGzipCompressor(level, size):
+  # wbits=31 produces a gzip stream without name/mtime in its header
+  return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+class ParallelGzipCompressor(object):
+  # pigz-like: blocks are deflated independently on a thread pool and end on
+  # a byte boundary (sync flush), so their concatenation is a single valid
+  # gzip member. Each block is primed with the end of the previous one.
+
+  windowSize = 32 * 1024
+
+  def __init__(self, level, size, pool, maxPending):
+    self.level = level
+    self.pool = pool
+    self.maxPending = maxPending
+    self.pending = []
+    self.window = None
+    self.crc = 0
+    self.size = 0
+    self.header = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+
+  def compressBlock(self, block, window):
+    if window:
+      compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY, window)
+    else:
+      compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+  def collect(self, nbPending):
+    output = [self.header]
+    self.header = b''
+    while len(self.pending) > nbPending:
+      output.append(self.pending.pop(0).result())
+    return b''.join(output)
+
+  def compress(self, data):
+    self.pending.append(self.pool.submit(self.compressBlock, data, self.window))
+    self.window = bytes(data[-self.windowSize:])
+    self.crc = zlib.crc32(data, self.crc)
+    self.size += len(data)
+    # Bound the memory held by blocks waiting to be written
+    return self.collect(self.maxPending)
+
+  def flush(self):
+    # Empty final block followed by the gzip trailer
+    trailer = b'\x03\x00' + struct.pack('<II', self.crc & 0xFFFFFFFF, self.size & 0xFFFFFFFF)
+    return self.collect(0) + trailer
+
+# Only codecs vtk.js decodes out of the box (CompressionHelper)
+codecMapping = {
+  'gz': { 'extension': '.gz', 'level': 9, 'create': createGzipCompressor, 'createParallel': ParallelGzipCompressor },
+}
+
+try:
+  import lz4.frame
+
+  class LZ4Compressor(object):
+
+    def __init__(self, level, size):
+      self.compressor = lz4.frame.LZ4FrameCompressor(compression_level = level)
+      self.header = self.compressor.begin(source_size = size)
+
+    def compress(self, data):
+      header, self.header = self.header, b''
+      return header + self.compressor.compress(data)
+
+    def flush(self):
+      return self.header + self.compressor.flush()
+
+  codecMapping['lz4'] = { 'extension': '.lz4', 'level': 0, 'create': LZ4Compressor }
+except ImportError:
+  pass
+
+# -----------------------------------------------------------------------------
+# Array filters: reversible transforms applied on the unsigned integer view of
+# the array elements before compression (undone by vtk.js ArrayFilterHelper)
+# -----------------------------------------------------------------------------
+
+BITSHUFFLE_BLOCK_SIZE = 8192
+
+def shuffleFilter(values, nbComponents):
+  # Byte k of every element goes to the k-th plane
+  return values.view(numpy.uint8).reshape(-1, values.itemsize).T.ravel().view(values.dtype)
+
+def bitTranspose(blocks):
+  # (nbBlocks, nbElements, itemSize) => bit planes of each block
+  bits = numpy.unpackbits(blocks, axis = 2, bitorder = 'little')
+  return numpy.packbits(bits.transpose(0, 2, 1), axis = 2, bitorder = 'little').reshape(-1)
+
+def bitshuffleFilter(values, nbComponents):
+  # Bit j of every element of a block goes to the j-th plane, the last
+  # elements (less than 8) of the last block are left as-is
+  itemSize = values.itemsize
+  data = values.view(numpy.uint8)
+  output = numpy.empty_like(data)
+  blockBytes = BITSHUFFLE_BLOCK_SIZE * itemSize
+  batchBytes = 64 * blockBytes # bound the 8x memory of unpackbits
+  for start in range(0, len(data), batchBytes):
+    batch = data[start:start + batchBytes]
+    fullBytes = len(batch) - len(batch) % blockBytes
+    tailBytes = (len(batch) - fullBytes) // itemSize // 8 * 8 * itemSize
+    if fullBytes:
+      output[start:start + fullBytes] = bitTranspose(batch[:fullBytes].reshape(-1, BITSHUFFLE_BLOCK_SIZE, itemSize))
+    if tailBytes:
+      output[start + fullBytes:start + fullBytes + tailBytes] = bitTranspose(batch[fullBytes:fullBytes + tailBytes].reshape(1, -1, itemSize))
+    output[start + fullBytes + tailBytes:start + len(batch)] = batch[fullBytes + tailBytes:]
+  return output.view(values.dtype)
+
+def deltaFilter(values, nbComponents):
+  # Difference with the same component of the previous tuple (wraps around)
+  output = values.copy()
+  output[nbComponents:] -= values[:-nbComponents]
+  return output
+
+def xorFilter(values, nbComponents):
+  output = values.copy()
+  output[nbComponents:] ^= values[:-nbComponents]
+  return output
+
+filterMapping = {
+  'shuffle': shuffleFilter,
+  'bitshuffle': bitshuffleFilter,
+  'delta': deltaFilter,
+  'xor': xorFilter,
+}
+
+def getArrayFilters(filters, itemSize):
+  # Shuffling single byte elements would not change anything
+  return [name for name in filters if itemSize > 1 or name != 'shuffle']
+
+def filterBuffer(pBuffer, filters, nbComponents):
+  data = memoryview(pBuffer)
+  values = numpy.frombuffer(data.cast('B'), dtype = numpy.dtype('u%d' % data.itemsize))
+  for name in filters:
+    values = filterMapping[name](values, nbComponents)
+  return values
+
+# -----------------------------------------------------------------------------
+# Array encodings: compact forms of constant, repetitive or low-cardinality
+# arrays, named by ref.encoding and expanded by the reader. Each encoding
+# returns the ref entries and the parts of the content, or None.
+# -----------------------------------------------------------------------------
+
+def constantEncoding(values, nbComponents, ranges):
+  if any(r['min'] != r['max'] for r in ranges[:nbComponents]):
+    return None
+  tuples = values.reshape(-1, nbComponents)
+  value = tuples[0]
+  if values.dtype.kind == 'f' and not numpy.isfinite(value).all():
+    return None
+  if values.dtype.itemsize == 8 and values.dtype.kind in 'iu' and numpy.abs(value).max() > 2 ** 53:
+    return None
+  # Ranges ignore NaN
+  if not (tuples == value).all():
+    return None
+  return { 'value': value.tolist() }, []
+
+def runLengthEncoding(values, nbComponents, ranges):
+  if values.dtype.kind not in 'iu':
+    return None
+  tuples = values.reshape(-1, nbComponents)
+  starts = numpy.flatnonzero((tuples[1:] != tuples[:-1]).any(axis = 1)) + 1
+  starts = numpy.concatenate(([0], starts))
+  lengths = numpy.diff(numpy.append(starts, len(tuples))).astype(numpy.uint32)
+  return { 'runs': len(starts) }, [lengths, tuples[starts]]
+
+def paletteEncoding(values, nbComponents, ranges):
+  if values.dtype.kind not in 'iu' or values.dtype.itemsize == 1:
+    return None
+  low = int(min(r['min'] for r in ranges[:nbComponents]))
+  high = int(max(r['max'] for r in ranges[:nbComponents]))
+  if high - low < 65536:
+    # Linear time for the usual small label ranges
+    offsets = values.reshape(-1).astype(numpy.int64) - low
+    entries = numpy.flatnonzero(numpy.bincount(offsets))
+    lookup = numpy.zeros(high - low + 1, dtype = numpy.int64)
+    lookup[entries] = numpy.arange(len(entries))
+    palette, indices = (entries + low).astype(values.dtype), lookup[offsets]
+  else:
+    palette, indices = numpy.unique(values.reshape(-1), return_inverse = True)
+  if len(palette) > 65536:
+    return None
+  indexType = numpy.uint8 if len(palette) <= 256 else numpy.uint16
+  if numpy.dtype(indexType).itemsize >= values.dtype.itemsize:
+    return None
+  return { 'paletteSize': len(palette) }, [palette, indices.astype(indexType)]
+
+encodingMapping = {
+  'constant': constantEncoding,
+  'rle': runLengthEncoding,
+  'palette': paletteEncoding,
+}
+
+def encodeArray(values, nbComponents, ranges, encodings):
+  # Smallest encoding, only if smaller than the plain array
+  best = None
+  bestSize = values.nbytes
+  if values.size == 0:
+    return None
+  for name in encodings:
+    encoded = encodingMapping[name](values, nbComponents, ranges)
+    if encoded is None:
+      continue
+    size = sum(part.nbytes for part in encoded[1])
+    if size < bestSize:
+      best = (name,) + encoded
+      bestSize = size
+  return best
+
+# -----------------------------------------------------------------------------
+# Cell varint encoding: legacy [n, id0, id1, ...] cell arrays with each id
+# replaced by its zigzag delta to the previous id (across cells), all values
+# being written as LEB128 varints
+# -----------------------------------------------------------------------------
+
+def varintEncode(tokens):
+  # 7 bits per byte, the high bit is set on all the bytes of a value but its last
+  nbBytes = numpy.ones(len(tokens), dtype = numpy.int64)
+  for k in range(1, 10):
+    more = tokens >= (1 << (7 * k))
+    if not more.any():
+      break
+    nbBytes += more
+  starts = numpy.cumsum(nbBytes) - nbBytes
+  output = numpy.empty(int(nbBytes.sum()), dtype = numpy.uint8)
+  for k in range(int(nbBytes.max()) if len(tokens) else 0):
+    selected = numpy.flatnonzero(nbBytes > k)
+    byte = (tokens[selected] >> numpy.uint64(7 * k)) & numpy.uint64(0x7f)
+    output[starts[selected] + k] = byte | numpy.where(nbBytes[selected] > k + 1, 0x80, 0).astype(numpy.uint64)
+  return output
+
+def cellVarintEncoding(values, cells):
+  if not hasattr(cells, 'GetOffsetsArray'):
+    # Cell sizes can only be located with the offsets of VTK 9 cell arrays
+    return None
+  legacy = values.reshape(-1).astype(numpy.int64)
+  offsets = numpy_support.vtk_to_numpy(cells.GetOffsetsArray()).astype(numpy.int64)
+  nbCells = len(offsets) - 1
+  if nbCells < 0 or len(legacy) != offsets[-1] + nbCells or (len(legacy) and legacy.min() < 0):
+    return None
+
+  isId = numpy.ones(len(legacy), dtype = bool)
+  isId[offsets[:-1] + numpy.arange(nbCells)] = False
+  deltas = numpy.diff(legacy[isId], prepend = 0)
+  tokens = legacy.astype(numpy.uint64)
+  tokens[isId] = ((deltas << 1) ^ (deltas >> 63)).astype(numpy.uint64)
+  return 'cellVarint', {}, [varintEncode(tokens)]
+
+# -----------------------------------------------------------------------------
+# Lossy encodings: float arrays quantized to Uint8/Uint16 and unit normals
+# octahedral encoded into 2 Uint8/Uint16, using the smallest type keeping the
+# error below the requested maximum. They return the ref entries, the parts of
+# the content and the achieved error, or None.
+# -----------------------------------------------------------------------------
+
+quantizedTypes = [('u1', 'Uint8Array'), ('u2', 'Uint16Array')]
+
+def quantizeEncoding(values, nbComponents, ranges, maxError):
+  # Errors are relative to the range of each component
+  if values.dtype.kind != 'f' or not numpy.isfinite(values).all():
+    return None
+  tuples = values.reshape(-1, nbComponents).astype(numpy.float64)
+  low = numpy.array([r['min'] for r in ranges[:nbComponents]])
+  extent = numpy.array([r['max'] for r in ranges[:nbComponents]]) - low
+  for dtype, dataType in quantizedTypes:
+    levels = numpy.iinfo(dtype).max
+    if 0.5 / levels > maxError:
+      continue
+    scale = extent / levels
+    quantized = numpy.rint((tuples - low) / numpy.where(scale > 0, scale, 1)).astype(dtype)
+    decoded = (low + quantized * scale).astype(values.dtype)
+    error = (numpy.abs(decoded - tuples).max(axis = 0) / numpy.where(extent > 0, extent, 1)).max()
+    return { 'quantizedType': dataType, 'offset': low.tolist(), 'scale': scale.tolist() }, [quantized], float(error)
+  return None
+
+def foldOctahedron(u, v, lower):
+  # Map the lower half of the octahedron onto the corners of the square
+  foldedU = (1 - numpy.abs(v)) * numpy.where(u < 0, -1.0, 1.0)
+  foldedV = (1 - numpy.abs(u)) * numpy.where(v < 0, -1.0, 1.0)
+  return numpy.where(lower, foldedU, u), numpy.where(lower, foldedV, v)
+
+def decodeOctahedral(quantized, levels):
+  uv = quantized.astype(numpy.float64) * (2.0 / levels) - 1
+  z = 1 - numpy.abs(uv).sum(axis = 1)
+  u, v = foldOctahedron(uv[:, 0], uv[:, 1], z < 0)
+  normals = numpy.stack([u, v, z], axis = 1)
+  return normals / numpy.linalg.norm(normals, axis = 1)[:, None]
+
+def octahedralEncoding(values, nbComponents, maxError):
+  # Error is the angle in degrees between the original and decoded normals
+  if values.dtype.kind != 'f' or nbComponents != 3:
+    return None
+  normals = values.reshape(-1, 3).astype(numpy.float64)
+  lengths = numpy.linalg.norm(normals, axis = 1)
+  if not (numpy.abs(lengths - 1) < 1e-3).all():
+    # Only directions are kept
+    return None
+  projected = normals / numpy.abs(normals).sum(axis = 1)[:, None]
+  u, v = foldOctahedron(projected[:, 0], projected[:, 1], projected[:, 2] < 0)
+  for dtype, dataType in quantizedTypes:
+    levels = numpy.iinfo(dtype).max
+    quantized = numpy.rint((numpy.stack([u, v], axis = 1) + 1) * (0.5 * levels)).astype(dtype)
+    cosines = (decodeOctahedral(quantized, levels) * normals).sum(axis = 1) / lengths
+    error = float(numpy.degrees(numpy.arccos(numpy.clip(cosines.min(), -1, 1))))
+    if error <= maxError:
+      return { 'quantizedType': dataType }, [quantized], error
+  return None
+
+def encodeLossy(name, values, nbComponents, ranges, normals):
+  # Only applied when requested, the achieved error is reported by the sink
+  if normals and arraySink.normalsError:
+    encoding = 'octahedral'
+    encoded = octahedralEncoding(values, nbComponents, arraySink.normalsError)
+  elif arraySink.quantizeError and values.dtype.kind == 'f':
+    encoding = 'quantize'
+    encoded = quantizeEncoding(values, nbComponents, ranges, arraySink.quantizeError)
+  else:
+    return None
+
+  if encoded is None:
+    arraySink.addLossy(name, encoding, None, None)
+    return None
+  entries, parts, error = encoded
+  arraySink.addLossy(name, encoding, entries['quantizedType'], error)
+  return encoding, entries, parts
+
 # -----------------------------------------------------------------------------
 
 def getRangeInfo(array, component):
@@ -39,38 +442,495 @@ def getRangeInfo(array, component):
 
 # -----------------------------------------------------------------------------
 
-def getRef(destDirectory, md5):
+def getRanges(array, values = None):
+  nbComponents = array.GetNumberOfComponents()
+  components = list(range(nbComponents)) + [-1] if nbComponents > 1 else [0]
+  if values is None or values.size == 0:
+    return [getRangeInfo(array, component) for component in components]
+
+  # numpy reductions release the GIL, unlike vtkDataArray::GetRange
+  values = values.reshape(array.GetNumberOfTuples(), nbComponents)
+  ranges = []
+  for component in components:
+    if component < 0:
+      componentValues = numpy.sqrt(numpy.square(values, dtype = numpy.float64).sum(axis = 1))
+    else:
+      componentValues = values[:, component]
+    if componentValues.dtype.kind == 'f':
+      r = (float(numpy.nanmin(componentValues)), float(numpy.nanmax(componentValues)))
+    else:
+      r = (float(componentValues.min()), float(componentValues.max()))
+    if math.isnan(r[0]):
+      # Only NaN: keep VTK semantic
+      ranges.append(getRangeInfo(array, component))
+    else:
+      ranges.append({ 'min': r[0], 'max': r[1], 'component': array.GetComponentName(component) })
+  return ranges
+
+# -----------------------------------------------------------------------------
+
+def getRef(destDirectory, md5, compression = None):
   ref = {}
   ref['id'] = md5
   ref['encode'] = 'BigEndian' if sys.byteorder == 'big' else 'LittleEndian'
   ref['basepath'] = destDirectory
+  if compression:
+    ref['compression'] = compression
   return ref
 
+# -----------------------------------------------------------------------------
+# Array sink: hash and compress an array buffer in a single pass
+# -----------------------------------------------------------------------------
+
+class ArraySink(object):
+
+  def __init__(self, hashName = 'md5', codec = 'gz', compressLevel = None, blockSize = 4 * 1024 * 1024, filters = None, blockWorkers = 1, chunkSize = 0, encodings = None, quantizeError = 0, normalsError = 0, varintCells = False):
+    if hashName not in hashMapping:
+      raise ValueError('Unsupported hash "%s", available: %s' % (hashName, ', '.join(sorted(hashMapping))))
+    if codec not in codecMapping:
+      raise ValueError('Unsupported codec "%s", available: %s' % (codec, ', '.join(sorted(codecMapping))))
+    for name in filters or []:
+      if name not in filterMapping:
+        raise ValueError('Unsupported filter "%s", available: %s' % (name, ', '.join(sorted(filterMapping))))
+    if filters and numpy is None:
+      raise ValueError('Array filters require numpy')
+    for name in encodings or []:
+      if name not in encodingMapping:
+        raise ValueError('Unsupported encoding "%s", available: %s' % (name, ', '.join(sorted(encodingMapping))))
+    if (encodings or quantizeError or normalsError or varintCells) and numpy is None:
+      raise ValueError('Array encodings require numpy')
+    self.hashName = hashName
+    self.codec = codec
+    self.compressLevel = codecMapping[codec]['level'] if compressLevel is None else compressLevel
+    self.blockSize = blockSize
+    self.filters = list(filters or [])
+    # Threads compressing the blocks of a single large array
+    self.blockWorkers = blockWorkers
+    self.blockPool = ThreadPoolExecutor(blockWorkers) if blockWorkers > 1 and ThreadPoolExecutor else None
+    # Arrays larger than chunkSize bytes are stored as several files
+    self.chunkSize = chunkSize
+    self.encodings = list(encodings or [])
+    # Maximum errors of the lossy encodings (0: lossless)
+    self.quantizeError = quantizeError
+    self.normalsError = normalsError
+    self.lossy = {}
+    self.varintCells = varintCells
+    self.lossyLock = threading.Lock()
+
+  def getFileName(self, blobId, compress):
+    return blobId + codecMapping[self.codec]['extension'] if compress else blobId
+
+  def getCompression(self, compress):
+    # Value recorded in the array ref for the reader to pick its decoder
+    return self.codec if compress else None
+
+  def getDataDir(self, datasetDir):
+    return os.path.join(datasetDir, 'data')
+
+  def hashBuffer(self, data):
+    hasher = hashMapping[self.hashName]()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+  def write(self, dataDir, pBuffer, compress = True):
+    return self.writeBlob(dataDir, memoryview(pBuffer).cast('B'), compress)
+
+  def writeChunks(self, dataDir, pBuffer, compress = True, tupleSize = 1):
+    # Chunks hold whole tuples, the array id is the hash of the chunk ids
+    data = memoryview(pBuffer).cast('B')
+    step = max(tupleSize, self.chunkSize - self.chunkSize % tupleSize)
+    chunks = []
+    for offset in range(0, len(data), step):
+      chunk = data[offset:offset + step]
+      chunks.append({ 'id': self.write(dataDir, chunk, compress), 'offset': offset, 'size': len(chunk) })
+    return self.hashBuffer(''.join(chunk['id'] for chunk in chunks).encode('ascii')), chunks
+
+  def createCompressor(self, size):
+    codec = codecMapping[self.codec]
+    if self.blockPool and 'createParallel' in codec and size > self.blockSize:
+      return codec['createParallel'](self.compressLevel, size, self.blockPool, 2 * self.blockWorkers)
+    return codec['create'](self.compressLevel, size)
+
+  def streamBlob(self, data, compress, f, hasher = None):
+    compressor = self.createCompressor(len(data)) if compress else None
+    for offset in range(0, len(data), self.blockSize):
+      block = data[offset:offset + self.blockSize]
+      if hasher:
+        hasher.update(block)
+      f.write(compressor.compress(block) if compressor else block)
+    if compressor:
+      f.write(compressor.flush())
+
+  def writeBlob(self, dataDir, data, compress, blobId = None):
+    # Hash while streaming unless the id is already known
+    hasher = None if blobId else hashMapping[self.hashName]()
+
+    fd, tmpPath = tempfile.mkstemp(dir = dataDir, prefix = '.tmp-')
+    try:
+      with os.fdopen(fd, 'wb') as f:
+        self.streamBlob(data, compress, f, hasher)
+
+      blobId = blobId or hasher.hexdigest()
+      os.replace(tmpPath, os.path.join(dataDir, self.getFileName(blobId, compress)))
+    except:
+      if os.path.exists(tmpPath):
+        os.remove(tmpPath)
+      raise
+
+    return blobId
+
+  def addManifest(self, datasetDir, dataDir, root):
+    pass
+
+  def addLossy(self, name, encoding, dataType, error):
+    with self.lossyLock:
+      key = (name or '', encoding, dataType)
+      count, maxError = self.lossy.get(key, (0, 0))
+      self.lossy[key] = (count + 1, max(maxError, error or 0))
+
+  def report(self):
+    units = { 'quantize': 'of the range', 'octahedral': 'degrees' }
+    for (name, encoding, dataType), (count, maxError) in sorted(self.lossy.items(), key = lambda item: str(item[0])):
+      if dataType:
+        print('%s: %d arrays %s encoded as %s, max error %g %s' % (name, count, encoding, dataType, maxError, units[encoding]))
+      else:
+        print('%s: %d arrays kept at full precision, %s error above the maximum' % (name, count, encoding))
+
+# -----------------------------------------------------------------------------
+# Content store: array sink shared across datasets which skips known arrays
+# -----------------------------------------------------------------------------
+
+class ContentStore(ArraySink):
+
+  def __init__(self, storeDir, hashName = 'md5', codec = 'gz', **kwargs):
+    ArraySink.__init__(self, hashName, codec, **kwargs)
+    self.storeDir = os.path.abspath(storeDir)
+    self.indexPath = os.path.join(self.storeDir, 'index.%s.txt' % hashName)
+    self.known = set()
+    self.lock = threading.Lock()
+    self.written = 0
+    self.skipped = 0
+    self.skippedBytes = 0
+
+    if not os.path.exists(self.storeDir):
+      os.makedirs(self.storeDir)
+
+    if os.path.exists(self.indexPath):
+      with open(self.indexPath) as f:
+        self.known.update(line.strip() for line in f if line.strip())
+
+  def getDataDir(self, datasetDir):
+    return self.storeDir
+
+  def write(self, dataDir, pBuffer, compress = True):
+    data = memoryview(pBuffer).cast('B')
+    blobId = self.hashBuffer(data)
+    fileName = self.getFileName(blobId, compress)
+
+    if fileName in self.known and os.path.exists(os.path.join(self.storeDir, fileName)):
+      with self.lock:
+        self.skipped += 1
+        self.skippedBytes += len(data)
+      return blobId
+
+    self.writeBlob(self.storeDir, data, compress, blobId)
+    with self.lock:
+      self.written += 1
+      self.known.add(fileName)
+      with open(self.indexPath, 'a') as f:
+        f.write(fileName + '\n')
+
+    return blobId
+
+  def report(self):
+    ArraySink.report(self)
+    print('Content store %s: %d arrays written, %d arrays (%d bytes) already stored' % (self.storeDir, self.written, self.skipped, self.skippedBytes))
+
+# -----------------------------------------------------------------------------
+# Packed sink: all arrays of a data directory appended to a single file, their
+# offset/length/compression being listed in the index.json using them
+# -----------------------------------------------------------------------------
+
+class PackedSink(ArraySink):
+
+  alignment = 8
+
+  def __init__(self, hashName = 'md5', codec = 'gz', packName = 'data.pack', **kwargs):
+    ArraySink.__init__(self, hashName, codec, **kwargs)
+    self.packName = packName
+    self.packs = {}
+    self.lock = threading.Lock()
+
+  def getDataDir(self, datasetDir):
+    return datasetDir
+
+  def getPack(self, dataDir):
+    with self.lock:
+      if dataDir not in self.packs:
+        path = os.path.join(dataDir, self.packName)
+        self.packs[dataDir] = { 'path': path, 'file': open(path, 'wb'), 'size': 0, 'blobs': {}, 'spill': tempfile.TemporaryFile(dir = dataDir), 'pending': {} }
+      return self.packs[dataDir]
+
+  def write(self, dataDir, pBuffer, compress = True):
+    data = memoryview(pBuffer).cast('B')
+    hasher = hashMapping[self.hashName]()
+    content = io.BytesIO()
+    self.streamBlob(data, compress, content, hasher)
+    blobId = hasher.hexdigest()
+
+    # Blobs complete in thread order, they are kept aside until addManifest
+    # lays them out in the order of the refs
+    pack = self.getPack(dataDir)
+    with self.lock:
+      if blobId not in pack['blobs'] and blobId not in pack['pending']:
+        pack['spill'].seek(0, os.SEEK_END)
+        pack['pending'][blobId] = (pack['spill'].tell(), len(content.getbuffer()), compress)
+        pack['spill'].write(content.getbuffer())
+
+    return blobId
+
+  def addManifest(self, datasetDir, dataDir, root):
+    pack = self.getPack(dataDir)
+    blobs = {}
+    with self.lock:
+      for ref in getRefs(root):
+        for blobId in getBlobIds(ref):
+          if blobId in pack['pending']:
+            spillOffset, length, compress = pack['pending'].pop(blobId)
+            pack['spill'].seek(spillOffset)
+            # Aligned offsets let uncompressed arrays be viewed in place
+            padding = -pack['size'] % self.alignment
+            pack['file'].write(b'\0' * padding + pack['spill'].read(length))
+            blob = { 'offset': pack['size'] + padding, 'length': length }
+            if compress:
+              blob['compression'] = self.codec
+            pack['blobs'][blobId] = blob
+            pack['size'] = blob['offset'] + length
+          blobs[blobId] = pack['blobs'][blobId]
+      pack['file'].flush()
+    root['pack'] = { 'url': os.path.relpath(pack['path'], datasetDir), 'alignment': self.alignment, 'blobs': blobs }
+
+  def report(self):
+    ArraySink.report(self)
+    for pack in self.packs.values():
+      pack['file'].close()
+      pack['spill'].close()
+      print('Packed %d array blobs into %s (%d bytes)' % (len(pack['blobs']), pack['path'], pack['size']))
+
+arraySink = ArraySink()
+
+# -----------------------------------------------------------------------------
+# Array encoder: run hashing/compression/ranges of arrays on a thread pool
+# -----------------------------------------------------------------------------
+
+class ArrayEncoder(object):
+
+  def __init__(self, workers = 1):
+    self.workers = workers
+    self.pool = ThreadPoolExecutor(workers) if workers > 1 and ThreadPoolExecutor else None
+    self.pending = []
+
+  def submit(self, fn, *args):
+    if self.pool:
+      self.pending.append(self.pool.submit(fn, *args))
+    else:
+      fn(*args)
+
+  def wait(self):
+    # Arrays must not be modified (pipeline update) before this returns
+    pending, self.pending = self.pending, []
+    for future in pending:
+      future.result()
+
+arrayEncoder = ArrayEncoder()
+
+# -----------------------------------------------------------------------------
+
+def getRefs(node):
+  # Array refs of an index.json fragment
+  if isinstance(node, dict):
+    ref = node.get('ref')
+    if isinstance(ref, dict) and ref.get('id') and 'basepath' in ref:
+      yield ref
+    for value in node.values():
+      for ref in getRefs(value):
+        yield ref
+  elif isinstance(node, list):
+    for value in node:
+      for ref in getRefs(value):
+        yield ref
+
+def getBlobIds(ref):
+  if ref.get('encoding') == 'constant':
+    return []
+  return [chunk['id'] for chunk in ref['chunks']] if 'chunks' in ref else [ref['id']]
+
+# -----------------------------------------------------------------------------
+# Checkpoint: append-only manifest of completed steps and blocks of a run
+# -----------------------------------------------------------------------------
+
+class Checkpoint(object):
+
+  def __init__(self, datasetDir, signature, resume = False):
+    self.rootDir = datasetDir
+    self.path = os.path.join(datasetDir, 'checkpoint.jsonl')
+    self.signature = signature
+    self.entries = {}
+    self.blockPath = []
+    self.restored = 0
+
+    if not os.path.exists(datasetDir):
+      os.makedirs(datasetDir)
+
+    if resume and os.path.exists(self.path):
+      records = self.load()
+      if records and records[0].get('signature') == signature:
+        for record in records[1:]:
+          self.entries[record['key']] = record
+        return
+      print ('Checkpoint %s does not match this conversion, starting over' % self.path)
+
+    with open(self.path, 'w') as f:
+      f.write(json.dumps({ 'signature': signature }) + '\n')
+
+  def remove(self):
+    if os.path.exists(self.path):
+      os.remove(self.path)
+
+  def load(self):
+    records = []
+    with open(self.path) as f:
+      for line in f:
+        try:
+          records.append(json.loads(line))
+        except ValueError:
+          pass # last line of an interrupted run
+    return records
+
+  def getKey(self, datasetDir, name = None):
+    key = os.path.relpath(datasetDir, self.rootDir).replace(os.sep, '/')
+    return '/'.join([key] + self.blockPath + ([name] if name else []))
+
+  def getFiles(self, datasetDir, fragment, compress):
+    files = []
+    for ref in getRefs(fragment):
+      for blobId in getBlobIds(ref):
+        filePath = os.path.join(datasetDir, ref['basepath'], arraySink.getFileName(blobId, compress))
+        files.append(os.path.relpath(filePath, self.rootDir))
+    return files
+
+  def hashFile(self, filePath):
+    with open(filePath, 'rb') as f:
+      return hashlib.md5(f.read()).hexdigest()
+
+  def add(self, key, datasetDir, fragment, compress = True, indexPath = None):
+    record = { 'key': key, 'files': self.getFiles(datasetDir, fragment, compress), 'fragment': fragment }
+    if indexPath:
+      record['index'] = self.hashFile(indexPath)
+    self.entries[key] = record
+
+    # Single append so concurrent time workers never interleave their records
+    fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+    try:
+      os.write(fd, (json.dumps(record) + '\n').encode('utf-8'))
+    finally:
+      os.close(fd)
+
+  def restore(self, key, indexPath = None):
+    # Completed work is trusted when every array file it references is still
+    # there: file names are content hashes, nothing gets re-encoded
+    record = self.entries.get(key)
+    if not record:
+      return None
+    for fileName in record['files']:
+      if not os.path.exists(os.path.join(self.rootDir, fileName)):
+        return None
+    if indexPath and not (os.path.exists(indexPath) and self.hashFile(indexPath) == record['index']):
+      writeJSON(indexPath, record['fragment'])
+    self.restored += 1
+    return record['fragment']
+
+checkpoint = None
+
+pvpython = sys.executable
+
+# Size in points of the image pyramid bricks (0: no pyramid)
+pyramidBrickSize = 0
+
+# Point numbering of reordered meshes: 'first-use' or 'morton' (None: keep order)
+meshReorder = None
+
+# Position quantization bits of the Draco output (0: regular vtk.js output)
+dracoBits = 0
+dracoCompressionLevel = 7
+
+# Number of pieces requested from the pipeline and memory budget in MB of a
+# single piece (1 and 0: the whole dataset is loaded at once)
+exportPieces = 1
+memoryBudget = 0
+MAX_PIECES = 2 ** 31 - 1 # UpdatePiece takes C ints
+
+# Data loading: 'vtk' readers only, 'paraview' only, or 'auto' (vtk readers
+# for the formats they support, paraview otherwise)
+dataBackend = 'auto'
+
+# Readers kept open by long lived workers, by input path (None: no cache)
+readerCache = None
+READER_CACHE_SIZE = 8
+
+# -----------------------------------------------------------------------------
+
+def getIdTypeBuffer(array, nbPoints = None):
+  arraySize = array.GetNumberOfTuples() * array.GetNumberOfComponents()
+
+  if numpy is None:
+    newArray = vtkTypeUInt32Array()
+    newArray.SetNumberOfTuples(arraySize)
+    for i in range(arraySize):
+      newArray.SetValue(i, -1 if array.GetValue(i) < 0 else array.GetValue(i))
+    return buffer(newArray)
+
+  values = numpy_support.vtk_to_numpy(array).reshape(-1)
+  low = values.min() if arraySize else 0
+  if nbPoints is not None and low >= 0:
+    # Connectivity of meshes with few points fits in 8 or 16 bits, the type
+    # follows the number of points (cell sizes only matter when larger)
+    largest = max(nbPoints - 1, values.max() if arraySize else 0)
+    for dtype in (numpy.uint8, numpy.uint16):
+      if largest <= numpy.iinfo(dtype).max:
+        return buffer(values.astype(dtype))
+
+  if values.dtype.itemsize == 4 and low >= -1:
+    # 32 bit ids: reinterpret in place (-1 already reads as 0xFFFFFFFF)
+    return buffer(values.view(numpy.uint32))
+
+  narrowed = values.astype(numpy.uint32)
+  narrowed[values < 0] = 0xFFFFFFFF
+  return buffer(narrowed)
+
+# -----------------------------------------------------------------------------
+
+def getStringArrayContent(array):
+  # vtkStringArray can not be viewed by numpy, so map the getter in one go
+  arraySize = array.GetNumberOfTuples() * array.GetNumberOfComponents()
+  return json.dumps(list(map(array.GetValue, range(arraySize)))).encode('utf-8')
+
 # -----------------------------------------------------------------------------
 
 def dumpStringArray(datasetDir, dataDir, array, root = {}, compress = True):
   if not array:
     return None
 
-  stringArray = []
-  arraySize = array.GetNumberOfTuples()
-  for i in range(arraySize):
-    stringArray.append(array.GetValue(i))
+  strData = getStringArrayContent(array)
 
-  strData = json.dumps(stringArray)
+  # The id is filled once the encoding task is done, key order stays the same
+  ref = root['ref'] = getRef(os.path.relpath(dataDir, datasetDir), None, arraySink.getCompression(compress))
 
-  pMd5 = hashlib.md5(strData).hexdigest()
-  pPath = os.path.join(dataDir, pMd5)
-  with open(pPath, 'wb') as f:
-    f.write(strData)
+  def encode():
+    ref['id'] = arraySink.write(dataDir, strData, compress)
 
-  if compress:
-    with open(pPath, 'rb') as f_in, gzip.open(os.path.join(dataDir, pMd5 + '.gz'), 'wb') as f_out:
-      shutil.copyfileobj(f_in, f_out)
-      f_in.close()
-      os.remove(pPath)
+  arrayEncoder.submit(encode)
 
-  root['ref'] = getRef(os.path.relpath(dataDir, datasetDir), pMd5)
   root['vtkClass'] = 'vtkStringArray'
   root['name'] = array.GetName()
   root['dataType'] = 'JSON'
@@ -81,48 +941,68 @@ def dumpStringArray(datasetDir, dataDir, array, root = {}, compress = True):
 
 # -----------------------------------------------------------------------------
 
-def dumpDataArray(datasetDir, dataDir, array, root = {}, compress = True):
+def dumpDataArray(datasetDir, dataDir, array, root = {}, compress = True, quantize = False, normals = False, cells = None, nbPoints = None):
   if not array:
     return None
 
   if array.GetDataType() == 12:
-    # IdType need to be converted to Uint32
-    arraySize = array.GetNumberOfTuples() * array.GetNumberOfComponents()
-    newArray = vtkTypeUInt32Array()
-    newArray.SetNumberOfTuples(arraySize)
-    for i in range(arraySize):
-      newArray.SetValue(i, -1 if array.GetValue(i) < 0 else array.GetValue(i))
-    pBuffer = buffer(newArray)
+    # IdType need to be converted to Uint32, or for the connectivity of
+    # nbPoints points to the narrowest unsigned type holding the point ids
+    pBuffer = getIdTypeBuffer(array, nbPoints)
+    dataType = idTypeMapping[memoryview(pBuffer).itemsize]
   else:
     pBuffer = buffer(array)
+    dataType = jsMapping[arrayTypesMapping[array.GetDataType()]]
 
-  pMd5 = hashlib.md5(pBuffer).hexdigest()
-  pPath = os.path.join(dataDir, pMd5)
-  with open(pPath, 'wb') as f:
-    f.write(pBuffer)
-
-  if compress:
-    with open(pPath, 'rb') as f_in, gzip.open(os.path.join(dataDir, pMd5 + '.gz'), 'wb') as f_out:
-        shutil.copyfileobj(f_in, f_out)
-        f_in.close()
-        os.remove(pPath)
+  values = numpy_support.vtk_to_numpy(array) if numpy is not None else None
 
   # print array
   # print array.GetName(), '=>', jsMapping[arrayTypesMapping[array.GetDataType()]]
 
-  root['ref'] = getRef(os.path.relpath(dataDir, datasetDir), pMd5)
+  # The id and ranges are filled once the encoding task is done, key order stays the same
+  ref = root['ref'] = getRef(os.path.relpath(dataDir, datasetDir), None, arraySink.getCompression(compress))
+  filters = getArrayFilters(arraySink.filters, memoryview(pBuffer).itemsize)
+  if filters:
+    ref['filters'] = filters
   root['vtkClass'] = 'vtkDataArray'
   root['name'] = array.GetName()
-  root['dataType'] = jsMapping[arrayTypesMapping[array.GetDataType()]]
+  root['dataType'] = dataType
   root['numberOfComponents'] = array.GetNumberOfComponents()
   root['size'] = array.GetNumberOfComponents() * array.GetNumberOfTuples()
-  root['ranges'] = []
-  if root['numberOfComponents'] > 1:
-    for i in range(root['numberOfComponents']):
-      root['ranges'].append(getRangeInfo(array, i))
-    root['ranges'].append(getRangeInfo(array, -1))
-  else:
-    root['ranges'].append(getRangeInfo(array, 0))
+  ranges = root['ranges'] = []
+
+  def encode():
+    ranges.extend(getRanges(array, values))
+    encoded = None
+    if values is not None and array.GetDataType() != 12:
+      if arraySink.encodings:
+        encoded = encodeArray(values, array.GetNumberOfComponents(), ranges, arraySink.encodings)
+      if not encoded and quantize:
+        encoded = encodeLossy(array.GetName(), values, array.GetNumberOfComponents(), ranges, normals)
+    elif values is not None and cells is not None and arraySink.varintCells:
+      encoded = cellVarintEncoding(values, cells)
+
+    if encoded:
+      name, entries, parts = encoded
+      ref.pop('filters', None)
+      ref['encoding'] = name
+      ref.update(entries)
+      if not parts:
+        # Nothing to write, the id only identifies the values
+        ref.pop('compression', None)
+        ref['id'] = arraySink.hashBuffer(json.dumps([name, root['dataType'], root['size'], entries]).encode('utf-8'))
+        return
+      data = numpy.concatenate([part.reshape(-1).view(numpy.uint8) for part in parts])
+    else:
+      data = filterBuffer(pBuffer, filters, array.GetNumberOfComponents()) if filters else pBuffer
+
+    if arraySink.chunkSize and memoryview(data).nbytes > arraySink.chunkSize:
+      tupleSize = memoryview(data).itemsize * array.GetNumberOfComponents()
+      ref['id'], ref['chunks'] = arraySink.writeChunks(dataDir, data, compress, tupleSize)
+    else:
+      ref['id'] = arraySink.write(dataDir, data, compress)
+
+  arrayEncoder.submit(encode)
 
   return root
 
@@ -136,7 +1016,8 @@ def dumpAttributes(datasetDir, dataDir, dataset, root = {}, compress = True):
     array = dataset.GetPointData().GetArray(i)
     abstractArray = dataset.GetPointData().GetAbstractArray(i)
     if array:
-      _array = dumpDataArray(datasetDir, dataDir, array, {}, compress)
+      normals = dataset.GetPointData().IsArrayAnAttribute(i) == vtkDataSetAttributes.NORMALS
+      _array = dumpDataArray(datasetDir, dataDir, array, {}, compress, True, normals)
       if _array:
         if (root['vtkClass'] == 'vtkImageData'):
           _array['ref']['registration']="setScalars"
@@ -154,7 +1035,7 @@ def dumpAttributes(datasetDir, dataDir, dataset, root = {}, compress = True):
     array = dataset.GetCellData().GetArray(i)
     abstractArray = dataset.GetCellData().GetAbstractArray(i)
     if array:
-      _array = dumpDataArray(datasetDir, dataDir, array, {}, compress)
+      _array = dumpDataArray(datasetDir, dataDir, array, {}, compress, True)
       if _array:
         _cellData['arrays'].append({ "data": _array })
     elif abstractArray:
@@ -178,13 +1059,166 @@ def dumpAttributes(datasetDir, dataDir, dataset, root = {}, compress = True):
         _fieldData['arrays'].append({ "data": _array })
   return root
 
+# -----------------------------------------------------------------------------
+# Mesh reordering: triangles ordered for the GPU vertex cache and points
+# renumbered by first use or along a Morton curve
+# -----------------------------------------------------------------------------
+
+VERTEX_CACHE_SIZE = 16
+
+def getACMR(triangles, cacheSize = VERTEX_CACHE_SIZE):
+  # Average cache miss ratio: vertices transformed per triangle, estimated
+  # without simulating the cache by counting a hit when fewer than cacheSize
+  # misses happened since the previous use of the vertex
+  corners = triangles.reshape(-1)
+  sortedCorners = numpy.argsort(corners, kind = 'stable')
+  reuse = corners[sortedCorners[1:]] == corners[sortedCorners[:-1]]
+  previous = sortedCorners[:-1][reuse]
+  current = sortedCorners[1:][reuse]
+  # Misses are first bounded by the corners in between, then counted once
+  misses = numpy.ones(len(corners), dtype = numpy.int64)
+  misses[current[current - previous <= cacheSize]] = 0
+  misses = numpy.concatenate([[0], numpy.cumsum(misses)])
+  hits = numpy.count_nonzero(misses[current] - misses[previous + 1] < cacheSize)
+  return (len(corners) - hits) / float(max(1, len(triangles)))
+
+def getFirstUseRanks(triangles, nbPoints):
+  corners = triangles.reshape(-1)
+  first = numpy.full(nbPoints, len(corners), dtype = numpy.int64)
+  numpy.minimum.at(first, corners, numpy.arange(len(corners)))
+  ranks = numpy.empty(nbPoints, dtype = numpy.int64)
+  ranks[numpy.argsort(first, kind = 'stable')] = numpy.arange(nbPoints)
+  return ranks
+
+def getCacheOrder(triangles, nbPoints, centers):
+  # Triangles along a Morton curve, then grouped in fans around the vertex
+  # they share that was used first so that neighbours stay in cache
+  order = getMortonOrder(centers)
+  ranks = numpy.sort(getFirstUseRanks(triangles[order], nbPoints)[triangles[order]], axis = 1)
+  return order[numpy.lexsort((ranks[:, 2], ranks[:, 1], ranks[:, 0]))]
+
+def getMortonOrder(points):
+  low = points.min(axis = 0)
+  extent = points.max(axis = 0) - low
+  grid = ((points - low) / numpy.where(extent > 0, extent, 1) * (2 ** 21 - 1)).astype(numpy.uint64)
+  codes = numpy.zeros(len(points), dtype = numpy.uint64)
+  for bit in range(21):
+    for axis in range(3):
+      codes |= ((grid[:, axis] >> numpy.uint64(bit)) & numpy.uint64(1)) << numpy.uint64(3 * bit + axis)
+  return numpy.argsort(codes, kind = 'stable')
+
+def getFirstUseOrder(connectivity, nbPoints):
+  first = numpy.unique(connectivity, return_index = True)[1]
+  used = connectivity[numpy.sort(first)]
+  unused = numpy.ones(nbPoints, dtype = bool)
+  unused[used] = False
+  return numpy.concatenate([used, numpy.flatnonzero(unused)])
+
+def permuteArray(array, order):
+  if array.IsA('vtkDataArray') and array.GetDataType() != VTK_BIT:
+    values = numpy_support.vtk_to_numpy(array)[order]
+    result = numpy_support.numpy_to_vtk(values, deep = 1, array_type = array.GetDataType())
+  else:
+    result = array.NewInstance()
+    result.SetNumberOfComponents(array.GetNumberOfComponents())
+    result.SetNumberOfTuples(len(order))
+    for newId, oldId in enumerate(order.tolist()):
+      result.SetTuple(newId, oldId, array)
+  result.SetName(array.GetName())
+  if array.HasAComponentName():
+    for component in range(array.GetNumberOfComponents()):
+      result.SetComponentName(component, array.GetComponentName(component))
+  return result
+
+def permuteAttributes(source, target, order):
+  target.Initialize()
+  for i in range(source.GetNumberOfArrays()):
+    index = target.AddArray(permuteArray(source.GetAbstractArray(i), order))
+    attribute = source.IsArrayAnAttribute(i)
+    if attribute >= 0:
+      target.SetActiveAttribute(index, attribute)
+
+def remapCells(cells, newIds):
+  remapped = vtkCellArray()
+  connectivity = newIds[numpy_support.vtk_to_numpy(cells.GetConnectivityArray())]
+  remapped.SetData(cells.GetOffsetsArray(), numpy_support.numpy_to_vtkIdTypeArray(connectivity, deep = 1))
+  return remapped
+
+def getCompressedSize(dataset):
+  arrays = [dataset.GetPoints().GetData(), dataset.GetPolys().GetData()]
+  arrays += [dataset.GetPointData().GetArray(i) for i in range(dataset.GetPointData().GetNumberOfArrays())]
+  size = 0
+  for array in arrays:
+    if array and array.GetDataType() != VTK_BIT:
+      data = memoryview(array).cast('B')
+      compressor = arraySink.createCompressor(len(data))
+      size += len(compressor.compress(data)) + len(compressor.flush())
+  return size
+
+def reorderPolyData(dataset, mode):
+  polys = dataset.GetPolys()
+  nbPoints = dataset.GetNumberOfPoints()
+  if not nbPoints or not polys or not polys.GetNumberOfCells() or not hasattr(polys, 'GetOffsetsArray'):
+    return dataset
+
+  connectivity = numpy_support.vtk_to_numpy(polys.GetConnectivityArray()).astype(numpy.int64)
+  coordinates = numpy_support.vtk_to_numpy(dataset.GetPoints().GetData()).astype(numpy.float64)
+  newIds = numpy.arange(nbPoints)
+  if mode == 'morton':
+    pointOrder = getMortonOrder(coordinates)
+    newIds[pointOrder] = numpy.arange(nbPoints)
+    connectivity = newIds[connectivity]
+
+  # Only triangles are reordered, other polygons keep their order
+  triangles = polys.IsHomogeneous() == 3
+  if triangles:
+    before = getACMR(connectivity.reshape(-1, 3))
+    centers = coordinates[numpy_support.vtk_to_numpy(polys.GetConnectivityArray()).reshape(-1, 3)].mean(axis = 1)
+    cellOrder = getCacheOrder(connectivity.reshape(-1, 3), nbPoints, centers)
+    connectivity = connectivity.reshape(-1, 3)[cellOrder].reshape(-1)
+
+  if mode == 'first-use':
+    pointOrder = getFirstUseOrder(connectivity, nbPoints)
+    newIds[pointOrder] = numpy.arange(nbPoints)
+    connectivity = newIds[connectivity]
+
+  output = dataset.NewInstance()
+  output.ShallowCopy(dataset)
+  points = vtkPoints()
+  points.SetData(permuteArray(dataset.GetPoints().GetData(), pointOrder))
+  output.SetPoints(points)
+  permuteAttributes(dataset.GetPointData(), output.GetPointData(), pointOrder)
+
+  reordered = vtkCellArray()
+  reordered.SetData(polys.GetOffsetsArray(), numpy_support.numpy_to_vtkIdTypeArray(connectivity, deep = 1))
+  output.SetPolys(reordered)
+  for cells, setter in ((dataset.GetVerts(), output.SetVerts), (dataset.GetLines(), output.SetLines), (dataset.GetStrips(), output.SetStrips)):
+    if cells and cells.GetNumberOfCells():
+      setter(remapCells(cells, newIds))
+
+  if triangles:
+    # Cell data is ordered as verts, lines, polys then strips
+    start = dataset.GetNumberOfVerts() + dataset.GetNumberOfLines()
+    cellIds = numpy.arange(dataset.GetNumberOfCells())
+    cellIds[start:start + len(cellOrder)] = start + cellOrder
+    permuteAttributes(dataset.GetCellData(), output.GetCellData(), cellIds)
+    after = getACMR(connectivity.reshape(-1, 3))
+    sizeBefore = getCompressedSize(dataset)
+    sizeAfter = getCompressedSize(output)
+    print('Reordered %d triangles (%s): estimated ACMR %.3f -> %.3f, compressed size %d -> %d bytes (%+.1f%%)' % (len(cellOrder), mode, before, after, sizeBefore, sizeAfter, 100.0 * (sizeAfter - sizeBefore) / max(1, sizeBefore)))
+
+  return output
+
 # -----------------------------------------------------------------------------
 
 def dumpPolyData(datasetDir, dataDir, dataset, container = {}, compress = True):
   container['vtkClass'] = 'vtkPolyData'
 
+  if meshReorder:
+    dataset = reorderPolyData(dataset, meshReorder)
+
   # Points
-  points = dumpDataArray(datasetDir, dataDir, dataset.GetPoints().GetData(), {}, compress)
+  points = dumpDataArray(datasetDir, dataDir, dataset.GetPoints().GetData(), {}, compress, True)
   container['points'] = points
   container['points']['vtkClass'] = 'vtkPoints'
   container['points']['numberOfComponents'] = 3
@@ -194,28 +1228,28 @@ def dumpPolyData(datasetDir, dataDir, dataset, container = {}, compress = True):
 
   ## Verts
   if dataset.GetVerts() and dataset.GetVerts().GetData().GetNumberOfTuples() > 0:
-    _verts = dumpDataArray(datasetDir, dataDir, dataset.GetVerts().GetData(), {}, compress)
+    _verts = dumpDataArray(datasetDir, dataDir, dataset.GetVerts().GetData(), {}, compress, cells = dataset.GetVerts(), nbPoints = dataset.GetNumberOfPoints())
     _verts['name'] = '_verts'
     _cells['verts'] = _verts
     _cells['verts']['vtkClass'] = 'vtkCellArray'
 
   ## Lines
   if dataset.GetLines() and dataset.GetLines().GetData().GetNumberOfTuples() > 0:
-    _lines = dumpDataArray(datasetDir, dataDir, dataset.GetLines().GetData(), {}, compress)
+    _lines = dumpDataArray(datasetDir, dataDir, dataset.GetLines().GetData(), {}, compress, cells = dataset.GetLines(), nbPoints = dataset.GetNumberOfPoints())
     _lines['name'] = '_lines'
     _cells['lines'] = _lines
     _cells['lines']['vtkClass'] = 'vtkCellArray'
 
   ## Polys
   if dataset.GetPolys() and dataset.GetPolys().GetData().GetNumberOfTuples() > 0:
-    _polys = dumpDataArray(datasetDir, dataDir, dataset.GetPolys().GetData(), {}, compress)
+    _polys = dumpDataArray(datasetDir, dataDir, dataset.GetPolys().GetData(), {}, compress, cells = dataset.GetPolys(), nbPoints = dataset.GetNumberOfPoints())
     _polys['name'] = '_polys'
     _cells['polys'] = _polys
     _cells['polys']['vtkClass'] = 'vtkCellArray'
 
   ## Strips
   if dataset.GetStrips() and dataset.GetStrips().GetData().GetNumberOfTuples() > 0:
-    _strips = dumpDataArray(datasetDir, dataDir, dataset.GetStrips().GetData(), {}, compress)
+    _strips = dumpDataArray(datasetDir, dataDir, dataset.GetStrips().GetData(), {}, compress, cells = dataset.GetStrips(), nbPoints = dataset.GetNumberOfPoints())
     _strips['name'] = '_strips'
     _cells['strips'] = _strips
     _cells['strips']['vtkClass'] = 'vtkCellArray'
@@ -233,13 +1267,13 @@ def dumpUnstructuredGrid(datasetDir, dataDir, dataset, container = {}, compress
   container['vtkClass'] = 'vtkUnstructuredGrid'
 
   # Points
-  points = dumpDataArray(datasetDir, dataDir, dataset.GetPoints().GetData(), {}, compress)
+  points = dumpDataArray(datasetDir, dataDir, dataset.GetPoints().GetData(), {}, compress, True)
   points['name'] = '_points'
   container['points'] = points
   container['points']['vtkClass'] = 'vtkPoints'
 
   # Cells
-  container['cells'] = dumpDataArray(datasetDir, dataDir, dataset.GetCells().GetData(), {}, compress)
+  container['cells'] = dumpDataArray(datasetDir, dataDir, dataset.GetCells().GetData(), {}, compress, cells = dataset.GetCells(), nbPoints = dataset.GetNumberOfPoints())
   container['cells']['vtkClass'] = 'vtkCellArray'
 
   # CellTypes
@@ -254,6 +1288,68 @@ def dumpUnstructuredGrid(datasetDir, dataDir, dataset, container = {}, compress
 writerMapping['vtkUnstructuredGrid'] = dumpUnstructuredGrid
 # -----------------------------------------------------------------------------
 
+def getBrickArray(array, values):
+  # Same VTK type as the source array, so the js type does not change
+  brickArray = array.NewInstance()
+  brickArray.SetName(array.GetName())
+  brickArray.SetNumberOfComponents(array.GetNumberOfComponents())
+  brickArray.SetNumberOfTuples(values.size // array.GetNumberOfComponents())
+  numpy_support.vtk_to_numpy(brickArray).reshape(values.shape)[...] = values
+  return brickArray
+
+# -----------------------------------------------------------------------------
+
+def dumpImagePyramid(datasetDir, dataDir, dataset, brickSize, compress = True):
+  # Levels subsample the points by 2 until a single brick remains, from
+  # level 1 as the dataset arrays already hold the full resolution. A brick
+  # spans brickSize cells, i.e. brickSize + 1 points along each axis (fewer
+  # at the end of a level): neighbours share their boundary points so each
+  # one can be interpolated on its own.
+  dims = dataset.GetDimensions()
+  extent = dataset.GetExtent()
+  origin = [dataset.GetOrigin()[i] + extent[2 * i] * dataset.GetSpacing()[i] for i in range(3)]
+  pointData = dataset.GetPointData()
+  volumes = []
+  for i in range(pointData.GetNumberOfArrays()):
+    array = pointData.GetArray(i)
+    if array:
+      volumes.append((array, numpy_support.vtk_to_numpy(array).reshape(dims[2], dims[1], dims[0], -1)))
+
+  pyramid = { 'brickSize': brickSize, 'levels': [] }
+  if pointData.GetScalars():
+    pyramid['scalars'] = pointData.GetScalars().GetName()
+  step = 2
+  while True:
+    levelDims = [(dims[i] - 1) // step + 1 for i in range(3)]
+    nbBricks = [max(1, (levelDims[i] - 2) // brickSize + 1) for i in range(3)]
+    level = {
+      'level': len(pyramid['levels']) + 1,
+      'origin': origin,
+      'spacing': [dataset.GetSpacing()[i] * step for i in range(3)],
+      'extent': [v for i in range(3) for v in (0, levelDims[i] - 1)],
+      'bricks': [],
+    }
+    pyramid['levels'].append(level)
+
+    for k in range(nbBricks[2]):
+      for j in range(nbBricks[1]):
+        for i in range(nbBricks[0]):
+          index = (i, j, k)
+          brickExtent = [v for a in range(3) for v in (index[a] * brickSize, min((index[a] + 1) * brickSize, levelDims[a] - 1))]
+          brick = { 'index': index, 'extent': brickExtent, 'arrays': [] }
+          for array, values in volumes:
+            brickValues = values[::step, ::step, ::step][brickExtent[4]:brickExtent[5] + 1, brickExtent[2]:brickExtent[3] + 1, brickExtent[0]:brickExtent[1] + 1]
+            brick['arrays'].append(dumpDataArray(datasetDir, dataDir, getBrickArray(array, brickValues), {}, compress, True))
+          level['bricks'].append(brick)
+      # Bound the memory held by brick copies waiting to be encoded
+      arrayEncoder.wait()
+
+    if nbBricks == [1, 1, 1]:
+      return pyramid
+    step *= 2
+
+# -----------------------------------------------------------------------------
+
 def dumpImageData(datasetDir, dataDir, dataset, container = {}, compress = True):
   container['vtkClass'] = 'vtkImageData'
 
@@ -265,6 +1361,10 @@ def dumpImageData(datasetDir, dataDir, dataset, container = {}, compress = True)
   # Attributes (PointData, CellData, FieldData)
   dumpAttributes(datasetDir, dataDir, dataset, container, compress)
 
+  # Downsampled levels split in bricks for progressive loading
+  if pyramidBrickSize:
+    container['pyramid'] = dumpImagePyramid(datasetDir, dataDir, dataset, pyramidBrickSize, compress)
+
   return container
 
 # -----------------------------------------------------------------------------
@@ -318,7 +1418,18 @@ def dumpMultiBlock(datasetDir, dataDir, dataset, container = {}, compress = True
     blockDataset = dataset.GetBlock(i)
     if blockDataset:
       writer = writerMapping[blockDataset.GetClassName()]
-      if writer:
+      if writer and checkpoint:
+        blockName = str(name) if name else str(i)
+        key = checkpoint.getKey(datasetDir, blockName)
+        fragment = checkpoint.restore(key)
+        if fragment is None:
+          checkpoint.blockPath.append(blockName)
+          fragment = writer(datasetDir, dataDir, blockDataset, {}, compress)
+          checkpoint.blockPath.pop()
+          arrayEncoder.wait()
+          checkpoint.add(key, datasetDir, fragment, compress)
+        _blocks[name] = fragment
+      elif writer:
         _blocks[name] = writer(datasetDir, dataDir, blockDataset, {}, compress)
       else:
         _blocks[name] = blockDataset.GetClassName()
@@ -332,10 +1443,15 @@ writerMapping['vtkMultiBlockDataSet'] = dumpMultiBlock
 def writeDataSet(filePath, dataset, outputDir, newDSName = None, compress = True):
   fileName = newDSName if newDSName else os.path.basename(filePath)
   datasetDir = os.path.join(outputDir, fileName)
-  dataDir = os.path.join(datasetDir, 'data')
+  dataDir = arraySink.getDataDir(datasetDir)
 
-  if not os.path.exists(dataDir):
-    os.makedirs(dataDir)
+  for directory in [datasetDir, dataDir]:
+    if not os.path.exists(directory):
+      os.makedirs(directory)
+
+  indexPath = os.path.join(datasetDir, "index.json")
+  if checkpoint and checkpoint.restore(checkpoint.getKey(datasetDir), indexPath) is not None:
+    return
 
   root = {}
   root['metadata'] = {}
@@ -347,70 +1463,770 @@ def writeDataSet(filePath, dataset, outputDir, newDSName = None, compress = True
   else:
     print (dataObject.GetClassName(), 'is not supported')
 
-  with open(os.path.join(datasetDir, "index.json"), 'w') as f:
-    f.write(json.dumps(root, indent=2))
+  arrayEncoder.wait()
+  arraySink.addManifest(datasetDir, dataDir, root)
+
+  writeJSON(indexPath, root)
 
+  if checkpoint:
+    checkpoint.add(checkpoint.getKey(datasetDir), datasetDir, root, compress, indexPath)
+
+# -----------------------------------------------------------------------------
+# Piece-wise export: bounded memory for datasets larger than RAM
 # -----------------------------------------------------------------------------
 
-def writeTimeDataSource(filePath, datasource, sourceToExport, outputDir, newDSName = None, compress = True):
+def getPeakMemory():
+  # Peak resident set size in MB (ru_maxrss is in bytes on macOS, KB elsewhere)
+  if resource is None:
+    return None
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return peak / (1024. * 1024.) if sys.platform == 'darwin' else peak / 1024.
+
+def setReleaseDataFlags(algorithm):
+  # Upstream outputs are freed once the next filter has executed
+  for port in range(algorithm.GetNumberOfInputPorts()):
+    for idx in range(algorithm.GetNumberOfInputConnections(port)):
+      upstream = algorithm.GetInputAlgorithm(port, idx)
+      upstream.ReleaseDataFlagOn()
+      setReleaseDataFlags(upstream)
+
+def writePieces(filePath, sourceToExport, outputDir, newDSName = None, compress = True):
   fileName = newDSName if newDSName else os.path.basename(filePath)
   datasetDir = os.path.join(outputDir, fileName)
-  dataDir = os.path.join(datasetDir, 'data')
+  dataDir = arraySink.getDataDir(datasetDir)
+
+  for directory in [datasetDir, dataDir]:
+    if not os.path.exists(directory):
+      os.makedirs(directory)
 
-  if not os.path.exists(dataDir):
-    os.makedirs(dataDir)
+  indexPath = os.path.join(datasetDir, "index.json")
+  if checkpoint and checkpoint.restore(checkpoint.getKey(datasetDir), indexPath) is not None:
+    return
 
+  root = {}
+  root['metadata'] = {}
+  root['metadata']['name'] = fileName
+  root['vtkClass'] = 'vtkMultiBlock'
+  _blocks = root['Blocks'] = {}
+
+  algorithm = sourceToExport.GetClientSideObject()
+  setReleaseDataFlags(algorithm)
+
+  nbPieces = max(1, exportPieces)
+  lastSplit = None # number of pieces and size of the first piece before the last split
+  canSplit = memoryBudget > 0
+  piece = 0
+  while piece < nbPieces:
+    # Block keys hold the number of pieces, so a resumed export that splits
+    # the dataset the same way reuses the completed pieces
+    blockName = 'piece_%d_of_%d' % (piece, nbPieces)
+    key = checkpoint.getKey(datasetDir, blockName) if checkpoint else None
+    fragment = checkpoint.restore(key) if checkpoint else None
+    if fragment is not None:
+      _blocks[blockName] = fragment
+      piece += 1
+      continue
+
+    start = time.time()
+    algorithm.UpdatePiece(piece, nbPieces, 0)
+    dataset = algorithm.GetOutputDataObject(0)
+    pieceSize = dataset.GetActualMemorySize() / 1024.
+
+    # Split further when the first piece does not fit in the budget. Sources
+    # that do not split (single piece files) return the same first piece
+    # whatever the number of pieces: go back to the previous split then.
+    if canSplit and piece == 0 and pieceSize > memoryBudget:
+      canSplit = False
+      if lastSplit and pieceSize >= lastSplit[1]:
+        dataset.ReleaseData()
+        nbPieces = lastSplit[0]
+        print ('the source does not split further, exporting %d pieces' % nbPieces)
+        continue
+      maxPieces = MAX_PIECES
+      if dataset.IsA('vtkDataSet'):
+        maxPieces = min(maxPieces, nbPieces * max(1, dataset.GetNumberOfCells()))
+      newPieces = min(maxPieces, nbPieces * int(math.ceil(pieceSize / memoryBudget)))
+      if newPieces > nbPieces:
+        dataset.ReleaseData()
+        canSplit = True
+        lastSplit = (nbPieces, pieceSize)
+        nbPieces = newPieces
+        print ('%.1f MB per piece over the %d MB budget, splitting in %d pieces' % (pieceSize, memoryBudget, nbPieces))
+        continue
+
+    writer = writerMapping.get(dataset.GetClassName())
+    if not writer:
+      print (dataset.GetClassName(), 'is not supported')
+    elif dataset.IsA('vtkDataSet') and dataset.GetNumberOfPoints() == 0:
+      print ('piece %d/%d is empty' % (piece + 1, nbPieces))
+    else:
+      if checkpoint:
+        checkpoint.blockPath.append(blockName)
+      fragment = writer(datasetDir, dataDir, dataset, {}, compress)
+      arrayEncoder.wait()
+      if checkpoint:
+        checkpoint.blockPath.pop()
+        checkpoint.add(key, datasetDir, fragment, compress)
+      _blocks[blockName] = fragment
+
+    dataset.ReleaseData()
+    peak = getPeakMemory()
+    print ('piece %d/%d: %.1f MB in %.2fs, peak RSS %s' % (piece + 1, nbPieces, pieceSize, time.time() - start, '%.1f MB' % peak if peak is not None else 'n/a'))
+    if memoryBudget and pieceSize > memoryBudget:
+      print ('warning: piece %d/%d is over the %d MB budget' % (piece + 1, nbPieces, memoryBudget))
+    piece += 1
+
+  if nbPieces == 1 and _blocks:
+    # A single piece is written as the plain dataset, like without pieces
+    del root['vtkClass'], root['Blocks']
+    root.update(_blocks['piece_0_of_1'])
+  else:
+    root['numberOfPieces'] = nbPieces
+  arraySink.addManifest(datasetDir, dataDir, root)
+
+  writeJSON(indexPath, root)
+
+  if checkpoint:
+    checkpoint.add(checkpoint.getKey(datasetDir), datasetDir, root, compress, indexPath)
+
+# -----------------------------------------------------------------------------
+
+def writeJSON(filePath, content):
+  # Write next to the destination and rename, so a partial file is never seen
+  tmpPath = filePath + '.tmp'
+  with open(tmpPath, 'w') as f:
+    f.write(json.dumps(content, indent=2))
+  os.replace(tmpPath, filePath)
+
+# -----------------------------------------------------------------------------
+
+def getTimeRoot(fileName, nbSteps):
   root = {}
   root['metadata'] = {}
   root['metadata']['name'] = fileName
   root['type'] = 'Parametric'
   container = root['Parametric'] = {}
-  _params = container['parameters'] = { 'time': [ '%02d' % idx for idx in range(len(datasource.TimestepValues))] }
+  _params = container['parameters'] = { 'time': [ '%02d' % idx for idx in range(nbSteps)] }
   _refs = container['refs'] = { 'dataset': { 'id': '{time}/index.json', 'pattern': True, 'basepath': '', 'encode': 'JSON' } }
+  return root
+
+# -----------------------------------------------------------------------------
+
+def writeTimeStep(datasetDir, dataDir, idx, ds, compress = True):
+  writer = writerMapping[ds.GetClassName()]
+  if writer:
+    dsDir = os.path.join(datasetDir, "%02d" % idx)
+    dsFileName = os.path.join(dsDir, "index.json")
+    if not os.path.exists(dsDir):
+      os.makedirs(dsDir)
+    dsRoot = writer(dsDir, dataDir, ds, {}, compress)
+    arrayEncoder.wait()
+    arraySink.addManifest(dsDir, dataDir, dsRoot)
+    writeJSON(dsFileName, dsRoot)
+    if checkpoint:
+      checkpoint.add(checkpoint.getKey(dsDir), dsDir, dsRoot, compress, dsFileName)
+  else:
+    print (ds.GetClassName(), 'is not supported')
+
+# -----------------------------------------------------------------------------
+
+def isTimeStepComplete(datasetDir, idx):
+  dsDir = os.path.join(datasetDir, "%02d" % idx)
+  return checkpoint.restore(checkpoint.getKey(dsDir), os.path.join(dsDir, "index.json")) is not None
+
+# -----------------------------------------------------------------------------
 
+def writeTimeStepsPipelined(datasource, sourceToExport, steps, writeStep, timings):
+  # A step is held by the writer while the next one is loaded: 2 steps in memory
+  slots = threading.Semaphore(2)
+  handoff = queue.Queue(maxsize = 1)
+  errors = []
+
+  def consume():
+    while True:
+      item = handoff.get()
+      if item is None:
+        return
+      try:
+        if not errors:
+          start = time.time()
+          writeStep(*item)
+          timings['encode'] += time.time() - start
+      except Exception as error:
+        errors.append(error)
+      finally:
+        slots.release()
+
+  writerThread = threading.Thread(target = consume)
+  writerThread.start()
+  try:
+    for idx in steps:
+      slots.acquire()
+      if errors:
+        break
+      start = time.time()
+      sourceToExport.UpdatePipeline(datasource.TimestepValues[idx])
+      output = sourceToExport.GetClientSideObject().GetOutputDataObject(0)
+      # Keep this step's arrays alive while the pipeline produces the next one
+      ds = output.NewInstance()
+      ds.ShallowCopy(output)
+      timings['update'] += time.time() - start
+      handoff.put((idx, ds))
+  finally:
+    handoff.put(None)
+    writerThread.join()
+
+  if errors:
+    raise errors[0]
 
-  for idx in range(len(datasource.TimestepValues)):
-    t = datasource.TimestepValues[idx]
-    sourceToExport.UpdatePipeline(t)
-    ds = sourceToExport.GetClientSideObject().GetOutputDataObject(0)
-    writer = writerMapping[ds.GetClassName()]
+# -----------------------------------------------------------------------------
+
+def writeTimeDataSource(filePath, datasource, sourceToExport, outputDir, newDSName = None, compress = True, timeSteps = None, pipelined = False):
+  fileName = newDSName if newDSName else os.path.basename(filePath)
+  datasetDir = os.path.join(outputDir, fileName)
+  dataDir = arraySink.getDataDir(datasetDir)
+
+  for directory in [datasetDir, dataDir]:
+    if not os.path.exists(directory):
+      os.makedirs(directory)
+
+  # timeSteps restricts the export to a subset of steps (worker process)
+  steps = range(len(datasource.TimestepValues)) if timeSteps is None else timeSteps
+  if checkpoint:
+    steps = [idx for idx in steps if not isTimeStepComplete(datasetDir, idx)]
+
+  def writeStep(idx, ds):
+    writeTimeStep(datasetDir, dataDir, idx, ds, compress)
+
+  timings = { 'update': 0, 'encode': 0 }
+  start = time.time()
+  if pipelined:
+    writeTimeStepsPipelined(datasource, sourceToExport, steps, writeStep, timings)
+  else:
+    for idx in steps:
+      stepStart = time.time()
+      sourceToExport.UpdatePipeline(datasource.TimestepValues[idx])
+      ds = sourceToExport.GetClientSideObject().GetOutputDataObject(0)
+      encodeStart = time.time()
+      writeStep(idx, ds)
+      timings['update'] += encodeStart - stepStart
+      timings['encode'] += time.time() - encodeStart
+
+  print ('%d time steps: update %.2fs, encode %.2fs, elapsed %.2fs' % (len(steps), timings['update'], timings['encode'], time.time() - start))
+
+  if timeSteps is None:
+    writeJSON(os.path.join(datasetDir, "index.json"), getTimeRoot(fileName, len(datasource.TimestepValues)))
+
+# -----------------------------------------------------------------------------
+# Draco output: one .drc triangle mesh per dataset, for vtkDracoReader
+# -----------------------------------------------------------------------------
+
+def getDracoColors(scalars):
+  nbComponents = scalars.GetNumberOfComponents()
+  values = numpy_support.vtk_to_numpy(scalars).reshape(-1, nbComponents)
+  if values.dtype == numpy.uint8:
+    return values
+
+  # Draco colors are bytes: the first component range is mapped to [0, 255]
+  values = values[:, 0].astype(numpy.float64)
+  low, high = values.min(), values.max()
+  scale = 255.0 / (high - low) if high > low else 0
+  return numpy.rint((values - low) * scale).astype(numpy.uint8).reshape(-1, 1)
+
+def getTriangleMesh(dataset):
+  surface = dataset
+  if not dataset.IsA('vtkPolyData'):
+    surface = vtkDataSetSurfaceFilter()
+    surface.SetInputData(dataset)
+    surface.Update()
+    surface = surface.GetOutput()
+
+  triangles = vtkTriangleFilter()
+  triangles.PassVertsOff()
+  triangles.PassLinesOff()
+  triangles.SetInputData(surface)
+  triangles.Update()
+  return triangles.GetOutput()
+
+def encodeDraco(dataset):
+  mesh = getTriangleMesh(dataset)
+  if mesh.GetNumberOfPolys() == 0:
+    return None
+
+  points = numpy_support.vtk_to_numpy(mesh.GetPoints().GetData()).astype(numpy.float32)
+  faces = numpy_support.vtk_to_numpy(mesh.GetPolys().GetConnectivityArray()).astype(numpy.uint32).reshape(-1, 3)
+
+  attributes = {}
+  pointData = mesh.GetPointData()
+  if pointData.GetNormals():
+    attributes['normals'] = numpy_support.vtk_to_numpy(pointData.GetNormals()).astype(numpy.float32)
+  if pointData.GetTCoords() and pointData.GetTCoords().GetNumberOfComponents() >= 2:
+    tcoords = numpy_support.vtk_to_numpy(pointData.GetTCoords()).reshape(-1, pointData.GetTCoords().GetNumberOfComponents())
+    attributes['tex_coord'] = tcoords[:, :2].astype(numpy.float32)
+  if pointData.GetScalars():
+    attributes['colors'] = getDracoColors(pointData.GetScalars())
+
+  content = DracoPy.encode(points, faces, quantization_bits = dracoBits, compression_level = dracoCompressionLevel, **attributes)
+  return content, len(points), len(faces)
+
+def writeDraco(basePath, dataset):
+  if dataset.IsA('vtkMultiBlockDataSet'):
+    for i in range(dataset.GetNumberOfBlocks()):
+      name = dataset.GetMetaData(i).Get(vtkCompositeDataSet.NAME())
+      blockDataset = dataset.GetBlock(i)
+      if blockDataset:
+        writeDraco(os.path.join(basePath, str(name) if name else str(i)), blockDataset)
+    return
+
+  if not dataset.IsA('vtkDataSet'):
+    print (dataset.GetClassName(), 'is not supported')
+    return
+
+  encoded = encodeDraco(dataset)
+  if encoded is None:
+    print (basePath, 'has no surface to encode')
+    return
+
+  content, nbPoints, nbTriangles = encoded
+  directory = os.path.dirname(basePath)
+  if directory and not os.path.exists(directory):
+    os.makedirs(directory)
+
+  filePath = basePath + '.drc'
+  tmpPath = filePath + '.tmp'
+  with open(tmpPath, 'wb') as f:
+    f.write(content)
+  os.replace(tmpPath, filePath)
+  print ('%s: %d points, %d triangles, %d bytes' % (filePath, nbPoints, nbTriangles, len(content)))
+
+def writeDracoDataSource(filePath, datasource, sourceToExport, outputDir, newDSName = None):
+  fileName = newDSName if newDSName else os.path.basename(filePath)
+  basePath = os.path.join(outputDir, fileName)
+
+  if 'TimestepValues' in datasource.ListProperties() and len(datasource.TimestepValues) > 0:
+    for idx, timeValue in enumerate(datasource.TimestepValues):
+      sourceToExport.UpdatePipeline(timeValue)
+      writeDraco(os.path.join(basePath, '%02d' % idx), sourceToExport.GetClientSideObject().GetOutputDataObject(0))
+  else:
+    sourceToExport.UpdatePipeline()
+    writeDraco(basePath, sourceToExport.GetClientSideObject().GetOutputDataObject(0))
+
+# -----------------------------------------------------------------------------
+# Distributed export: under "mpiexec -n N pvbatch --symmetric" every rank writes
+# the blocks or partitions it holds to the shared data directory (names are
+# content hashes) and rank 0 gathers their JSON fragments into the index.json
+# -----------------------------------------------------------------------------
+
+FRAGMENTS_TAG = 7301
+
+def getController():
+  if vtkMultiProcessController is None:
+    return None
+  controller = vtkMultiProcessController.GetGlobalController()
+  return controller if controller and controller.GetNumberOfProcesses() > 1 else None
+
+def isEmpty(dataset):
+  if dataset is None:
+    return True
+  if dataset.IsA('vtkTable'):
+    return dataset.GetNumberOfRows() == 0
+  return hasattr(dataset, 'GetNumberOfPoints') and dataset.GetNumberOfPoints() == 0
+
+def writeLocalFragments(datasetDir, dataDir, dataset, compress = True):
+  # [blockIndex, blockName, fragment] of the top level blocks held by this rank
+  blocks = [(0, None, dataset)]
+  if dataset.IsA('vtkMultiBlockDataSet'):
+    blocks = [(i, dataset.GetMetaData(i).Get(vtkCompositeDataSet.NAME()), dataset.GetBlock(i)) for i in range(dataset.GetNumberOfBlocks())]
+
+  fragments = []
+  for idx, name, blockDataset in blocks:
+    if isEmpty(blockDataset):
+      continue
+    writer = writerMapping.get(blockDataset.GetClassName())
     if writer:
-      dsDir = os.path.join(datasetDir, "%02d" % idx)
-      dsFileName = os.path.join(dsDir, "index.json")
-      if not os.path.exists(dsDir):
-        os.makedirs(dsDir)
-      with open(dsFileName, 'w') as f:
-        f.write(json.dumps(writer(dsDir, dataDir, ds, {}, compress), indent=2))
+      fragments.append([idx, name, writer(datasetDir, dataDir, blockDataset, {}, compress)])
     else:
-      print (dataObject.GetClassName(), 'is not supported')
+      print (blockDataset.GetClassName(), 'is not supported')
 
+  arrayEncoder.wait()
+  return fragments
 
-  with open(os.path.join(datasetDir, "index.json"), 'w') as f:
-    f.write(json.dumps(root, indent=2))
+def gatherFragments(controller, fragments):
+  # Fragments of every rank on rank 0 (None elsewhere), sent as JSON bytes
+  if controller.GetLocalProcessId() != 0:
+    content = numpy.frombuffer(json.dumps(fragments).encode('utf-8'), dtype = numpy.uint8)
+    controller.Send(numpy_support.numpy_to_vtk(content, deep = 1), 0, FRAGMENTS_TAG)
+    return None
+
+  gathered = [fragments]
+  for rank in range(1, controller.GetNumberOfProcesses()):
+    array = vtkUnsignedCharArray()
+    controller.Receive(array, rank, FRAGMENTS_TAG)
+    gathered.append(json.loads(numpy_support.vtk_to_numpy(array).tobytes().decode('utf-8')))
+  return gathered
+
+def mergeFragments(root, gathered, composite):
+  # Partitions of a block held by several ranks become its pieces, replicated
+  # data gives identical fragments which are written once
+  parts = {}
+  for fragments in gathered:
+    for idx, name, fragment in fragments:
+      blockParts = parts.setdefault(idx, (name, []))[1]
+      if fragment not in blockParts:
+        blockParts.append(fragment)
+
+  def merge(fragments):
+    if len(fragments) == 1:
+      return fragments[0]
+    container = { 'vtkClass': 'vtkMultiBlock', 'numberOfPieces': len(fragments) }
+    container['Blocks'] = dict(('piece_%d_of_%d' % (i, len(fragments)), fragment) for i, fragment in enumerate(fragments))
+    return container
+
+  if composite:
+    root['vtkClass'] = 'vtkMultiBlock'
+    _blocks = root['Blocks'] = {}
+    for idx in sorted(parts):
+      name, fragments = parts[idx]
+      _blocks[name] = merge(fragments)
+  elif parts:
+    root.update(merge(parts[0][1]))
+
+  return root
+
+def writeDistributed(controller, dsDir, dataDir, dataset, root, compress = True):
+  fragments = writeLocalFragments(dsDir, dataDir, dataset, compress)
+  gathered = gatherFragments(controller, fragments)
+  if gathered is not None:
+    mergeFragments(root, gathered, dataset.IsA('vtkMultiBlockDataSet'))
+    arraySink.addManifest(dsDir, dataDir, root)
+    writeJSON(os.path.join(dsDir, 'index.json'), root)
+    print ('%d blocks/partitions gathered from %d ranks' % (sum(len(fragments) for fragments in gathered), len(gathered)))
+
+def writeDistributedDataSource(controller, filePath, datasource, sourceToExport, outputDir, newDSName = None, compress = True):
+  fileName = newDSName if newDSName else os.path.basename(filePath)
+  datasetDir = os.path.join(outputDir, fileName)
+  dataDir = arraySink.getDataDir(datasetDir)
+  isRoot = controller.GetLocalProcessId() == 0
+
+  if 'TimestepValues' in datasource.ListProperties() and len(datasource.TimestepValues) > 0:
+    steps = list(enumerate(datasource.TimestepValues))
+  else:
+    steps = [(None, None)]
+
+  if isRoot:
+    for directory in [datasetDir, dataDir] + [os.path.join(datasetDir, '%02d' % idx) for idx, _ in steps if idx is not None]:
+      if not os.path.exists(directory):
+        os.makedirs(directory)
+  controller.Barrier()
+
+  for idx, timeValue in steps:
+    if idx is None:
+      sourceToExport.UpdatePipeline()
+      root = { 'metadata': { 'name': fileName } }
+      dsDir = datasetDir
+    else:
+      sourceToExport.UpdatePipeline(timeValue)
+      root = {}
+      dsDir = os.path.join(datasetDir, '%02d' % idx)
+    writeDistributed(controller, dsDir, dataDir, sourceToExport.GetClientSideObject().GetOutputDataObject(0), root, compress)
+
+  if isRoot and steps[0][0] is not None:
+    writeJSON(os.path.join(datasetDir, 'index.json'), getTimeRoot(fileName, len(steps)))
+
+# -----------------------------------------------------------------------------
+
+def getSinkArguments():
+  # Options of this run that workers need to load and encode data the same
+  # way, every option of getSignature but merge/extract given by the caller.
+  # Draco and packed outputs are only ever given to batch workers.
+  cmd = ['--hash', arraySink.hashName, '--workers', str(arrayEncoder.workers)]
+  cmd += ['--codec', arraySink.codec, '--level', str(arraySink.compressLevel)]
+  cmd += ['--block-workers', str(arraySink.blockWorkers), '--chunk-size', str(arraySink.chunkSize)]
+  cmd += ['--pyramid', str(pyramidBrickSize)]
+  if meshReorder:
+    cmd += ['--reorder', meshReorder]
+  if arraySink.filters:
+    cmd += ['--filters', ','.join(arraySink.filters)]
+  if arraySink.encodings:
+    cmd += ['--encodings', ','.join(arraySink.encodings)]
+  cmd += ['--quantize', str(arraySink.quantizeError), '--normals-error', str(arraySink.normalsError)]
+  if arraySink.varintCells:
+    cmd.append('--varint-cells')
+  if isinstance(arraySink, ContentStore):
+    cmd += ['--store', arraySink.storeDir]
+  if isinstance(arraySink, PackedSink):
+    cmd.append('--pack')
+  cmd += ['--pieces', str(exportPieces), '--memory-budget', str(memoryBudget)]
+  cmd += ['--draco', str(dracoBits), '--backend', dataBackend]
+  return cmd
+
+def getWorkerCommand(inputFile, outputDir, merge, extract, newName, timeSteps, pipelined):
+  cmd = [pvpython, os.path.abspath(__file__), '--input', inputFile, '--output', outputDir]
+  cmd += getSinkArguments()
+  cmd += ['--time-steps', ','.join(str(idx) for idx in timeSteps)]
+  if merge:
+    cmd.append('--merge')
+  if extract:
+    cmd.append('--extract-surface')
+  if newName:
+    cmd += ['--name', newName]
+  if pipelined:
+    cmd.append('--pipeline')
+  return cmd
+
+# -----------------------------------------------------------------------------
+
+def writeTimeDataSourceInParallel(inputFile, datasource, outputDir, merge, extract, newName, nbWorkers, pipelined = False):
+  fileName = newName if newName else os.path.basename(inputFile)
+  datasetDir = os.path.join(outputDir, fileName)
+  nbSteps = len(datasource.TimestepValues)
+
+  # Workers append their completed steps to the checkpoint of this run
+  todo = [idx for idx in range(nbSteps) if not isTimeStepComplete(datasetDir, idx)]
+  print ('%d/%d time steps to export with %d workers' % (len(todo), nbSteps, nbWorkers))
+
+  # Interleave steps so each worker gets early and late (usually larger) steps
+  workers = []
+  for worker in range(min(nbWorkers, len(todo))):
+    cmd = getWorkerCommand(inputFile, outputDir, merge, extract, newName, todo[worker::nbWorkers], pipelined)
+    workers.append(subprocess.Popen(cmd))
+
+  for process in workers:
+    process.wait()
+
+  missing = [idx for idx in todo if not os.path.exists(os.path.join(datasetDir, '%02d' % idx, 'index.json'))]
+  if missing:
+    print ('Time steps %s failed, run the same command with --resume to complete the export' % ', '.join(str(idx) for idx in missing))
+    return False
+
+  writeJSON(os.path.join(datasetDir, "index.json"), getTimeRoot(fileName, nbSteps))
+  return True
 
 # -----------------------------------------------------------------------------
 
-def convert(inputFile, outputDir, merge = False, extract = False, newName = None):
+def getSignature(inputFile, merge, extract):
+  # A checkpoint only applies to the same input converted the same way
+  signature = {}
+  signature['input'] = os.path.abspath(inputFile)
+  signature['size'] = os.path.getsize(inputFile) if os.path.isfile(inputFile) else None
+  signature['mtime'] = os.path.getmtime(inputFile) if os.path.exists(inputFile) else None
+  signature['merge'] = merge
+  signature['extract'] = extract
+  signature['hash'] = arraySink.hashName
+  signature['codec'] = arraySink.codec
+  signature['level'] = arraySink.compressLevel
+  signature['filters'] = arraySink.filters
+  signature['chunkSize'] = arraySink.chunkSize
+  signature['encodings'] = arraySink.encodings
+  signature['quantize'] = arraySink.quantizeError
+  signature['normalsError'] = arraySink.normalsError
+  signature['varintCells'] = arraySink.varintCells
+  signature['pyramid'] = pyramidBrickSize
+  signature['reorder'] = meshReorder
+  signature['pieces'] = exportPieces
+  signature['memoryBudget'] = memoryBudget
+  signature['backend'] = dataBackend
+  signature['store'] = arraySink.storeDir if isinstance(arraySink, ContentStore) else None
+  return signature
+
+# -----------------------------------------------------------------------------
+# Data backends: plain VTK readers and filters behind the subset of the
+# ParaView source proxy API used by the converter, ParaView being imported
+# on first use only
+# -----------------------------------------------------------------------------
+
+# Extension: (vtkmodules module, reader class)
+vtkReaderMapping = {
+  '.vtp': ('vtkIOXML', 'vtkXMLGenericDataObjectReader'),
+  '.vtu': ('vtkIOXML', 'vtkXMLGenericDataObjectReader'),
+  '.vti': ('vtkIOXML', 'vtkXMLGenericDataObjectReader'),
+  '.vtr': ('vtkIOXML', 'vtkXMLGenericDataObjectReader'),
+  '.vts': ('vtkIOXML', 'vtkXMLGenericDataObjectReader'),
+  '.vtm': ('vtkIOXML', 'vtkXMLGenericDataObjectReader'),
+  '.pvtp': ('vtkIOXML', 'vtkXMLGenericDataObjectReader'),
+  '.pvtu': ('vtkIOXML', 'vtkXMLGenericDataObjectReader'),
+  '.pvti': ('vtkIOXML', 'vtkXMLGenericDataObjectReader'),
+  '.pvtr': ('vtkIOXML', 'vtkXMLGenericDataObjectReader'),
+  '.pvts': ('vtkIOXML', 'vtkXMLGenericDataObjectReader'),
+  '.vtk': ('vtkIOLegacy', 'vtkGenericDataObjectReader'),
+  '.ex2': ('vtkIOExodus', 'vtkExodusIIReader'),
+  '.exo': ('vtkIOExodus', 'vtkExodusIIReader'),
+  '.exii': ('vtkIOExodus', 'vtkExodusIIReader'),
+  '.e': ('vtkIOExodus', 'vtkExodusIIReader'),
+  '.g': ('vtkIOExodus', 'vtkExodusIIReader'),
+  '.stl': ('vtkIOGeometry', 'vtkSTLReader'),
+  '.obj': ('vtkIOGeometry', 'vtkOBJReader'),
+  '.ply': ('vtkIOPLY', 'vtkPLYReader'),
+}
+
+def setupLegacyReader(reader):
+  # Every array, not only the active attributes
+  reader.ReadAllScalarsOn()
+  reader.ReadAllVectorsOn()
+  reader.ReadAllNormalsOn()
+  reader.ReadAllTensorsOn()
+  reader.ReadAllColorScalarsOn()
+  reader.ReadAllTCoordsOn()
+  reader.ReadAllFieldsOn()
+
+def setupExodusReader(reader):
+  # Defaults of the ParaView reader: global and object ids, every block but
+  # no set, every variable
+  reader.GenerateGlobalNodeIdArrayOn()
+  reader.GenerateGlobalElementIdArrayOn()
+  reader.GenerateObjectIdCellArrayOn()
+  reader.UpdateInformation()
+  for objectType in [reader.ELEM_BLOCK, reader.EDGE_BLOCK, reader.FACE_BLOCK]:
+    for idx in range(reader.GetNumberOfObjects(objectType)):
+      reader.SetObjectStatus(objectType, idx, 1)
+  for objectType in [reader.NODAL, reader.GLOBAL, reader.ELEM_BLOCK, reader.EDGE_BLOCK, reader.FACE_BLOCK, reader.NODE_SET, reader.SIDE_SET, reader.EDGE_SET, reader.FACE_SET, reader.ELEM_SET]:
+    reader.SetAllArrayStatus(objectType, 1)
+
+vtkReaderSetup = {
+  'vtkGenericDataObjectReader': setupLegacyReader,
+  'vtkExodusIIReader': setupExodusReader,
+}
+
+class VTKSource(object):
+
+  def __init__(self, algorithm):
+    self.algorithm = algorithm
+
+  @property
+  def TimestepValues(self):
+    self.algorithm.UpdateInformation()
+    info = self.algorithm.GetOutputInformation(0)
+    key = vtkStreamingDemandDrivenPipeline.TIME_STEPS()
+    steps = list(info.Get(key)) if info.Has(key) else []
+    # A single step is a static dataset (the legacy reader reports one for any file)
+    return steps if len(steps) > 1 else []
+
+  def ListProperties(self):
+    return ['TimestepValues']
+
+  def UpdatePipeline(self, time = None):
+    if time is None:
+      self.algorithm.Update()
+    else:
+      self.algorithm.UpdateTimeStep(time)
+
+  def GetClientSideObject(self):
+    return self.algorithm
+
+def getParaView():
+  global simple
+  if simple is None:
+    from paraview import simple as paraviewSimple
+    simple = paraviewSimple
+  return simple
+
+def getVTKClass(moduleName, className):
+  return getattr(importlib.import_module('vtkmodules.' + moduleName), className)
+
+def openDataFile(inputFile):
+  # Distributed runs need the ParaView readers to split the data across ranks
+  if dataBackend == 'vtk' or (dataBackend == 'auto' and not getController()):
+    ext = os.path.splitext(inputFile)[1].lower()
+    if ext in vtkReaderMapping and os.path.isfile(inputFile):
+      reader = getVTKClass(*vtkReaderMapping[ext])()
+      reader.SetFileName(inputFile)
+      if reader.GetClassName() in vtkReaderSetup:
+        vtkReaderSetup[reader.GetClassName()](reader)
+      return VTKSource(reader)
+    if dataBackend == 'vtk':
+      raise ValueError('No VTK reader for %s' % inputFile)
+  return getParaView().OpenDataFile(inputFile)
+
+def mergeBlocks(source):
+  if not isinstance(source, VTKSource):
+    return getParaView().MergeBlocks(source)
+  merge = getVTKClass('vtkFiltersParallel', 'vtkMergeBlocks')()
+  merge.SetInputConnection(source.algorithm.GetOutputPort())
+  return VTKSource(merge)
+
+def extractSurface(source):
+  if not isinstance(source, VTKSource):
+    return getParaView().ExtractSurface(source)
+  surface = getVTKClass('vtkFiltersGeometry', 'vtkDataSetSurfaceFilter')()
+  surface.SetInputConnection(source.algorithm.GetOutputPort())
+  return VTKSource(surface)
+
+def deleteSource(source):
+  if not isinstance(source, VTKSource):
+    getParaView().Delete(source)
+
+# -----------------------------------------------------------------------------
+
+def openReader(inputFile):
+  # Workers converting the same file again reuse its reader and loaded data
+  if readerCache is None:
+    return openDataFile(inputFile)
+
+  path = os.path.abspath(inputFile)
+  mtime = os.path.getmtime(path) if os.path.exists(path) else None
+  if path in readerCache:
+    cachedTime, reader = readerCache.pop(path)
+    if cachedTime == mtime:
+      readerCache[path] = (cachedTime, reader)
+      return reader
+    deleteSource(reader)
+
+  while len(readerCache) >= READER_CACHE_SIZE:
+    deleteSource(readerCache.popitem(last = False)[1][1])
+  reader = openDataFile(inputFile)
+  readerCache[path] = (mtime, reader)
+  return reader
+
+# -----------------------------------------------------------------------------
+
+def convert(inputFile, outputDir, merge = False, extract = False, newName = None, timeWorkers = 1, timeSteps = None, pipelined = False, resume = False):
+  global checkpoint
   print (inputFile, outputDir)
-  reader = simple.OpenDataFile(inputFile)
+  reader = openReader(inputFile)
   activeSource = reader
 
   if merge:
-    activeSource = simple.MergeBlocks(activeSource)
+    activeSource = mergeBlocks(activeSource)
 
   if extract:
-    activeSource = simple.ExtractSurface(activeSource)
+    activeSource = extractSurface(activeSource)
+
+  if dracoBits:
+    writeDracoDataSource(inputFile, reader, activeSource, outputDir, newName)
+    return
+
+  controller = getController()
+  if controller:
+    writeDistributedDataSource(controller, inputFile, reader, activeSource, outputDir, newName)
+    return
+
+  # Every run keeps a checkpoint so that an interrupted one can be resumed,
+  # time workers append to the one started by their parent
+  datasetDir = os.path.join(outputDir, newName if newName else os.path.basename(inputFile))
+  checkpoint = Checkpoint(datasetDir, getSignature(inputFile, merge, extract), resume or timeSteps is not None)
+
+  try:
+    completed = True
+    if 'TimestepValues' in reader.ListProperties() and len(reader.TimestepValues) > 0:
+      if timeWorkers > 1 and timeSteps is None:
+        completed = writeTimeDataSourceInParallel(inputFile, reader, outputDir, merge, extract, newName, timeWorkers, pipelined)
+      else:
+        writeTimeDataSource(inputFile, reader, activeSource, outputDir, newName, timeSteps = timeSteps, pipelined = pipelined)
+    elif exportPieces > 1 or memoryBudget:
+      writePieces(inputFile, activeSource, outputDir, newName)
+    else:
+      activeSource.UpdatePipeline()
+      dataObject = activeSource.GetClientSideObject().GetOutputDataObject(0)
+      writeDataSet(inputFile, dataObject, outputDir, newName)
 
-  activeSource.UpdatePipeline()
-  dataObject = activeSource.GetClientSideObject().GetOutputDataObject(0)
+    if resume:
+      print ('%d completed time steps/blocks reused from %s' % (checkpoint.restored, checkpoint.path))
 
-  if 'TimestepValues' in reader.ListProperties():
-    if len(reader.TimestepValues) == 0:
-      writeDataSet(inputFile, dataObject, outputDir, newName)
-    else:
-      writeTimeDataSource(inputFile, reader, activeSource, outputDir, newName)
-  else:
-    writeDataSet(inputFile, dataObject, outputDir, newName)
+    # Keep the checkpoint out of the exported tree once the run is complete
+    if completed and timeSteps is None:
+      checkpoint.remove()
+  finally:
+    checkpoint = None
 
 
 # -----------------------------------------------------------------------------
@@ -426,13 +2242,13 @@ def sample(dataDir, outputDir):
   convert(os.path.join(dataDir, 'Data/RectGrid2.vtk'), outputDir)
 
   # Create image data based on the Wavelet source
-  wavelet = simple.Wavelet()
+  wavelet = VTKSource(getVTKClass('vtkImagingCore', 'vtkRTAnalyticSource')())
   wavelet.UpdatePipeline()
   imageData = wavelet.GetClientSideObject().GetOutputDataObject(0)
   writeDataSet('Wavelet.vti', imageData, outputDir)
 
   # Create a table based on the disk_out_ref
-  diskout = simple.ExtractSurface(simple.MergeBlocks(simple.OpenDataFile(os.path.join(dataDir, 'Data/disk_out_ref.ex2'))))
+  diskout = extractSurface(mergeBlocks(openDataFile(os.path.join(dataDir, 'Data/disk_out_ref.ex2'))))
   diskout.UpdatePipeline()
   unstructuredGrid = diskout.GetClientSideObject().GetOutputDataObject(0)
   table = vtkTable()
@@ -441,21 +2257,354 @@ def sample(dataDir, outputDir):
     table.AddColumn(unstructuredGrid.GetPointData().GetArray(i))
   writeDataSet('table', table, outputDir)
 
+# -----------------------------------------------------------------------------
+# Batch conversion: long lived workers keep ParaView imported across inputs
+# -----------------------------------------------------------------------------
+
+def getBatchInputs(spec):
+  # Files of a directory, lines of a manifest file or matches of a glob
+  if os.path.isdir(spec):
+    return sorted(os.path.join(spec, name) for name in os.listdir(spec) if os.path.isfile(os.path.join(spec, name)))
+  if os.path.isfile(spec):
+    baseDir = os.path.dirname(os.path.abspath(spec))
+    with open(spec) as f:
+      lines = [line.strip() for line in f]
+    return [os.path.join(baseDir, line) for line in lines if line and not line.startswith('#')]
+  return sorted(path for path in glob.glob(spec, recursive = True) if os.path.isfile(path))
+
+def getBatchWorkerCommand(outputDir, merge, extract, resume):
+  cmd = [pvpython, os.path.abspath(__file__), '--batch-worker', '--output', outputDir]
+  cmd += getSinkArguments()
+  if merge:
+    cmd.append('--merge')
+  if extract:
+    cmd.append('--extract-surface')
+  if resume:
+    cmd.append('--resume')
+  return cmd
+
+def serveBatch(outputDir, merge, extract, resume):
+  # Worker side: one JSON job per stdin line, one JSON result per stdout line,
+  # the conversion logs going to stderr. Jobs may override the output
+  # directory, merge and extract options of the worker.
+  global readerCache
+  readerCache = collections.OrderedDict()
+  channel = sys.stdout
+  sys.stdout = sys.stderr
+  for line in iter(sys.stdin.readline, ''):
+    job = json.loads(line)
+    start = time.time()
+    try:
+      convert(job['input'], job.get('output', outputDir), job.get('merge', merge), job.get('extract', extract), job.get('name'), resume = resume)
+      result = { 'ok': True }
+    except Exception as e:
+      result = { 'ok': False, 'error': '%s: %s' % (type(e).__name__, e) }
+    finally:
+      # Drop the filters of this job, the worker lives for the whole run
+      cached = [reader for _, reader in readerCache.values()]
+      for source in list(simple.GetSources().values()) if simple else []:
+        if source not in cached:
+          simple.Delete(source)
+    result['elapsed'] = time.time() - start
+    channel.write(json.dumps(result) + '\n')
+    channel.flush()
+
+class ConversionWorker(object):
+  # Parent side of a serveBatch() process, started again when it crashed
+
+  def __init__(self, cmd):
+    self.cmd = cmd
+    self.process = None
+
+  def run(self, job):
+    if self.process is None or self.process.poll() is not None:
+      self.process = subprocess.Popen(self.cmd, stdin = subprocess.PIPE, stdout = subprocess.PIPE, universal_newlines = True)
+    try:
+      self.process.stdin.write(json.dumps(job) + '\n')
+      self.process.stdin.flush()
+      line = self.process.stdout.readline()
+    except (IOError, OSError):
+      line = ''
+    if not line:
+      return { 'ok': False, 'error': 'worker exited with code %s' % self.process.wait(), 'elapsed': 0 }
+    return json.loads(line)
+
+  def close(self):
+    if self.process and self.process.poll() is None:
+      self.process.stdin.close()
+      self.process.wait()
+
+def convertBatch(inputs, outputDir, nbWorkers = 1, retries = 1, merge = False, extract = False, resume = False):
+  # Datasets are named by their path relative to the common input directory
+  baseDir = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in inputs])
+  jobs = queue.Queue()
+  for path in inputs:
+    jobs.put({ 'input': os.path.abspath(path), 'name': os.path.relpath(os.path.abspath(path), baseDir), 'attempt': 0 })
+
+  cmd = getBatchWorkerCommand(outputDir, merge, extract, resume)
+  lock = threading.Lock()
+  status = { 'done': 0, 'failed': {} }
+  start = time.time()
+  print ('%d inputs to convert with %d workers' % (len(inputs), nbWorkers))
+
+  def runWorker():
+    worker = ConversionWorker(cmd)
+    while True:
+      try:
+        job = jobs.get_nowait()
+      except queue.Empty:
+        break
+
+      result = worker.run({ 'input': job['input'], 'name': job['name'] })
+
+      with lock:
+        if result['ok']:
+          status['done'] += 1
+          state = 'ok'
+        elif job['attempt'] < retries:
+          job['attempt'] += 1
+          jobs.put(job)
+          state = 'retrying (%s)' % result['error']
+        else:
+          status['failed'][job['name']] = result['error']
+          state = 'failed (%s)' % result['error']
+        finished = status['done'] + len(status['failed'])
+        print ('[%d/%d] %s: %s in %.1fs, %.2f files/s' % (finished, len(inputs), job['name'], state, result['elapsed'], finished / (time.time() - start)))
+
+    worker.close()
+
+  threads = [threading.Thread(target = runWorker) for i in range(max(1, min(nbWorkers, len(inputs))))]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  elapsed = time.time() - start
+  print ('%d converted, %d failed in %.1fs (%.2f files/s)' % (status['done'], len(status['failed']), elapsed, len(inputs) / elapsed if elapsed else 0))
+  for name in sorted(status['failed']):
+    print ('  %s: %s' % (name, status['failed'][name]))
+  return not status['failed']
+
+# -----------------------------------------------------------------------------
+# Conversion service: jobs submitted over a local HTTP API run on warm workers
+#
+#   POST /jobs       { "input": path, "output", "name", "merge", "extract" }
+#                    => 202 { "id", "status", ... } or 503 when the queue is full
+#   GET  /jobs/<id>  => { "id", "status": queued|running|done|failed, ... }
+#   GET  /jobs       => status of the known jobs
+# -----------------------------------------------------------------------------
+
+JOB_HISTORY_SIZE = 1000
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+  daemon_threads = True
+
+def getJobStatus(job):
+  return dict((key, value) for key, value in job.items() if key != 'request')
+
+def serveJobs(host, port, outputDir, nbWorkers = 1, queueSize = 100, merge = False, extract = False, resume = False):
+  cmd = getBatchWorkerCommand(outputDir, merge, extract, resume)
+  pending = queue.Queue(queueSize)
+  jobs = collections.OrderedDict()
+  lock = threading.Lock()
+  counter = [0]
+
+  def runWorker():
+    worker = ConversionWorker(cmd)
+    while True:
+      job = pending.get()
+      if job is None:
+        break
+      with lock:
+        job['status'] = 'running'
+      result = worker.run(job['request'])
+      with lock:
+        job['status'] = 'done' if result['ok'] else 'failed'
+        job['elapsed'] = result['elapsed']
+        if not result['ok']:
+          job['error'] = result['error']
+      print ('job %s: %s %s in %.1fs' % (job['id'], job['input'], job['status'], result['elapsed']))
+    worker.close()
+
+  class JobHandler(BaseHTTPRequestHandler):
+
+    def sendJSON(self, code, content):
+      body = json.dumps(content).encode('utf-8')
+      self.send_response(code)
+      self.send_header('Content-Type', 'application/json')
+      self.send_header('Content-Length', str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def do_GET(self):
+      with lock:
+        if self.path.rstrip('/') == '/jobs':
+          return self.sendJSON(200, [getJobStatus(job) for job in jobs.values()])
+        job = jobs.get(self.path[len('/jobs/'):]) if self.path.startswith('/jobs/') else None
+        if job is None:
+          return self.sendJSON(404, { 'error': 'unknown job' })
+        return self.sendJSON(200, getJobStatus(job))
+
+    def do_POST(self):
+      if self.path.rstrip('/') != '/jobs':
+        return self.sendJSON(404, { 'error': 'unknown endpoint' })
+      try:
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8'))
+        request = dict((key, request[key]) for key in ['input', 'output', 'name', 'merge', 'extract'] if key in request)
+      except (ValueError, TypeError):
+        request = {}
+      if 'input' not in request:
+        return self.sendJSON(400, { 'error': 'a job needs an "input" path' })
+
+      with lock:
+        counter[0] += 1
+        job = { 'id': str(counter[0]), 'status': 'queued', 'input': request['input'], 'submitted': time.time(), 'request': request }
+        try:
+          pending.put_nowait(job)
+        except queue.Full:
+          return self.sendJSON(503, { 'error': 'the queue is full (%d jobs)' % queueSize })
+        jobs[job['id']] = job
+
+        # Forget the oldest finished jobs
+        for jobId in [jobId for jobId, item in jobs.items() if item['status'] in ('done', 'failed')][:max(0, len(jobs) - JOB_HISTORY_SIZE)]:
+          del jobs[jobId]
+        return self.sendJSON(202, getJobStatus(job))
+
+  threads = [threading.Thread(target = runWorker) for i in range(max(1, nbWorkers))]
+  for thread in threads:
+    thread.start()
+
+  server = ThreadingHTTPServer((host, port), JobHandler)
+  print ('Serving conversion jobs on http://%s:%d/jobs with %d workers' % (host, server.server_address[1], len(threads)))
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    for thread in threads:
+      pending.put(None)
+    for thread in threads:
+      thread.join()
+
+# -----------------------------------------------------------------------------
+# Command line: workers are started with the options of their parent
+# -----------------------------------------------------------------------------
+
+def getArgumentParser():
+  parser = argparse.ArgumentParser(description="Data conversion")
+  parser.add_argument("--input", help="path to the file to convert", dest="input")
+  parser.add_argument("--output", help="path to the directory where to write the output", dest="output")
+  parser.add_argument("--merge", help="Merge multiblock into single dataset", default=False, action='store_true', dest="merge")
+  parser.add_argument("--extract-surface", help="Extract surface mesh", default=False, action='store_true', dest="extract")
+  parser.add_argument("--backend", help="readers and filters used to load the data: vtk, paraview or auto (vtk for the VTK XML, legacy, Exodus, STL, OBJ and PLY formats, paraview otherwise)", default='auto', choices=['auto', 'vtk', 'paraview'], dest="backend")
+  parser.add_argument("--batch", help="convert every file of a directory, listed in a manifest file (one path per line) or matching a glob", dest="batch")
+  parser.add_argument("--batch-workers", help="number of long lived worker processes converting the batch inputs or the served jobs", default=1, type=int, dest="batchWorkers")
+  parser.add_argument("--retries", help="number of times a failed batch input is converted again", default=1, type=int, dest="retries")
+  parser.add_argument("--serve", help="run as a service converting the jobs submitted over HTTP on this [host:]port (localhost by default)", dest="serve")
+  parser.add_argument("--queue-size", help="maximum number of jobs waiting for a worker when serving", default=100, type=int, dest="queueSize")
+  parser.add_argument("--batch-worker", help=argparse.SUPPRESS, default=False, action='store_true', dest="batchWorker")
+  parser.add_argument("--sample-data", help="Generate sample data from ParaView Data", dest="sample")
+  parser.add_argument("--hash", help="hash used to name array files (%s)" % ', '.join(sorted(hashMapping)), default='md5', choices=sorted(hashMapping), dest="hash")
+  parser.add_argument("--codec", help="compression of array files (%s)" % ', '.join(sorted(codecMapping)), default='gz', choices=sorted(codecMapping), dest="codec")
+  parser.add_argument("--level", help="compression level (default depends on the codec)", type=int, dest="level")
+  parser.add_argument("--filters", help="comma separated filters applied in order to arrays before compression (%s)" % ', '.join(sorted(filterMapping)), dest="filters")
+  parser.add_argument("--encodings", help="comma separated encodings tried on each array, the smallest one is kept (%s)" % ', '.join(sorted(encodingMapping)), dest="encodings")
+  parser.add_argument("--quantize", help="lossy: quantize float arrays to Uint8/Uint16 with an error below this fraction of their range (0 to disable)", default=0, type=float, dest="quantize")
+  parser.add_argument("--normals-error", help="lossy: octahedral encode normals into 2 Uint8/Uint16 with an error below this angle in degrees (0 to disable)", default=0, type=float, dest="normalsError")
+  parser.add_argument("--varint-cells", help="write cell arrays ids as zigzag varint deltas to the previous id", default=False, action='store_true', dest="varintCells")
+  parser.add_argument("--chunk-size", help="split arrays larger than this number of bytes into chunks stored in separate files (0 to disable)", default=0, type=int, dest="chunkSize")
+  parser.add_argument("--pyramid", help="also export image data as a pyramid of 2x downsampled levels split in bricks of this size in cells, i.e. size + 1 points per axis as neighbouring bricks share their boundary points (0 to disable)", default=0, type=int, dest="pyramid")
+  parser.add_argument("--reorder", help="reorder polydata triangles for the GPU vertex cache and renumber their points by first use or along a Morton curve. Fewer vertices are transformed per triangle when rendering, but the compressed arrays of an already well ordered mesh can grow (about 30%% for a regular sphere): the sizes are printed to compare", choices=['first-use', 'morton'], dest="reorder")
+  parser.add_argument("--draco", help="write each dataset as a Draco triangle mesh (.drc) with positions quantized to this number of bits, instead of the vtk.js format (requires DracoPy)", default=0, type=int, dest="draco")
+  parser.add_argument("--pieces", help="load and write the dataset in this number of pieces requested from the pipeline, to bound memory use (time series excluded)", default=1, type=int, dest="pieces")
+  parser.add_argument("--memory-budget", help="memory budget in MB of a single piece, the dataset is split in more pieces when the first one exceeds it (0 to disable)", default=0, type=int, dest="memoryBudget")
+  parser.add_argument("--pack", help="write the arrays of a dataset into a single data.pack file indexed by its index.json", default=False, action='store_true', dest="pack")
+  parser.add_argument("--store", help="shared directory where arrays are stored once across all converted datasets", dest="store")
+  parser.add_argument("--workers", help="number of threads encoding arrays in parallel", default=1, type=int, dest="workers")
+  parser.add_argument("--block-workers", help="number of threads compressing blocks of a single large array (gz only)", default=1, type=int, dest="blockWorkers")
+  parser.add_argument("--name", help="name of the converted dataset (default to the input file name)", dest="name")
+  parser.add_argument("--time-workers", help="number of processes exporting time steps in parallel", default=1, type=int, dest="timeWorkers")
+  parser.add_argument("--time-steps", help="comma separated time step indices to export (used by time workers)", dest="timeSteps")
+  parser.add_argument("--pipeline", help="load the next time step while the current one is encoded", default=False, action='store_true', dest="pipelined")
+  parser.add_argument("--resume", help="skip the time steps and blocks completed by a previous run", default=False, action='store_true', dest="resume")
+  parser.add_argument("--pvpython", help="executable used to start time workers", default=sys.executable, dest="pvpython")
+  return parser
+
+def setOptions(args):
+  global pvpython, pyramidBrickSize, meshReorder, dracoBits, exportPieces, memoryBudget, dataBackend, arrayEncoder, arraySink
+  pvpython = args.pvpython
+  pyramidBrickSize = args.pyramid
+  meshReorder = args.reorder
+  dracoBits = args.draco
+  exportPieces = args.pieces
+  memoryBudget = args.memoryBudget
+  dataBackend = args.backend
+
+  arrayEncoder = ArrayEncoder(args.workers)
+
+  filters = args.filters.split(',') if args.filters else None
+  encodings = args.encodings.split(',') if args.encodings else None
+  sinkOptions = { 'compressLevel': args.level, 'filters': filters, 'blockWorkers': args.blockWorkers, 'chunkSize': args.chunkSize, 'encodings': encodings, 'quantizeError': args.quantize, 'normalsError': args.normalsError, 'varintCells': args.varintCells }
+  if args.store:
+    arraySink = ContentStore(args.store, args.hash, args.codec, **sinkOptions)
+  elif args.pack:
+    arraySink = PackedSink(args.hash, args.codec, **sinkOptions)
+  else:
+    arraySink = ArraySink(args.hash, args.codec, **sinkOptions)
+
 # =============================================================================
 # Main: Parse args and start data conversion
 # =============================================================================
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Data conversion")
-    parser.add_argument("--input", help="path to the file to convert", dest="input")
-    parser.add_argument("--output", help="path to the directory where to write the output", dest="output")
-    parser.add_argument("--merge", help="Merge multiblock into single dataset", default=False, action='store_true', dest="merge")
-    parser.add_argument("--extract-surface", help="Extract surface mesh", default=False, action='store_true', dest="extract")
-    parser.add_argument("--sample-data", help="Generate sample data from ParaView Data", dest="sample")
-
+    parser = getArgumentParser()
     args = parser.parse_args()
 
+    if args.pack and (args.store or args.resume or args.timeWorkers > 1):
+      parser.error('--pack can not be combined with --store, --resume or --time-workers')
+
+    if args.batch and (args.input or args.name or args.timeSteps or args.timeWorkers > 1):
+      parser.error('--batch can not be combined with --input, --name, --time-steps or --time-workers')
+
+    if args.serve and (args.batch or args.input or args.name or args.timeSteps or args.timeWorkers > 1):
+      parser.error('--serve can not be combined with --batch, --input, --name, --time-steps or --time-workers')
+
+    if args.pyramid and numpy is None:
+      parser.error('--pyramid requires numpy')
+
+    if args.reorder and numpy is None:
+      parser.error('--reorder requires numpy')
+
+    if args.draco and DracoPy is None:
+      parser.error('--draco requires the DracoPy package')
+
+    if args.draco and (args.pack or args.store or args.resume or args.timeWorkers > 1):
+      parser.error('--draco can not be combined with --pack, --store, --resume or --time-workers')
+
+    if getController() and (args.pack or args.resume or args.timeWorkers > 1 or args.pieces > 1 or args.memoryBudget or args.draco):
+      parser.error('pvbatch runs can not be combined with --pack, --resume, --time-workers, --pieces, --memory-budget or --draco')
+
+    if getController() and numpy is None:
+      parser.error('pvbatch runs require numpy')
+
+    setOptions(args)
+
     if args.sample:
       sample(args.sample, args.output)
+    elif args.batchWorker:
+      serveBatch(args.output, args.merge, args.extract, args.resume)
+    elif args.serve:
+      host, _, port = args.serve.rpartition(':')
+      serveJobs(host or 'localhost', int(port), args.output, args.batchWorkers, args.queueSize, args.merge, args.extract, args.resume)
+    elif args.batch:
+      inputs = getBatchInputs(args.batch)
+      if not inputs:
+        parser.error('no input found for --batch %s' % args.batch)
+      if not convertBatch(inputs, args.output, args.batchWorkers, args.retries, args.merge, args.extract, args.resume):
+        sys.exit(1)
     else:
-      convert(args.input, args.output, args.merge, args.extract)
+      timeSteps = [int(idx) for idx in args.timeSteps.split(',')] if args.timeSteps else None
+      convert(args.input, args.output, args.merge, args.extract, args.name, args.timeWorkers, timeSteps, args.pipelined, args.resume)
+
+    arraySink.report()
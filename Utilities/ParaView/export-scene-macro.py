@@ -1,8 +1,9 @@
 import zipfile
+import tempfile
+import zlib
 from urllib.parse import quote
 import hashlib
 import shutil
-import gzip
 import json
 import errno
 import time
@@ -27,6 +28,21 @@ from paraview import simple
 EXPORT_DIRECTORY = '${USER_HOME}/vtkJsExport'
 FILENAME_EXTENSION = '.vtkjs'
 
+# Hash used to name the array files: 'md5' (compatible with previous exports),
+# 'sha1' or 'blake2b' (faster on large arrays)
+HASH_ALGORITHM = 'md5'
+
+# Compression of the array files when compression is enabled: 'gz', or 'lz4'
+# when the lz4 python package is installed (both decoded by vtk.js)
+COMPRESSION_CODEC = 'gz'
+COMPRESSION_LEVEL = None
+
+# Also write the scene as a single binary glTF file (.glb) next to the .vtkjs
+# archive, with all the meshes, colors and textures in one buffer (needs numpy
+# and glb_writer.py, from the same directory as this macro, installed next to
+# the macro or on the python path, the export fails otherwise)
+EXPORT_GLB = False
+
 # ### ----------------------------------------------------------------------- ###
 # ###                   Convenience methods and definitions                   ###
 # ### ----------------------------------------------------------------------- ###
@@ -37,6 +53,27 @@ try:
 except:
   from vtkFiltersGeometry import vtkCompositeDataGeometryFilter
 
+try:
+  import numpy
+  try:
+    from vtkmodules.util import numpy_support
+  except ImportError:
+    from vtk.util import numpy_support
+except ImportError:
+  numpy = None
+
+# Checked before exporting anything: ParaView runs macros with exec(), where
+# __file__ is not always defined to locate the writer next to the macro
+if EXPORT_GLB:
+  if '__file__' in globals():
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+  try:
+    import glb_writer as glbWriter
+  except ImportError as e:
+    raise ImportError(
+        'EXPORT_GLB needs glb_writer.py (vtk.js Utilities/ParaView) next to '
+        'this macro or on the python path, and numpy: %s' % e)
+
 USER_HOME = os.path.expanduser('~')
 ROOT_OUTPUT_DIRECTORY = EXPORT_DIRECTORY.replace('${USER_HOME}', USER_HOME)
 ROOT_OUTPUT_DIRECTORY = os.path.normpath(ROOT_OUTPUT_DIRECTORY)
@@ -73,14 +110,85 @@ def getRangeInfo(array, component):
 
 # -----------------------------------------------------------------------------
 
-def getRef(destDirectory, md5):
+def getRef(destDirectory, md5, compression=None):
   ref = {}
   ref['id'] = md5
   ref['encode'] = 'BigEndian' if sys.byteorder == 'big' else 'LittleEndian'
   ref['basepath'] = destDirectory
+  if compression:
+    ref['compression'] = compression
   return ref
 
 
+# -----------------------------------------------------------------------------
+
+hashMapping = {
+    'md5': hashlib.md5,
+    'sha1': hashlib.sha1,
+    'blake2b': lambda: hashlib.blake2b(digest_size=16),
+}
+
+
+class StreamCompressor(object):
+  # Adapt the lz4 frame compressor to the zlib compress()/flush() API
+
+  def __init__(self, compress, flush, header=b''):
+    self.header = header
+    self.process = compress
+    self.finish = flush
+
+  def compress(self, data):
+    header, self.header = self.header, b''
+    return header + self.process(data)
+
+  def flush(self):
+    return self.header + self.finish()
+
+
+def createCompressor(codec, level, size):
+  if codec == 'gz':
+    return zlib.compressobj(9 if level is None else level, zlib.DEFLATED, 31)
+  if codec == 'lz4':
+    import lz4.frame
+    compressor = lz4.frame.LZ4FrameCompressor(
+        compression_level=0 if level is None else level)
+    header = compressor.begin(source_size=size)
+    return StreamCompressor(compressor.compress, compressor.flush, header)
+  raise ValueError('Unsupported compression codec: %s' % codec)
+
+
+codecExtensions = {'gz': '.gz', 'lz4': '.lz4'}
+
+
+def writeArrayBlob(dataDir, pBuffer, compress=True, blockSize=4 * 1024 * 1024):
+  # Hash and (optionally) compress the buffer in a single pass, then move the
+  # result atomically to its final name
+  data = memoryview(pBuffer).cast('B')
+  hasher = hashMapping[HASH_ALGORITHM]()
+  compressor = createCompressor(
+      COMPRESSION_CODEC, COMPRESSION_LEVEL, len(data)) if compress else None
+
+  fd, tmpPath = tempfile.mkstemp(dir=dataDir, prefix='.tmp-')
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      for offset in range(0, len(data), blockSize):
+        block = data[offset:offset + blockSize]
+        hasher.update(block)
+        f.write(compressor.compress(block) if compressor else block)
+      if compressor:
+        f.write(compressor.flush())
+
+    blobId = hasher.hexdigest()
+    os.replace(tmpPath, os.path.join(
+        dataDir, blobId + codecExtensions[COMPRESSION_CODEC] if compress else blobId))
+  except:
+    if os.path.exists(tmpPath):
+      os.remove(tmpPath)
+    raise
+
+  return blobId
+
+
 # -----------------------------------------------------------------------------
 
 objIds = []
@@ -95,6 +203,29 @@ def getObjectId(obj):
     return len(objIds)
 
 
+# -----------------------------------------------------------------------------
+
+def getIdTypeBuffer(array):
+  arraySize = array.GetNumberOfTuples() * array.GetNumberOfComponents()
+
+  if numpy is None:
+    newArray = vtkTypeUInt32Array()
+    newArray.SetNumberOfTuples(arraySize)
+    for i in range(arraySize):
+      newArray.SetValue(i, -1 if array.GetValue(i)
+                        < 0 else array.GetValue(i))
+    return memoryview(newArray)
+
+  values = numpy_support.vtk_to_numpy(array).reshape(-1)
+  if values.dtype.itemsize == 4 and (arraySize == 0 or values.min() >= -1):
+    # 32 bit ids: reinterpret in place (-1 already reads as 0xFFFFFFFF)
+    return memoryview(values.view(numpy.uint32))
+
+  narrowed = values.astype(numpy.uint32)
+  narrowed[values < 0] = 0xFFFFFFFF
+  return memoryview(narrowed)
+
+
 # -----------------------------------------------------------------------------
 
 def dumpDataArray(datasetDir, dataDir, array, root=None, compress=True):
@@ -106,32 +237,19 @@ def dumpDataArray(datasetDir, dataDir, array, root=None, compress=True):
 
   if array.GetDataType() == 12:
     # IdType need to be converted to Uint32
-    arraySize = array.GetNumberOfTuples() * array.GetNumberOfComponents()
-    newArray = vtkTypeUInt32Array()
-    newArray.SetNumberOfTuples(arraySize)
-    for i in range(arraySize):
-      newArray.SetValue(i, -1 if array.GetValue(i)
-                        < 0 else array.GetValue(i))
-    pBuffer = memoryview(newArray)
+    pBuffer = getIdTypeBuffer(array)
   elif array.GetDataType() == 13:
     # vtkStringArray - write as utf-8 encoded string that contains a json array with the strings
     arraySize = array.GetNumberOfTuples() * array.GetNumberOfComponents()
-    newArray = json.dumps([array.GetValue(v) for v in range(arraySize)])
+    newArray = json.dumps(list(map(array.GetValue, range(arraySize))))
     pBuffer = memoryview(newArray.encode('utf-8'))
   else:
     pBuffer = memoryview(array)
 
-  pMd5 = hashlib.md5(pBuffer).hexdigest()
-  pPath = os.path.join(dataDir, pMd5)
-  with open(pPath, 'wb') as f:
-    f.write(pBuffer)
-
-  if compress:
-    with open(pPath, 'rb') as f_in, gzip.open(os.path.join(dataDir, pMd5 + '.gz'), 'wb') as f_out:
-      shutil.copyfileobj(f_in, f_out)
-      os.remove(pPath)
+  pMd5 = writeArrayBlob(dataDir, pBuffer, compress)
 
-  root['ref'] = getRef(os.path.relpath(dataDir, datasetDir), pMd5)
+  root['ref'] = getRef(os.path.relpath(dataDir, datasetDir), pMd5,
+                      COMPRESSION_CODEC if compress else None)
   root['vtkClass'] = 'vtkDataArray'
   root['name'] = array.GetName()
   root['dataType'] = jsMapping[arrayTypesMapping[array.GetDataType()]]
@@ -423,6 +541,14 @@ def getComponentName(actor):
   return nameToUse
 
 
+# -----------------------------------------------------------------------------
+
+def getGLBMatrix(prop):
+  # glTF matrices are column major
+  matrix = prop.GetMatrix()
+  return [matrix.GetElement(r, c) for c in range(4) for r in range(4)]
+
+
 # ### ----------------------------------------------------------------------- ###
 # ###                          Main script contents                           ###
 # ### ----------------------------------------------------------------------- ###
@@ -452,6 +578,7 @@ renderers = renderWindow.GetRenderers()
 scDirs = []
 sceneComponents = []
 textureToSave = {}
+glbComponents = []
 
 for rIdx in range(renderers.GetNumberOfItems()):
   renderer = renderers.GetItemAsObject(rIdx)
@@ -587,6 +714,23 @@ for rIdx in range(renderers.GetNumberOfItems()):
         if textureName:
           sceneComponents[-1]['texture'] = textureName
 
+        if EXPORT_GLB:
+          # Only point colors can follow the vertices of the glTF mesh
+          glbDataset = dataset
+          if colorArray and arrayLocation == 'pointData':
+            glbDataset = dataset.NewInstance()
+            glbDataset.ShallowCopy(dataset)
+            glbDataset.GetPointData().AddArray(colorArray)
+          glbComponents.append({
+              'name': componentName,
+              'dataset': glbDataset,
+              'colorArrayName': colorArrayName if glbDataset is not dataset else None,
+              'texture': textureName,
+              'color': colorToUse,
+              'opacity': opacity,
+              'matrix': getGLBMatrix(renProp) if renProp.IsA('vtkProp3D') else None,
+          })
+
 # Save texture data if any
 for key, val in textureToSave.items():
   writeDataSet('', val, outputDir, None, newDSName=key,
@@ -640,3 +784,27 @@ finally:
 shutil.rmtree(outputDir)
 
 print('Finished exporting dataset to: ', sceneFileName)
+
+# -----------------------------------------------------------------------------
+
+# Single file binary glTF version of the same scene
+
+if EXPORT_GLB:
+  glb = glbWriter.GLBWriter('vtk.js export-scene-macro')
+  glbTextures = {}
+  for component in glbComponents:
+    texture = None
+    if component['texture']:
+      if component['texture'] not in glbTextures:
+        glbTextures[component['texture']] = glb.addTexture(
+            glbWriter.getPNGContent(textureToSave[component['texture']]), 'image/png')
+      texture = glbTextures[component['texture']]
+
+    material = glb.addMaterial(
+        component['name'], component['color'], component['opacity'], texture=texture)
+    glb.addMesh(component['name'], component['dataset'], material,
+                component['colorArrayName'], component['matrix'])
+
+  glbFileName = os.path.join(ROOT_OUTPUT_DIRECTORY, '%s.glb' % sceneName)
+  glb.write(glbFileName)
+  print('Finished exporting glTF scene to: ', glbFileName)
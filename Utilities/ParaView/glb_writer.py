@@ -0,0 +1,220 @@
+# -----------------------------------------------------------------------------
+# Binary glTF (.glb) writer shared by obj-mtl-importer.py and
+# export-scene-macro.py, which import it only when a .glb is requested
+# (requires numpy)
+# -----------------------------------------------------------------------------
+
+import os
+import json
+import math
+import struct
+import numpy
+
+try:
+  from vtkmodules.util import numpy_support
+  from vtkmodules.vtkFiltersCore import vtkTriangleFilter
+  from vtkmodules.vtkFiltersGeometry import vtkDataSetSurfaceFilter
+  from vtkmodules.vtkIOImage import vtkImageReader2Factory, vtkPNGWriter
+except ImportError:
+  from vtk.util import numpy_support
+  from vtk import vtkTriangleFilter, vtkDataSetSurfaceFilter, vtkImageReader2Factory, vtkPNGWriter
+
+# -----------------------------------------------------------------------------
+
+GLB_MAGIC = 0x46546C67
+GLB_JSON_CHUNK = 0x4E4F534A
+GLB_BIN_CHUNK = 0x004E4942
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+componentTypeMapping = {
+  'u1': 5121,
+  'u2': 5123,
+  'u4': 5125,
+  'f4': 5126,
+}
+
+accessorTypeMapping = {
+  1: 'SCALAR',
+  2: 'VEC2',
+  3: 'VEC3',
+  4: 'VEC4',
+}
+
+imageMimeTypes = {
+  '.png': 'image/png',
+  '.jpg': 'image/jpeg',
+  '.jpeg': 'image/jpeg',
+}
+
+# -----------------------------------------------------------------------------
+
+def getPNGContent(imageData):
+  writer = vtkPNGWriter()
+  writer.SetInputData(imageData)
+  writer.WriteToMemoryOn()
+  writer.Write()
+  return numpy_support.vtk_to_numpy(writer.GetResult()).tobytes()
+
+
+def getImageContent(imagePath):
+  # PNG and JPEG files are embedded as is, other formats are converted to PNG
+  ext = os.path.splitext(imagePath)[1].lower()
+  if ext in imageMimeTypes:
+    with open(imagePath, 'rb') as f:
+      return f.read(), imageMimeTypes[ext]
+
+  reader = vtkImageReader2Factory.CreateImageReader2(imagePath)
+  if not reader:
+    return None, None
+  reader.SetFileName(imagePath)
+  reader.Update()
+  return getPNGContent(reader.GetOutput()), 'image/png'
+
+# -----------------------------------------------------------------------------
+
+class GLBWriter(object):
+  # All the meshes and images of a scene in a single binary buffer, each
+  # accessor being a 4 bytes aligned view that the browser can use in place
+
+  def __init__(self, generator):
+    self.gltf = {
+      'asset': { 'version': '2.0', 'generator': generator },
+      'scene': 0,
+      'scenes': [{ 'nodes': [] }],
+      'nodes': [],
+      'meshes': [],
+      'materials': [],
+      'accessors': [],
+      'bufferViews': [],
+      'buffers': [],
+    }
+    self.blocks = []
+    self.byteLength = 0
+
+
+  def append(self, key, item):
+    if key not in self.gltf:
+      self.gltf[key] = []
+    self.gltf[key].append(item)
+    return len(self.gltf[key]) - 1
+
+
+  def addBufferView(self, content, target = None):
+    view = { 'buffer': 0, 'byteOffset': self.byteLength, 'byteLength': len(content) }
+    if target:
+      view['target'] = target
+    padding = (4 - len(content) % 4) % 4
+    self.blocks.append(content)
+    self.blocks.append(b'\0' * padding)
+    self.byteLength += len(content) + padding
+    return self.append('bufferViews', view)
+
+
+  def addAccessor(self, values, target, normalized = False, bounds = False):
+    values = values.astype(values.dtype.newbyteorder('<'))
+    accessor = {
+      'bufferView': self.addBufferView(values.tobytes(), target),
+      'componentType': componentTypeMapping[values.dtype.str[1:]],
+      'count': len(values),
+      'type': accessorTypeMapping[values.shape[1] if values.ndim > 1 else 1],
+    }
+    if normalized:
+      accessor['normalized'] = True
+    if bounds:
+      accessor['min'] = values.min(axis=0).tolist()
+      accessor['max'] = values.max(axis=0).tolist()
+    return self.append('accessors', accessor)
+
+
+  def addTexture(self, content, mimeType):
+    if 'samplers' not in self.gltf:
+      self.append('samplers', { 'wrapS': 10497, 'wrapT': 10497 })
+    image = self.append('images', { 'bufferView': self.addBufferView(content), 'mimeType': mimeType })
+    return self.append('textures', { 'source': image, 'sampler': 0 })
+
+
+  def addMaterial(self, name, color = (1, 1, 1), opacity = 1.0, specularPower = None, texture = None):
+    pbr = { 'baseColorFactor': list(color[:3]) + [opacity], 'metallicFactor': 0.0 }
+    if specularPower is not None:
+      # Usual Blinn-Phong exponent to roughness conversion
+      pbr['roughnessFactor'] = math.sqrt(2.0 / (specularPower + 2.0))
+    if texture is not None:
+      pbr['baseColorTexture'] = { 'index': texture }
+    material = { 'name': name, 'pbrMetallicRoughness': pbr, 'doubleSided': True }
+    if opacity < 1:
+      material['alphaMode'] = 'BLEND'
+    return self.append('materials', material)
+
+
+  def addMesh(self, name, dataset, material = None, colorArrayName = None, matrix = None):
+    if not dataset.IsA('vtkPolyData'):
+      surface = vtkDataSetSurfaceFilter()
+      surface.SetInputData(dataset)
+      surface.Update()
+      dataset = surface.GetOutput()
+
+    triangles = vtkTriangleFilter()
+    triangles.PassVertsOff()
+    triangles.PassLinesOff()
+    triangles.SetInputData(dataset)
+    triangles.Update()
+    mesh = triangles.GetOutput()
+    if mesh.GetNumberOfPolys() == 0:
+      return None
+
+    nbPoints = mesh.GetNumberOfPoints()
+    indices = numpy_support.vtk_to_numpy(mesh.GetPolys().GetConnectivityArray())
+    indexType = numpy.uint16 if nbPoints < 65536 else numpy.uint32
+    points = numpy_support.vtk_to_numpy(mesh.GetPoints().GetData()).astype(numpy.float32)
+
+    attributes = { 'POSITION': self.addAccessor(points, ARRAY_BUFFER, bounds = True) }
+
+    pointData = mesh.GetPointData()
+    if pointData.GetNormals():
+      normals = numpy_support.vtk_to_numpy(pointData.GetNormals()).astype(numpy.float32)
+      lengths = numpy.linalg.norm(normals, axis=1)
+      lengths[lengths == 0] = 1
+      attributes['NORMAL'] = self.addAccessor(normals / lengths[:, None], ARRAY_BUFFER)
+
+    if pointData.GetTCoords() and pointData.GetTCoords().GetNumberOfComponents() >= 2:
+      tcoords = numpy_support.vtk_to_numpy(pointData.GetTCoords()).reshape(nbPoints, -1)[:, :2].astype(numpy.float32)
+      # glTF images start at the top left corner
+      tcoords[:, 1] = 1 - tcoords[:, 1]
+      attributes['TEXCOORD_0'] = self.addAccessor(tcoords, ARRAY_BUFFER)
+
+    if colorArrayName and pointData.GetArray(colorArrayName):
+      # RGBA bytes keep the 4 bytes vertex stride required by glTF
+      values = numpy_support.vtk_to_numpy(pointData.GetArray(colorArrayName)).reshape(nbPoints, -1)
+      rgba = numpy.full((nbPoints, 4), 255, dtype=numpy.uint8)
+      rgba[:, :values.shape[1]] = values
+      attributes['COLOR_0'] = self.addAccessor(rgba, ARRAY_BUFFER, normalized = True)
+
+    primitive = {
+      'attributes': attributes,
+      'indices': self.addAccessor(indices.astype(indexType), ELEMENT_ARRAY_BUFFER),
+      'mode': 4,
+    }
+    if material is not None:
+      primitive['material'] = material
+
+    node = { 'name': name, 'mesh': self.append('meshes', { 'name': name, 'primitives': [primitive] }) }
+    if matrix is not None:
+      node['matrix'] = matrix
+    self.gltf['scenes'][0]['nodes'].append(self.append('nodes', node))
+    return node['mesh']
+
+
+  def write(self, filePath):
+    self.gltf['buffers'] = [{ 'byteLength': self.byteLength }]
+    content = json.dumps(self.gltf, separators=(',', ':')).encode('utf-8')
+    content += b' ' * ((4 - len(content) % 4) % 4)
+
+    with open(filePath, 'wb') as f:
+      f.write(struct.pack('<III', GLB_MAGIC, 2, 12 + 8 + len(content) + 8 + self.byteLength))
+      f.write(struct.pack('<II', len(content), GLB_JSON_CHUNK))
+      f.write(content)
+      f.write(struct.pack('<II', self.byteLength, GLB_BIN_CHUNK))
+      for block in self.blocks:
+        f.write(block)
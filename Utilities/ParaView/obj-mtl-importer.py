@@ -277,13 +277,15 @@ class MTLParser(object):
     print('Reducing materials from %s to %s' % (len(self.reducedMaterialMap), len(self.reverseReduceMap)))
 
 
+  def getMaterial(self, name):
+    if name in self.reverseReduceMap:
+      return self.materials[self.reverseReduceMap[name]]
+    return self.materials.get(name, {})
+
+
   def applyMaterialToRepresentation(self, name, representation):
     self.representationsParameters[name] = {}
-    material = {}
-    if name in self.materials:
-      material = self.materials[name]
-    if name in self.reverseReduceMap:
-      material = self.materials[self.reverseReduceMap[name]]
+    material = self.getMaterial(name)
 
     if 'map_Kd' in material:
         if name not in self.textures:
@@ -379,6 +381,47 @@ def writeMeshes(meshBaseDirectory, objReader, nameMapping = {}):
   return nameToFilePath;
 
 
+# -----------------------------------------------------------------------------
+# Binary glTF output
+# -----------------------------------------------------------------------------
+
+def writeGLB(glbFilePath, meshMapping, mtlReader):
+  try:
+    from glb_writer import GLBWriter, getImageContent
+  except ImportError as e:
+    print('Skipping the glTF export: %s' % e)
+    return
+
+  glb = GLBWriter('vtk.js obj-mtl-importer')
+  textures = {}
+  reader = vtkXMLPolyDataReader()
+
+  for name in meshMapping:
+    material = mtlReader.getMaterial(name)
+    params = mtlReader.representationsParameters.get(name, {})
+
+    texture = None
+    if 'map_Kd' in material:
+      imagePath = os.path.join(mtlReader.baseDir, material['map_Kd'][0])
+      if imagePath not in textures:
+        content, mimeType = getImageContent(imagePath)
+        textures[imagePath] = glb.addTexture(content, mimeType) if content else None
+      texture = textures[imagePath]
+
+    materialIndex = glb.addMaterial(
+      name,
+      params.get('DiffuseColor', [1, 1, 1]),
+      params.get('Opacity', 1.0),
+      params.get('SpecularPower'),
+      texture)
+
+    reader.SetFileName(meshMapping[name])
+    reader.Update()
+    glb.addMesh(name, reader.GetOutput(), materialIndex)
+
+  glb.write(glbFilePath)
+  print('%d meshes, %d textures, %d bytes => %s' % (len(glb.gltf['meshes']), len(glb.gltf.get('textures', [])), glb.byteLength, glbFilePath))
+
 # -----------------------------------------------------------------------------
 # Scene Loader
 # -----------------------------------------------------------------------------
@@ -404,6 +447,8 @@ def loadScene(objFilePath, mtlFilePath):
   with open('%s/representations.json' % meshBaseDirectory, "w", encoding="utf-8") as text_file:
     text_file.write(json.dumps(mtlReader.representationsParameters, indent=2, sort_keys=True))
 
+  writeGLB('%s.glb' % meshBaseDirectory, meshMapping, mtlReader)
+
   simple.Render()
 
 # -----------------------------------------------------------------------------